@@ -0,0 +1,73 @@
+# Benchmark concurrent reading of SONATA edge attributes in SonataReader.preload_data
+# Generates a synthetic edge file and measures the preload time against the number
+# of attributes, for several thread counts (see --edge-read-threads).
+#
+# Usage: python edge_read_threads.py [output_dir] [n_edges]
+# To observe the effect of I/O latency, place the files in a parallel filesystem.
+
+import os
+import sys
+import tempfile
+import time
+
+import h5py
+import libsonata
+import numpy as np
+
+from neurodamus.io.synapse_reader import SonataReader, SynapseParameters
+
+N_NODES = 1000
+ATTRIBUTE_COUNTS = (4, 8, 16, 32)
+THREAD_COUNTS = (1, 2, 4, 8)
+POPULATION = "bench"
+
+
+def create_edge_file(path, n_edges, n_attributes):
+    rng = np.random.default_rng(0)
+    with h5py.File(path, "w") as h5:
+        pop = h5.create_group("edges/" + POPULATION)
+        pop.create_dataset("source_node_id", data=rng.integers(0, N_NODES, n_edges))
+        pop.create_dataset("target_node_id", data=np.sort(rng.integers(0, N_NODES, n_edges)))
+        pop.create_dataset("edge_type_id", data=np.full(n_edges, -1))
+        group = pop.create_group("0")
+        for i in range(n_attributes):
+            group.create_dataset("attr_%d" % i, data=rng.random(n_edges))
+    libsonata.EdgePopulation.write_indices(path, POPULATION, N_NODES, N_NODES)
+
+
+def make_reader(n_attributes):
+    class BenchParameters(SynapseParameters):
+        _synapse_fields = ("sgid",) + tuple("attr_%d" % i for i in range(n_attributes))
+        _reserved = ()
+
+    class BenchReader(SonataReader):
+        Parameters = BenchParameters
+        custom_parameters = set()
+
+    return BenchReader
+
+
+def main(output_dir=None, n_edges=5_000_000):
+    tmp_dir = None
+    if output_dir is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        output_dir = tmp_dir.name
+
+    gids = np.arange(1, N_NODES + 1)
+    print("%10s" % "attributes" + "".join("%10s" % ("%d thr" % t) for t in THREAD_COUNTS))
+    for n_attributes in ATTRIBUTE_COUNTS:
+        path = os.path.join(output_dir, "edges_%d.h5" % n_attributes)
+        create_edge_file(path, n_edges, n_attributes)
+        reader_cls = make_reader(n_attributes)
+        timings = []
+        for n_threads in THREAD_COUNTS:
+            reader = reader_cls(path, POPULATION, read_threads=n_threads)
+            start = time.perf_counter()
+            reader.preload_data(gids)
+            timings.append(time.perf_counter() - start)
+        print("%10d" % n_attributes + "".join("%10.3f" % t for t in timings)
+              + "   speedup: %.2fx" % (timings[0] / min(timings)))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2], *map(int, sys.argv[2:3]))
@@ -7,8 +7,8 @@ import hashlib
 import logging  # active only in rank 0 (init)
 import os
 import weakref
-from contextlib import contextmanager
-from io import StringIO
+from contextlib import contextmanager, nullcontext
+from io import BytesIO, StringIO
 from os import path as ospath
 from pathlib import Path
 
@@ -24,6 +24,7 @@ from .core.nodeset import NodeSet
 from .io import cell_readers
 from .lfp_manager import LFPManager
 from .metype import Cell_V6, EmptyCell
+from .morphio_wrapper import morphology_cache
 from .target_manager import TargetSpec
 from .utils import compat
 from .utils.logging import log_verbose, log_all
@@ -256,7 +257,9 @@ class CellManagerBase(_CellManager):
         targetspec: TargetSpec = self._target_spec
 
         population = targetspec.population
-        all_gids = load_balancer.get(population, {}).get((MPI.rank, cycle_i), [])
+        # Allocations from file are for the current cycle and keyed by rank only
+        pop_allocation = load_balancer.get(population, {})
+        all_gids = pop_allocation.get((MPI.rank, cycle_i), pop_allocation.get(MPI.rank, []))
         all_gids = numpy.array(all_gids, dtype="uint32")
         logging.debug("Loading %d cells in rank %d", len(all_gids), MPI.rank)
         total_cells = len(all_gids)
@@ -575,13 +578,29 @@ class CellDistributor(CellManagerBase):
         log_verbose("Loading '%s' morphologies from: %s",
                     CellType.morpho_extension, conf.MorphologyPath)
         if dry_run_stats_obj is None:
-            super()._instantiate_cells(CellType, **opts)
+            with self._prefetch_morphologies(CellType):
+                super()._instantiate_cells(CellType, **opts)
         else:
             cur_metypes_mem = dry_run_stats_obj.metype_memory
             memory_dict = self._instantiate_cells_dry(CellType, cur_metypes_mem, **opts)
             log_verbose("Updating global dry-run memory counters with %d items", len(memory_dict))
             cur_metypes_mem.update(memory_dict)
 
+    def _prefetch_morphologies(self, CellType):
+        """A context where the (h5) morphologies of the local cells are prefetched, if enabled.
+        Other formats are loaded by the hoc templates, via import3d.
+        """
+        n_threads = int(SimConfig.cli_options.prefetch_morphologies or 0)
+        if not n_threads or CellType.morpho_extension != "h5":
+            return nullcontext()
+        log_verbose("Prefetching morphologies using %d threads", n_threads)
+        morphology_dir = self._circuit_conf.MorphologyPath
+        # Same paths as the emodel templates build ("%s/%s"), so that the cache keys match
+        return morphology_cache.prefetching(
+            ("%s/%s" % (morphology_dir, CellType.morphology_file(cell_info))
+             for _, cell_info in self._local_nodes.items() if cell_info is not None),
+            n_threads)
+
 
 class LoadBalance:
     """
@@ -596,6 +615,8 @@ class LoadBalance:
     which allow the balance info to be reused. These are
 
      - cx_{TARGET}.dat: File with complexity information for the cells of a given target
+     - cx_{TARGET}.index.npy, cx_{TARGET}.data.npy: Binary (memory-mappable) version of the
+       complexity file, respectively a gid-sorted index and the flattened multisplit data
      - cx_{TARGET}.{CPU_COUNT}.dat: The file assigning cells/pieces to individual CPUs ranks.
 
     For more information refer to the developer documentation.
@@ -604,6 +625,9 @@ class LoadBalance:
     _circuit_lb_dir_tpl = "_loadbal_%s.%s"      # Placeholders are (file_src_hash, population)
     _cx_filename_tpl = "cx_%s#.dat"             # use # to well delimiter the target name
     _cpu_assign_filename_tpl = "cx_%s#.%s.dat"  # prefix must be same (imposed by Neuron)
+    _cx_index_suffix = ".index.npy"             # Binary cx files replace the .dat suffix
+    _cx_data_suffix = ".data.npy"
+    _cx_index_dtype = numpy.dtype([("gid", "i8"), ("cx", "f8"), ("start", "i8"), ("end", "i8")])
 
     def __init__(self, balance_mode, nodes_path, pop, target_manager, target_cpu_count=None):
         """
@@ -704,9 +728,15 @@ class LoadBalance:
         logging.info("Target %s is a subset of the target %s. Generating %s",
                      target_spec.name, previous_target, new_cx_filename)
 
+        # Extract the records of the target gids, in the target order
+        index, data = self._cx_select(cx_other["index"], cx_other["data"])
+        self._save_cx_binary(new_cx_filename, index, data)
+
         # Write the new cx file since Neuron needs it to do CPU assignment
         with open(new_cx_filename, "w") as newfile:
-            self._write_msdat_dict(newfile, cx_other, target_gids)
+            newfile.write("1\n%d\n" % len(index))
+            for start, end in zip(index["start"].tolist(), index["end"].tolist()):
+                self._write_msdat(newfile, data[start:end])
         # register
         self._cx_targets.add(target_spec.simple_name)
         return True
@@ -737,20 +767,105 @@ class LoadBalance:
 
     @classmethod
     def _cx_contains_gids(cls, cxpath, target_gids, out_cx=None) -> bool:
-        """Checks a cx file contains complexities for given gids
+        """Checks a cx file contains complexities for given gids.
+
+        The check is an index lookup on the memory-mapped binary cx files.
+        If out_cx is given it is updated with the "index" records of the target gids
+        (in the target order) and the flattened cx "data".
         """
         if not cxpath.is_file():
             log_verbose("  - cxpath doesnt exist: %s", cxpath)
             return False
-        with open(cxpath, "r") as f:
-            cx_saved = cls._read_msdat(f)
-        if not set(cx_saved.keys()) >= set(target_gids):
-            log_verbose("  - Not all GIDs in target %s %s", set(cx_saved.keys()), set(target_gids))
+        index, data = cls._load_cx_binary(cxpath)
+        target_gids = numpy.asarray(target_gids, dtype="i8")
+        positions = numpy.searchsorted(index["gid"], target_gids)
+        found = positions < len(index)
+        found[found] = index["gid"][positions[found]] == target_gids[found]
+        if not found.all():
+            log_verbose("  - Not all GIDs in target. Missing: %s", target_gids[~found])
             return False
         if out_cx is not None:
-            out_cx.update(cx_saved)
+            out_cx.update(index=index[positions], data=data)
         return True
 
+    @classmethod
+    def _cx_binary_filenames(cls, cxpath):
+        """Gets the filenames of the binary index and data files of a cx file"""
+        cxpath = Path(cxpath)
+        return (cxpath.with_suffix(cls._cx_index_suffix),
+                cxpath.with_suffix(cls._cx_data_suffix))
+
+    @classmethod
+    def _save_cx_binary(cls, cxpath, index, data):
+        """Saves the binary version of a cx file"""
+        _, data_file = cls._cx_binary_filenames(cxpath)
+        numpy.save(data_file, numpy.asarray(data, dtype="f8"))
+        cls._save_cx_index(cxpath, index)
+
+    @classmethod
+    def _save_cx_index(cls, cxpath, index):
+        """Saves the index of a binary cx file, sorted by gid. Must be saved after the data"""
+        index_file, _ = cls._cx_binary_filenames(cxpath)
+        numpy.save(index_file, index[numpy.argsort(index["gid"], kind="stable")])
+
+    @staticmethod
+    def _npy_header(length, dtype="f8"):
+        """The header of a .npy file of a 1D array, so that raw data can be appended"""
+        header = BytesIO()
+        numpy.lib.format.write_array_header_1_0(header, {
+            "descr": numpy.lib.format.dtype_to_descr(numpy.dtype(dtype)),
+            "fortran_order": False,
+            "shape": (length,),
+        })
+        return header.getvalue()
+
+    @classmethod
+    def _load_cx_binary(cls, cxpath):
+        """Loads (memory-mapped) the binary index and data of a cx file.
+
+        Binary files missing or older than the cx file (e.g. created by previous versions)
+        are converted from the text file.
+        """
+        index_file, data_file = cls._cx_binary_filenames(cxpath)
+        if not (index_file.is_file() and data_file.is_file()) \
+                or index_file.stat().st_mtime < Path(cxpath).stat().st_mtime:
+            log_verbose("  - Converting %s to binary format", cxpath)
+            with open(cxpath, "r") as f:
+                data = numpy.array(f.read().split()[2:], dtype="f8")  # skip 2-line header
+            cls._save_cx_binary(cxpath, cls._msdat_index(data), data)
+        return (numpy.load(index_file, mmap_mode="r"),
+                numpy.load(data_file, mmap_mode="r"))
+
+    @classmethod
+    def _msdat_index(cls, data):
+        """Builds the index of the cell records of flattened multisplit data
+        """
+        records = []
+        i, n = 0, len(data)
+        while i < n:
+            start = i
+            piece_count = int(data[i + 2])
+            i += 3
+            for _ in range(piece_count):
+                subtree_count = int(data[i])
+                i += 1
+                for _ in range(subtree_count):
+                    i += 2 + int(data[i + 1])  # cx, children_count, children ids
+            records.append((data[start], data[start + 1], start, i))
+        return numpy.array(records, dtype=cls._cx_index_dtype)
+
+    @staticmethod
+    def _cx_select(index, data):
+        """Gathers the data of the given index records into a new compact (index, data)
+        """
+        lengths = index["end"] - index["start"]
+        new_index = numpy.array(index)
+        new_index["end"] = numpy.cumsum(lengths)
+        new_index["start"] = new_index["end"] - lengths
+        data_positions = (numpy.arange(new_index["end"][-1] if len(index) else 0)
+                          + numpy.repeat(index["start"] - new_index["start"], lengths))
+        return new_index, numpy.asarray(data)[data_positions]
+
     @contextmanager
     def generate_load_balance(self, target_spec, cell_distributor):
         """Context manager that creates load balance for the circuit instantiated within
@@ -786,19 +901,33 @@ class LoadBalance:
         for cell in cell_distributor.cells:
             mcomplex.cell_complexity(cell.CellRef)
             mcomplex.multisplit(cell.raw_gid, lcx, tmp)
-            ms_list.append(tmp.c())
+            ms_list.append(tmp.as_numpy().copy())
 
         # To output build independently the contents of the file then append
         ostring = StringIO()
         for ms in ms_list:
             self._write_msdat(ostring, ms)
 
-        all_ranks_cx = MPI.py_gather(ostring.getvalue(), 0)
+        # Binary cx: local flattened data and the index of its records
+        lengths = numpy.fromiter((len(ms) for ms in ms_list), dtype="i8", count=len(ms_list))
+        local_data = numpy.concatenate(ms_list) if ms_list else numpy.empty(0)
+        local_index = numpy.empty(len(ms_list), dtype=self._cx_index_dtype)
+        local_index["gid"] = [ms[0] for ms in ms_list]
+        local_index["cx"] = [ms[1] for ms in ms_list]
+        local_index["end"] = numpy.cumsum(lengths) + MPI.py_exscan(len(local_data))
+        local_index["start"] = local_index["end"] - lengths
+        total_data_len = int(MPI.allreduce(len(local_data), MPI.SUM))
+
+        # Each rank writes its own slice of the files, no gathering of the data
+        header = "1\n%d\n" % cell_distributor.total_cells
+        MPI.write_ordered(out_filename, ostring.getvalue().encode(), header.encode())
+        _, data_filename = self._cx_binary_filenames(out_filename)
+        MPI.write_ordered(data_filename, local_data.tobytes(), self._npy_header(total_data_len))
+
+        # The index is compact and must be sorted, done by rank 0
+        all_ranks_index = MPI.py_gather(local_index, 0)
         if MPI.rank == 0:
-            with open(out_filename, "w") as fp:
-                fp.write("1\n%d\n" % cell_distributor.total_cells)
-                for cx_info in all_ranks_cx:
-                    fp.write(cx_info)
+            self._save_cx_index(out_filename, numpy.concatenate(all_ranks_index))
         # register
         self._cx_targets.add(target_str)
 
@@ -845,66 +974,33 @@ class LoadBalance:
     def _write_msdat(fp, ms):
         """Writes load balancing info to an output stream
         """
-        fp.write("%d" % ms.x[0])   # gid
-        fp.write(" %g" % ms.x[1])  # total complexity of cell
-        piece_count = int(ms.x[2])
+        fp.write("%d" % ms[0])   # gid
+        fp.write(" %g" % ms[1])  # total complexity of cell
+        piece_count = int(ms[2])
         fp.write(" %d\n" % piece_count)
         i = 2
         tcx = 0  # Total accum complexity
 
         for _ in range(piece_count):
             i += 1
-            subtree_count = int(ms.x[i])
+            subtree_count = int(ms[i])
             fp.write("  %d\n" % subtree_count)
             for _ in range(subtree_count):
                 i += 1
-                cx = ms.x[i]  # subtree complexity
+                cx = ms[i]  # subtree complexity
                 tcx += cx
                 i += 1
-                children_count = int(ms.x[i])
+                children_count = int(ms[i])
                 fp.write("   %g %d\n" % (cx, children_count))
                 if children_count > 0:
                     fp.write("    ")
                 for _ in range(children_count):
                     i += 1
-                    elem_id = ms.x[i]  # at next child
+                    elem_id = ms[i]  # at next child
                     fp.write(" %d" % elem_id)
                 if children_count > 0:
                     fp.write("\n")
 
-    @staticmethod
-    def _read_msdat(fp):
-        """read load balancing info from an input stream
-        """
-        cx_saved = {}  # dict with key = gid, value = line content
-        piece_count = 0
-        gid = None
-        next(fp)  # first line has 1. skip
-        next(fp)  # ncells. skip
-
-        for line in fp:
-            if piece_count == 0:
-                gid, _cx, piece_count = [int(float(x)) for x in line.split()]
-                cx_saved[gid] = [line]
-            else:                               # Handle parts
-                cx_saved[gid].append(line)
-                for _ in range(2 * int(line)):  # each subtree has two lines
-                    cx_saved[gid].append(next(fp))
-                piece_count -= 1
-
-        return cx_saved
-
-    @staticmethod
-    def _write_msdat_dict(fp, cx_dict, gids=None):
-        """Write out selected gid cx lines from a cx_dict
-        """
-        if gids is None:
-            gids = cx_dict.keys()
-        fp.write("1\n%d\n" % len(gids))
-        for gid in gids:
-            for line in cx_dict[gid]:
-                fp.write(line)  # raw lines, include \n
-
     # -
     def _get_target_raw_gids(self, target_spec) -> numpy.ndarray:
         return self._target_manager.get_target(target_spec).get_raw_gids()
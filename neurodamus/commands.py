@@ -51,7 +51,7 @@ def neurodamus(args=None):
                                 - MultiSplit: Allows splitting cells into pieces for distribution.
                                     WARNING: This mode is incompatible with CoreNeuron
                                 - Memory: Load balance based on memory usage. By default, it uses
-                                    the "allocation_r#_c#.pkl.gz" file to load a pre-computed load
+                                    the "allocation_r#_c#.npy" file to load a pre-computed load
                                     balance
         --save=<PATH>           Path to create a save point to enable resume.
         --save-time=<TIME>      The simulation time [ms] to save the state. (Default: At the end)
@@ -61,8 +61,26 @@ def neurodamus(args=None):
         --model-stats           Show model stats in CoreNEURON simulations [default: False]
         --dry-run               Dry-run simulation to estimate memory usage [default: False]
         --num-target-ranks=<number>  Number of ranks to target for dry-run load balancing
+        --dry-run-synapse-factor=<factor>
+                                Also balance the synapse count of the ranks in the dry-run
+                                allocation, with the given importance relative to memory
         --coreneuron-direct-mode     Run CoreNeuron in direct memory mode transfered from Neuron,
                                      without writing model data to disk.
+        --edge-read-threads=<number> Number of threads to concurrently read edge attributes.
+                                     Uses independent (non-collective) I/O [default: 1]
+        --distributed-replay    Read replay spike files in parallel, keeping in each rank only the
+                                spikes of its local connections [default: False]
+        --shared-replay-stims   Use a single VecStim per replayed source and spike train in each
+                                target cell, shared by all its synapses [default: False]
+        --stream-spikes         Write the recorded spikes to per-rank SONATA files at every flush,
+                                merged into the spikes file at the end. Keeps spike vectors small
+                                [default: False]
+        --morphology-cache-size=<number>
+                                Max number of processed morphologies kept in memory per rank, to
+                                be reused by cells sharing them. 0 disables the cache [default: 64]
+        --prefetch-morphologies=<threads>
+                                Read and process (h5) morphologies ahead of cell instantiation,
+                                using the given number of background threads per rank
     """
     options = docopt_sanitize(docopt(neurodamus.__doc__, args))
     config_file = options.pop("ConfigFile")
@@ -110,11 +128,20 @@ def hocify(args=None):
         -v --verbose            Increase verbosity level.
         --nframe=<number>       NEURON_NFRAME value [default: 1000].
         --output-dir=<PATH>     Output directory for hoc files.
+        --morph-folder=<DIR>    Sub-folder holding the morphologies (.asc, .h5, .swc)
+                                [default: ascii].
+        --incremental           Skip morphologies whose contents didn't change since the
+                                previous run, according to the output dir manifest.
+        --jobs=<number>         Number of worker processes. Default: all cores.
+        --chunksize=<number>    Morphologies sent to a worker at once [default: 16].
     """
     options = docopt_sanitize(docopt(hocify.__doc__, args))
     morph_path = abspath(options.pop("MorphologyPath"))
     log_level = _pop_log_level(options)
     neuron_nframe = options.pop("nframe")
+    morph_folder = options.pop("morph_folder")
+    options["jobs"] = options["jobs"] and int(options["jobs"])
+    options["chunksize"] = int(options["chunksize"])
     options.pop("help")  # never pass to the library
 
     # first check if it is a file
@@ -133,13 +160,13 @@ def hocify(args=None):
 
     # otherwise it is a directory, use multiprocessing
     try:
-        Hocify(morph_path, neuron_nframe, log_level, **options).convert()
+        ret = Hocify(morph_path, neuron_nframe, log_level, **options).convert(morph_folder)
     except Exception as e:
         logging.critical(str(e), exc_info=True)
         return 1
     from neuron import version as nrn_version
     logging.info("Neuron version used for hocifying: " + nrn_version)
-    return 0
+    return ret or 0
 
 
 def _pop_log_level(options):
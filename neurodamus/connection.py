@@ -9,7 +9,6 @@ from .core import NeurodamusCore as Nd
 from .core.configuration import GlobalConfig, SimConfig, ConfigurationError
 from .utils import compat
 from .utils.logging import log_all
-from .utils.pyutils import append_recarray
 
 
 class ReplayMode(Enum):
@@ -78,8 +77,8 @@ class ConnectionBase:
         # Initialized in specific routines
         self._netcons = None
         self._synapses = ()
-        self._delay_vec = Nd.Vector()
-        self._delayweight_vec = Nd.Vector()
+        self._delay_vec = None  # Created on first delayed weight
+        self._delayweight_vec = None
 
     synapse_params = property(lambda self: self._synapse_params)
     synapses = property(lambda self: self._synapses)
@@ -120,6 +119,9 @@ class ConnectionBase:
            delay: the delay time for the new weight
            weight: the weight to adjust to at this time
         """
+        if self._delay_vec is None:
+            self._delay_vec = Nd.Vector()
+            self._delayweight_vec = Nd.Vector()
         self._delay_vec.append(delay)
         self._delayweight_vec.append(weight)
 
@@ -169,6 +171,104 @@ class ConnectionBase:
         return "[%d->%d]" % (self.sgid, self.tgid)
 
 
+class SynapseBuffer:
+    """A packed buffer with the synapses of many connections, all with the same params dtype.
+
+    Connections reference their synapses by (start, count) instead of each holding
+    its own parameters array, ids array and lists, whose overhead dominates for
+    connections of a few synapses. The buffer grows geometrically and the ranges left
+    behind by connections moved to the end are reused for later connections.
+    """
+    __slots__ = ("params", "ids", "sections", "_size", "_free")
+
+    def __init__(self, dtype):
+        self.params = numpy.recarray(0, dtype)
+        self.ids = numpy.empty(0, "uint64")
+        self.sections = []
+        self._size = 0
+        self._free = []  # (start, count) of the unused ranges
+
+    def __len__(self):
+        return self._size
+
+    def _reserve(self, size):
+        if size <= len(self.params):
+            return
+        capacity = max(size, 2 * self._size, 16)
+        params = numpy.recarray(capacity, self.params.dtype)
+        ids = numpy.empty(capacity, "uint64")
+        params[:len(self.params)] = self.params
+        ids[:len(self.ids)] = self.ids
+        self.params = params
+        self.ids = ids
+
+    def _allocate(self, count):
+        """The start of a free range for count synapses, taken from the holes if possible"""
+        for i, (start, free_count) in enumerate(self._free):
+            if free_count >= count:
+                if free_count > count:
+                    self._free[i] = (start + count, free_count - count)
+                else:
+                    del self._free[i]
+                return start
+        start = self._size
+        self._size += count
+        self._reserve(self._size)
+        self.sections.extend([None] * count)
+        return start
+
+    def extend(self, start, count, params, ids, sections):
+        """Stores new synapses of a connection which holds the range [start, start+count).
+
+        The existing range is moved to a new range if it can't grow in place.
+
+        Returns: The new start of the connection synapses
+        """
+        if params.dtype != self.params.dtype:
+            # Like separate per-connection arrays, new synapses take the connection dtype
+            params = numpy.concatenate((params,), dtype=self.params.dtype)
+        if count and start + count == self._size:
+            offset = self._size
+            self._size += len(params)
+            self._reserve(self._size)
+            self.sections.extend(sections)
+        else:
+            if count:
+                params = numpy.concatenate((self.params[start:start + count], params))
+                ids = numpy.concatenate((self.ids[start:start + count], ids))
+                sections = self.sections[start:start + count] + list(sections)
+                self.sections[start:start + count] = [None] * count
+                self._free.append((start, count))
+            start = offset = self._allocate(len(params))
+        end = offset + len(params)
+        self.params[offset:end] = params
+        self.ids[offset:end] = ids
+        self.sections[offset:end] = sections
+        return start
+
+
+class SynapseStore:
+    """The packed synapses of many connections, usually one store per ConnectionSet.
+
+    Synapses are kept in a SynapseBuffer per parameters dtype, since blocks of a population
+    may read extra fields (e.g. for ModOverride) while others don't.
+    """
+    __slots__ = ("_buffers",)
+
+    def __init__(self):
+        self._buffers = {}
+
+    def __len__(self):
+        return sum(len(buffer) for buffer in self._buffers.values())
+
+    def buffer(self, dtype):
+        """The buffer for synapses whose parameters have the given dtype"""
+        buffer = self._buffers.get(dtype)
+        if buffer is None:
+            buffer = self._buffers[dtype] = SynapseBuffer(dtype)
+        return buffer
+
+
 # ----------------------------------------------------------------------
 # Connection class
 # ----------------------------------------------------------------------
@@ -178,8 +278,8 @@ class Connection(ConnectionBase):
     a presynaptic and a postsynaptic gid, including Points where those
     synapses are placed (stored in TPointList)
     """
-    __slots__ = ("minis_spont_rate", "_spont_minis", "_replay", "_mod_override", "_synapse_ids",
-                 "_configurations", "_conductances_bk", "_synapse_sections", "_synapse_points_x")
+    __slots__ = ("minis_spont_rate", "_spont_minis", "_replay", "_mod_override",
+                 "_configurations", "_conductances_bk", "_syn_store", "_syn_start", "_syn_count")
 
     _AMPANMDA_Helper = None
     _GABAAB_Helper = None
@@ -219,10 +319,11 @@ class Connection(ConnectionBase):
         super().__init__(sgid, tgid, src_pop_id, dst_pop_id, weight_factor, **kwargs)
         self.minis_spont_rate = minis_spont_rate
         self._mod_override = mod_override
-        self._synapse_sections = []
-        self._synapse_points_x = compat.array("d")
-        self._synapse_ids = compat.array("i")  # replaced by np.array for bulk add syn
-        self._configurations = [configuration] if configuration is not None else []
+        # Synapses are kept in a (shared) SynapseBuffer, in the range [start, start+count)
+        self._syn_store = None
+        self._syn_start = 0
+        self._syn_count = 0
+        self._configurations = [configuration] if configuration is not None else None
         self._conductances_bk = None  # Store for re-enabling
         # Artificial stimulus sources
         self._spont_minis = None
@@ -233,19 +334,37 @@ class Connection(ConnectionBase):
         """Add a synapse configuration command to the list.
         All commands are executed on synapse creation
         """
-        if configuration is not None:
-            self._configurations.append(configuration)
+        if configuration is None:
+            return
+        if self._configurations is None:
+            self._configurations = []
+        self._configurations.append(configuration)
 
     def override_mod(self, mod_override):
         assert mod_override.exists("ModOverride"), "ModOverride requires hoc config obj"
         self._mod_override = mod_override
 
+    @property
+    def synapse_params(self):
+        if self._syn_store is None:
+            return self._synapse_params
+        return self._syn_store.params[self._syn_start:self._syn_start + self._syn_count]
+
+    @property
+    def _synapse_ids(self):
+        if self._syn_store is None:
+            return ()
+        return self._syn_store.ids[self._syn_start:self._syn_start + self._syn_count]
+
     @property
     def sections_with_synapses(self):
         """Generator over all sections containing synapses, yielding pairs
         (section_index, section)
         """
-        for syn_i, sc in enumerate(self._synapse_sections):
+        if self._syn_store is None:
+            return
+        sections = self._syn_store.sections[self._syn_start:self._syn_start + self._syn_count]
+        for syn_i, sc in enumerate(sections):
             # All locations, on and off node should be in this list, but
             # only synapses/netcons on-node should be returned
             if not sc.exists():
@@ -253,46 +372,46 @@ class Connection(ConnectionBase):
             yield syn_i, sc.sec
 
     # -
-    def add_synapses(self, target_manager, synapses_params, base_id=0):
+    def add_synapses(self, target_manager, synapses_params, base_id=0, synapse_store=None):
         """Adds synapses in bulk.
 
         Args:
          - synapses_params: A SynapseParameters array (possibly view) for this conn synapses
          - base_id: The synapse base id, usually absolute offset
+         - synapse_store: The SynapseStore where to keep the synapses, usually shared
+           by all the connections of a population. Default: a new store for this conn
 
         """
 
         n_synapses = len(synapses_params)
         synapse_ids = numpy.arange(base_id, base_id+n_synapses, dtype="uint64")
-        mask = numpy.full(n_synapses, True)  # We may need to skip invalid synapses (e.g. on Axon)
-        for i, syn_params in enumerate(synapses_params):
-            syn_point = target_manager.location_to_point(
-                self.tgid, syn_params['isec'], syn_params['ipt'], syn_params['offset'])
-            syn_params['location'] = syn_point.x[0]
-            section = syn_point.sclst[0]
-
-            if section is None or not section.exists():
-                target_point_str = "({0.isec:.0f} {0.ipt:.0f} {0.offset:.4f})".format(syn_params)
-                logging.warning("SKIPPED Synapse %s on gid %d. Src gid: %d. Deleted TPoint %s",
-                                base_id + i, self.tgid, self.sgid, target_point_str)
-                mask[i] = False
-                continue
-
-            # These are normal lists/arrays, so we cant use masks
-            self._synapse_sections.append(section)
-            self._synapse_points_x.append(syn_point.x[0])
+        sections, points_x = target_manager.locations_to_points(
+            self.tgid, synapses_params['isec'], synapses_params['ipt'], synapses_params['offset'])
+        synapses_params['location'] = points_x
+
+        # We may need to skip invalid synapses (e.g. on Axon)
+        mask = numpy.fromiter((sc is not None and sc.exists() for sc in sections), bool,
+                              n_synapses)
+        for i in numpy.flatnonzero(~mask):
+            target_point_str = "({0.isec:.0f} {0.ipt:.0f} {0.offset:.4f})".format(
+                synapses_params[i])
+            logging.warning("SKIPPED Synapse %s on gid %d. Src gid: %d. Deleted TPoint %s",
+                            base_id + i, self.tgid, self.sgid, target_point_str)
 
         if not mask.all():
+            sections = [sc for sc, valid in zip(sections, mask) if valid]
             synapses_params = synapses_params[mask]
             synapse_ids = synapse_ids[mask]
 
-        if self._synapse_params is None or len(self._synapse_params) == 0:  # None or empty
-            self._synapse_params = synapses_params
-            self._synapse_ids = synapse_ids
-        else:
-            self._synapse_params = numpy.concatenate((self._synapse_params, synapses_params),
-                                                     dtype=self._synapse_params.dtype)
-            self._synapse_ids = numpy.concatenate((self._synapse_ids, synapse_ids))
+        self._store_synapses(synapses_params, synapse_ids, sections, synapse_store)
+
+    def _store_synapses(self, synapses_params, synapse_ids, sections, synapse_store=None):
+        if self._syn_store is None:
+            synapse_store = synapse_store if synapse_store is not None else SynapseStore()
+            self._syn_store = synapse_store.buffer(synapses_params.dtype)
+        self._syn_start = self._syn_store.extend(self._syn_start, self._syn_count,
+                                                 synapses_params, synapse_ids, sections)
+        self._syn_count += len(synapses_params)
 
     # -
     def add_synapse(self, syn_tpoints, params_obj, syn_id=None):
@@ -306,22 +425,13 @@ class Connection(ConnectionBase):
             params_obj: Parameters object for the Synapse to be placed
             syn_id: Optional id for the synapse to be used for seeding rng
         """
-        # Update four lists:
-        # - synapse_sections
-        # - synapse_points_x
-        # - synapse_params (slow!)
-        # - synapse_ids
-
-        for i, sc in enumerate(syn_tpoints.sclst):
-            self._synapse_sections.append(sc)
-            self._synapse_points_x.append(syn_tpoints.x.x[i])
-
-        self._synapse_params = append_recarray(self._synapse_params, params_obj)
         params_obj.location = syn_tpoints.x[0]  # helper
+        synapse_params = numpy.recarray(1, params_obj.dtype)
+        synapse_params[0] = params_obj
 
         if syn_id is None:
-            syn_id = len(self._synapse_sections)
-        self._synapse_ids.append(syn_id)
+            syn_id = self._syn_count + 1
+        self._store_synapses(synapse_params, (syn_id,), syn_tpoints.sclst[:1])
 
     # -
     def replay(self, tvec, start_delay=.0):
@@ -333,13 +443,17 @@ class Connection(ConnectionBase):
             start_delay: When the events may start to be delivered
         """
         assert self._netcons is None, "Replay must be setup prior to finalize()"
-        hoc_tvec = Nd.Vector(tvec[tvec >= start_delay])
-        logging.debug("Replaying %d spikes on %d - %d", hoc_tvec.size(), self.sgid, self.tgid)
-        logging.debug(" > First replay event for connection at %f", hoc_tvec.x[0])
+        tvec = tvec[tvec >= start_delay]
+        logging.debug("Replaying %d spikes on %d - %d", len(tvec), self.sgid, self.tgid)
+        if len(tvec):
+            logging.debug(" > First replay event for connection at %f", tvec[0])
 
         if self._replay is None:
             self._replay = ReplayStim()
-        self._replay.add_spikes(hoc_tvec)
+        if ReplayStim.shared_stims is not None:
+            self._replay.add_shared_spikes(tvec, self.sgid)
+        else:
+            self._replay.add_spikes(Nd.Vector(tvec))
         return len(self._replay)
 
     # -
@@ -364,14 +478,15 @@ class Connection(ConnectionBase):
         self._synapses = compat.List()  # Used by ConnUtils
         self._netcons = []
         self._init_artificial_stims(cell, replay_mode)
+        synapses_params = self.synapse_params
+        synapse_ids = self._synapse_ids
         n_syns = 0
         for syn_i, sec in self.sections_with_synapses:
-            x = self._synapse_points_x[syn_i]
-            syn_params = self._synapse_params[syn_i]
+            syn_params = synapses_params[syn_i]
+            x = syn_params.location
 
             with Nd.section_in_stack(sec):
-                syn_obj = self._create_synapse(cell, syn_params, x,
-                                               self._synapse_ids[syn_i], base_seed)
+                syn_obj = self._create_synapse(cell, syn_params, x, synapse_ids[syn_i], base_seed)
                 n_syns += 1
 
             self._synapses.append(syn_obj)
@@ -428,12 +543,8 @@ class Connection(ConnectionBase):
         if not self._spont_minis:
             self._spont_minis = None
 
-        # Delayed vecs: release if not used, sort if over 1 value
-        total_delays = self._delay_vec.size()
-        if total_delays == 0:
-            self._delay_vec = None
-            self._delayweight_vec = None
-        elif total_delays > 1:
+        # Delayed vecs: sort if over 1 value
+        if self._delay_vec is not None and (total_delays := self._delay_vec.size()) > 1:
             sort_indx = self._delay_vec.sortindex()
             self._delay_vec = Nd.Vector(total_delays).index(self._delay_vec, sort_indx)
             self._delayweight_vec = Nd.Vector(total_delays).index(self._delayweight_vec, sort_indx)
@@ -507,9 +618,10 @@ class Connection(ConnectionBase):
         self._synapses = compat.List()
         self._netcons = []
 
+        synapses_params = self.synapse_params
         for syn_i, sec in self.sections_with_synapses:
-            x = self._synapse_points_x[syn_i]
-            active_params = self._synapse_params[syn_i]
+            active_params = synapses_params[syn_i]
+            x = active_params.location
             gap_junction = Nd.Gap(x, sec=sec)
 
             dbg_conn = GlobalConfig.debug_conn
@@ -565,14 +677,14 @@ class Connection(ConnectionBase):
         """ Internal helper to apply all the configuration statements on
         a given cell synapses
         """
-        for config in self._configurations:
+        for config in self._configurations or ():
             self._configure(cell.CellRef.synlist, config)
 
     def _configure_synapses(self):
         """ Internal helper to apply all the configuration statements to
         the created synapses
         """
-        for config in self._configurations:
+        for config in self._configurations or ():
             self.configure_synapses(config)
 
     def configure_synapses(self, configuration):
@@ -765,19 +877,39 @@ class InhExcSpontMinis(SpontMinis):
 class ReplayStim(ArtificialStim):
     """A class creating/holding replays of a connection
     """
-    __slots__ = ("time_vec")
+    __slots__ = ("time_vec", "_shared_key")
+
+    shared_stims = None
+    """When sharing is enabled, a dict of (sgid, n_spikes, hash) -> [time_vec, {tgid: VecStim}].
+    Connections replaying the same spike train of a source then use a single time vector and,
+    per target cell, a single VecStim (located in the cell), each with its own NetCons
+    """
+
+    @classmethod
+    def enable_sharing(cls, enable=True):
+        """Enables (or disables) the sharing of VecStims among replays of the same source.
+        Entries of previous model builds are always dropped, their VecStims belong to cells
+        which no longer exist.
+        """
+        cls.shared_stims = {} if enable else None
 
     def __init__(self):
         super().__init__()
         self.time_vec = None
+        self._shared_key = None
 
     def create_on(self, conn, sec, syn_obj, syn_params):
         """Inserts a replay stim into the given synapse
         """
-        vecstim = None
-        if self.has_data():
-            vecstim = Nd.VecStim(sec=sec)
+        vecstim = new_vecstim = None
+        shared_entry = self._shared_key and self.shared_stims.get(self._shared_key)
+        if shared_entry and conn.tgid in shared_entry[1]:
+            vecstim = shared_entry[1][conn.tgid]  # Stored (and restarted) only by its creator
+        elif self.has_data():
+            vecstim = new_vecstim = Nd.VecStim(sec=sec)
             vecstim.play(self.time_vec)
+            if shared_entry:
+                shared_entry[1][conn.tgid] = vecstim
 
         if GlobalConfig.debug_conn in ([conn.tgid], [conn.sgid, conn.tgid]):
             log_all(logging.DEBUG, "Creating Replay on %d-%d, times: %s",
@@ -793,7 +925,7 @@ class ReplayStim(ArtificialStim):
         )
         nc.weight[0] = syn_params.weight * conn.weight_factor
         conn.netcon_set_type(nc, syn_obj, NetConType.NC_REPLAY)
-        self._store(vecstim, nc)
+        self._store(new_vecstim, nc)
         return nc
 
     def add_spikes(self, hoc_tvec):
@@ -805,6 +937,22 @@ class ReplayStim(ArtificialStim):
             self.time_vec.append(hoc_tvec)
         self.time_vec.sort()
 
+    def add_shared_spikes(self, tvec, sgid):
+        """Appends replay spikes of a source, reusing the time vector of any other replay
+        of the same source with exactly the same spike train
+        """
+        if self.time_vec is not None:
+            tvec = numpy.concatenate((self.time_vec.as_numpy(), tvec))
+        tvec = numpy.sort(tvec).astype("d")
+        key = (sgid, len(tvec), hash(tvec.tobytes()))
+        shared_entry = self.shared_stims.get(key)
+        if shared_entry is None:
+            shared_entry = self.shared_stims[key] = [Nd.Vector(tvec), {}]
+        elif not numpy.array_equal(shared_entry[0].as_numpy(), tvec):  # hash collision
+            shared_entry, key = [Nd.Vector(tvec), {}], None
+        self.time_vec = shared_entry[0]
+        self._shared_key = key
+
     def has_data(self):
         return self.time_vec is not None
 
@@ -6,7 +6,7 @@ import hashlib
 import logging
 import numpy
 from collections import defaultdict
-from itertools import chain
+from itertools import chain, compress
 from os import path as ospath
 from typing import List, Optional
 
@@ -14,11 +14,11 @@ from .core import NeurodamusCore as Nd
 from .core import ProgressBarRank0 as ProgressBar, MPI
 from .core import run_only_rank0
 from .core.configuration import GlobalConfig, SimConfig, ConfigurationError, find_input_file
-from .connection import Connection, ReplayMode
+from .connection import Connection, ReplayMode, SynapseStore
 from .io.sonata_config import ConnectionTypes
 from .io.synapse_reader import SynapseReader
 from .target_manager import TargetManager, TargetSpec
-from .utils import compat, bin_search, dict_filter_map
+from .utils import compat, dict_filter_map
 from .utils.logging import VERBOSE_LOGLEVEL, log_verbose, log_all
 from .utils.memory import DryRunStats
 from .utils.timeit import timeit
@@ -29,56 +29,141 @@ class ConnectionSet(object):
     """
     A dataset of connections.
     Several populations may exist with different seeds
+
+    Connections are indexed by a sorted array of keys, combining the post-gid (in order of first
+    insertion) and the pre-gid, pointing to the connection objects. New connections are kept in
+    a pending buffer, merged into the index on the first query or when it grows large.
     """
 
+    _SGID_SHIFT = 2 ** 33  # Keys are tgid_slot * _SGID_SHIFT + sgid + 2**32 (sgid may be < 0)
+    _MIN_MERGE_SIZE = 4096
+
     def __init__(self, src_id, dst_id, conn_factory=Connection):
-        # Connections indexed by post-gid, then ordered by pre-gid
         self.src_id = src_id
         self.dst_id = dst_id
         self.src_name = None
         self.dst_name = None
         self.virtual_source = False
         self._conn_factory = conn_factory
-        self._connections_map = defaultdict(list)
-        self._conn_count = 0
+        self.synapse_store = SynapseStore()  # Packed synapses of the connections
+        self._conns = []            # connection objects (None once deleted)
+        self._tgid_slots = {}       # tgid -> slot, in order of first insertion
+        self._slot_tgids = []
+        self._slot_max_sgid = []    # to skip lookups on ordered insertion
+        self._keys = numpy.empty(0, dtype="int64")      # sorted
+        self._conn_idx = numpy.empty(0, dtype="int64")  # index into _conns of each key
+        self._pending = {}          # key -> conn index, not yet merged
+        self._merge_size = self._MIN_MERGE_SIZE
+        self._last_conn = None
+
+    def _key(self, sgid, slot):
+        return slot * self._SGID_SHIFT + sgid + 2 ** 32
+
+    def _slot_key_range(self, slot):
+        return slot * self._SGID_SHIFT, (slot + 1) * self._SGID_SHIFT
+
+    def _merge_pending(self):
+        """Merges the pending connections into the sorted index"""
+        if not self._pending:
+            return
+        new_keys = numpy.fromiter(self._pending.keys(), "int64", len(self._pending))
+        new_idx = numpy.fromiter(self._pending.values(), "int64", len(self._pending))
+        new_order = numpy.argsort(new_keys)
+        keys = numpy.concatenate((self._keys, new_keys[new_order]))
+        conn_idx = numpy.concatenate((self._conn_idx, new_idx[new_order]))
+        order = numpy.argsort(keys, kind="stable")  # merge of two sorted runs
+        self._keys = keys[order]
+        self._conn_idx = conn_idx[order]
+        self._pending = {}
+        self._merge_size = max(self._MIN_MERGE_SIZE, len(keys))  # amortize merges
+
+    def _slot_range(self, tgid):
+        """The range of positions of the connections of a tgid in the (merged) index"""
+        slot = self._tgid_slots.get(tgid)
+        if slot is None:
+            return 0, 0
+        return numpy.searchsorted(self._keys, self._slot_key_range(slot))
+
+    def _positions(self, post_gids=None, pre_gids=None):
+        """The positions in the index of the connections between groups of gids,
+        ordered by post_gids, then pre-gid.
+        """
+        self._merge_pending()
+        if post_gids is None:
+            positions = numpy.arange(len(self._keys))
+        else:
+            post_gids = [post_gids] if isinstance(post_gids, (int, numpy.integer)) else post_gids
+            slots = numpy.fromiter((self._tgid_slots.get(tgid, -1) for tgid in post_gids), "int64")
+            positions = self._slots_positions(slots[slots >= 0])
+        if pre_gids is not None:
+            pre_gids = [pre_gids] if isinstance(pre_gids, (int, numpy.integer)) else list(pre_gids)
+            sgids = self._keys[positions] % self._SGID_SHIFT - 2 ** 32
+            positions = positions[numpy.isin(sgids, numpy.array(pre_gids, dtype="int64"))]
+        return positions
+
+    def _slots_positions(self, slots):
+        """The positions in the (merged) index of the connections of the given slots"""
+        starts = numpy.searchsorted(self._keys, slots * self._SGID_SHIFT)
+        ends = numpy.searchsorted(self._keys, (slots + 1) * self._SGID_SHIFT)
+        lengths = ends - starts
+        return numpy.arange(lengths.sum()) + numpy.repeat(starts - numpy.cumsum(lengths)
+                                                          + lengths, lengths)
+
+    def _conns_at(self, positions):
+        conns = self._conns
+        return [conns[i] for i in self._conn_idx[positions].tolist()]
 
     def __contains__(self, item):
-        return item in self._connections_map
+        self._merge_pending()
+        start, end = self._slot_range(item)
+        return end > start
 
     def __getitem__(self, item):
-        return self._connections_map[item]
+        return self._conns_at(self._positions(item))
 
     def get(self, item):
-        return self._connections_map.get(item)
+        return self[item] if item in self else None
 
     def items(self):
-        """Iterate over the population as tuples (dst_gid, [connections])"""
-        return self._connections_map.items()
+        """Get the population as a list of tuples (dst_gid, [connections])"""
+        self._merge_pending()
+        conns = self._conns_at(slice(None))
+        slots = self._keys // self._SGID_SHIFT
+        bounds = (numpy.flatnonzero(numpy.diff(slots)) + 1).tolist()
+        return [(self._slot_tgids[slots[start]], conns[start:end])
+                for start, end in zip([0] + bounds, bounds + [len(conns)]) if end > start]
 
     def target_gids(self):
         """Get the list of all targets gids in this Population"""
-        return self._connections_map.keys()
+        self._merge_pending()
+        slots = numpy.unique(self._keys // self._SGID_SHIFT)
+        return [self._slot_tgids[slot] for slot in slots.tolist()]
 
     def all_connections(self):
         """Get an iterator over all the connections."""
-        return chain.from_iterable(self._connections_map.values())
+        self._merge_pending()
+        return iter(self._conns_at(slice(None)))
 
-    def _find_connection(self, sgid, tgid, exact=True):
-        """Finds a connection, given its source and destination gids.
+    def positions_between(self, post_gids, pre_gids=None):
+        """The positions in all_connections(), ascending, of the connections between groups
+        of gids. Both are resolved by binary search, the post gids on the sorted keys.
 
-        Returns:
-            tuple: connection list and index.
-                If the element doesnt exist, index depends on 'exact':
-                None if exact=True, otherwise the insertion index.
+        Args:
+            post_gids: The post gids, sorted
+            pre_gids: (optional) The pre gids, sorted. Default: any
         """
-        cell_conns = self._connections_map[tgid]
-        pos = 0
-        if cell_conns:
-            pos = bin_search(cell_conns, sgid, lambda x: x.sgid)
-        if exact and (pos == len(cell_conns) or cell_conns[pos].sgid != sgid):
-            # Not found
-            return cell_conns, None
-        return cell_conns, pos
+        self._merge_pending()
+        slot_tgids = numpy.array(self._slot_tgids, dtype="int64")
+        positions = self._slots_positions(numpy.flatnonzero(_isin_sorted(slot_tgids, post_gids)))
+        if pre_gids is not None:
+            sgids = self._keys[positions] % self._SGID_SHIFT - 2 ** 32
+            positions = positions[_isin_sorted(sgids, pre_gids)]
+        return positions
+
+    def get_connections_at(self, positions):
+        """Get the connections at the given positions of all_connections() (e.g. from a mask)"""
+        self._merge_pending()
+        return self._conns_at(positions)
 
     # -
     def get_connection(self, sgid, tgid):
@@ -87,8 +172,32 @@ class ConnectionSet(object):
         Returns:
             Connection: A connection object if it exists. None otherwise
         """
-        conn_lst, idx = self._find_connection(sgid, tgid)
-        return None if idx is None else conn_lst[idx]
+        slot = self._tgid_slots.get(tgid)
+        if slot is None:
+            return None
+        key = self._key(sgid, slot)
+        idx = self._pending.get(key)
+        if idx is None:
+            pos = numpy.searchsorted(self._keys, key)
+            if pos == len(self._keys) or self._keys[pos] != key:
+                return None
+            idx = self._conn_idx[pos]
+        return self._conns[idx]
+
+    def _insert(self, conn, sgid, tgid):
+        slot = self._tgid_slots.get(tgid)
+        if slot is None:
+            slot = self._tgid_slots[tgid] = len(self._slot_tgids)
+            self._slot_tgids.append(tgid)
+            self._slot_max_sgid.append(sgid)
+        elif sgid > self._slot_max_sgid[slot]:
+            self._slot_max_sgid[slot] = sgid
+        pending = self._pending
+        pending[self._key(sgid, slot)] = len(self._conns)
+        self._conns.append(conn)
+        self._last_conn = conn
+        if len(pending) >= self._merge_size:
+            self._merge_pending()
 
     # -
     def store_connection(self, conn):
@@ -98,109 +207,61 @@ class ConnectionSet(object):
         Args:
             conn: The connection object to be stored
         """
-        cell_conns, pos = self._find_connection(conn.sgid, conn.tgid, exact=False)
-        if cell_conns and pos < len(cell_conns) and cell_conns[pos].sgid == conn.sgid:
+        if self.get_connection(conn.sgid, conn.tgid) is not None:
             logging.error("Attempt to store existing connection: %d->%d",
                           conn.sgid, conn.tgid)
             return
-        self._conn_count += 1
-        cell_conns.insert(pos, conn)
+        self._insert(conn, conn.sgid, conn.tgid)
 
     # -
     def get_or_create_connection(self, sgid, tgid, **kwargs):
         """Returns a connection by pre-post gid, creating if required."""
-        conns = self._connections_map[tgid]
-        pos = 0
-        if conns:
-            # optimize for ordered insertion, and handle when sgid is not used
-            last_conn = conns[-1]
-            if last_conn.sgid in (sgid, None):
-                return last_conn
-            if last_conn.sgid < sgid:
-                pos = len(conns)
-            else:
-                pos = bin_search(conns, sgid, lambda x: x.sgid)
-                if conns[pos].sgid == sgid:
-                    return conns[pos]
-        # Not found. Create & insert
-        cur_conn = self._conn_factory(sgid, tgid, self.src_id, self.dst_id, **kwargs)
-        conns.insert(pos, cur_conn)
-        self._conn_count += 1
+        # optimize for ordered insertion
+        last_conn = self._last_conn
+        if last_conn is not None and last_conn.tgid == tgid and last_conn.sgid == sgid:
+            return last_conn
+        slot = self._tgid_slots.get(tgid)
+        cur_conn = None
+        if slot is not None and sgid <= self._slot_max_sgid[slot]:
+            cur_conn = self.get_connection(sgid, tgid)
+        if cur_conn is None:
+            # Not found. Create & insert
+            cur_conn = self._conn_factory(sgid, tgid, self.src_id, self.dst_id, **kwargs)
+            self._insert(cur_conn, sgid, tgid)
+        self._last_conn = cur_conn
         return cur_conn
 
     # -
     def get_connections(self, post_gids, pre_gids=None):
         """Get all connections between groups of gids."""
-        if isinstance(post_gids, int):
-            if pre_gids is None:
-                return self._connections_map[post_gids]
-            elif isinstance(pre_gids, int):
-                elem = self.get_connection(pre_gids, post_gids)
-                return (elem,) if elem is not None else ()
-
-        post_gid_conn_lists = (
-            self._connections_map.values() if post_gids is None
-            else (self._connections_map[post_gids],) if isinstance(post_gids, int)
-            else (self._connections_map[tgid] for tgid in post_gids)
-        )
-        if pre_gids is None:
-            return chain.from_iterable(post_gid_conn_lists)
-        elif isinstance(pre_gids, int):
-            # Return a generator which is employing bin search
-            return (conns[posi] for conns in post_gid_conn_lists
-                    for posi in (bin_search(conns, pre_gids, lambda x: x.sgid),)
-                    if posi < len(conns) and conns[posi].sgid == pre_gids)
-        else:
-            # Generic case. Looks through all conns in selected tgids
-            pre_gids = set(pre_gids)
-            return (c for conns in post_gid_conn_lists
-                    for c in conns
-                    if c.sgid in pre_gids)
+        return self._conns_at(self._positions(post_gids, pre_gids))
 
     def get_synapse_params_gid(self, target_gid):
         """Get an iterator over all the synapse parameters of a target
         cell connections.
         """
-        conns = self._connections_map[target_gid]
-        return chain.from_iterable(c.synapse_params for c in conns)
+        return chain.from_iterable(c.synapse_params for c in self[target_gid])
 
     def delete(self, sgid, tgid):
         """Removes a given connection from the population."""
-        conn_lst, idx = self._find_connection(sgid, tgid)
-        if idx is None:
+        if self.get_connection(sgid, tgid) is None:
             logging.error("Non-existing connection to delete: %d->%d", sgid, tgid)
             return
-        self._conn_count -= 1
-        del conn_lst[idx]
+        self._delete_positions(self._positions(tgid, sgid))
 
     def delete_group(self, post_gids, pre_gids=None):
         """Removes a set of connections from the population."""
-        for conns, indices in self._find_connections(post_gids, pre_gids):
-            conns[:] = numpy.delete(conns, indices, axis=0).tolist()
-            self._conn_count -= len(indices)
+        self._delete_positions(self._positions(post_gids, pre_gids))
 
-    def count(self):
-        return self._conn_count
+    def _delete_positions(self, positions):
+        for idx in self._conn_idx[positions].tolist():
+            self._conns[idx] = None
+        self._keys = numpy.delete(self._keys, positions)
+        self._conn_idx = numpy.delete(self._conn_idx, positions)
+        self._last_conn = None
 
-    # -
-    def _find_connections(self, post_gids, pre_gids=None):
-        """Get the indices of the connections between groups of gids"""
-        post_gid_conn_lists = (
-            self._connections_map.values() if post_gids is None
-            else (self._connections_map[post_gids],) if isinstance(post_gids, int)
-            else (self._connections_map[tgid] for tgid in post_gids)
-        )
-
-        if pre_gids is None:
-            return ((conns, range(len(conns))) for conns in post_gid_conn_lists)
-
-        sgids_interest = [pre_gids] if isinstance(pre_gids, int) else pre_gids
-        return (
-            (conns, numpy.searchsorted(
-                numpy.fromiter((c.sgid for c in conns), dtype="int64", count=len(conns)),
-                sgids_interest))
-            for conns in post_gid_conn_lists
-        )
+    def count(self):
+        return len(self._keys) + len(self._pending)
 
     def ids_match(self, population_ids, dst_second=None):
         """Whereas a given population_id selector matches population
@@ -323,7 +384,8 @@ class ConnectionManagerBase(object):
     def _open_synapse_file(self, synapse_file, pop_name):
         logging.debug("Opening Synapse file %s, population: %s", synapse_file, pop_name)
         return self.SynapseReader.create(
-            synapse_file, pop_name, extracellular_calcium=SimConfig.extracellular_calcium
+            synapse_file, pop_name, extracellular_calcium=SimConfig.extracellular_calcium,
+            read_threads=SimConfig.edge_read_threads
         )
 
     def _init_conn_population(self, src_pop_name, pop_id_override):
@@ -497,27 +559,83 @@ class ConnectionManagerBase(object):
         Args:
             conn_conf: The configuration block (dict)
         """
-        log_msg = " * Pathway {:s} -> {:s}".format(conn_conf["Source"], conn_conf["Destination"])
+        self.configure_connection_blocks([conn_conf])
+
+    def configure_connection_blocks(self, conn_confs):
+        """Configure-only circuit connections according to a sequence of Connection blocks.
 
+        Blocks are resolved to the positions of their connections, which are
+        then visited once, applying their blocks in order. The result is the same as calling
+        configure_connections() for each block, so the last block setting a property wins.
+
+        Args:
+            conn_confs: The configuration blocks (dicts), in the config order
+        """
+        conn_confs = list(conn_confs)
+        actions = [self._delayed_connection_action(conn_conf) if conn_conf.get("Delay", 0) > 0
+                   else self._configure_group_action(conn_conf)
+                   for conn_conf in conn_confs]
+        target_gids = {}  # cache the gids of the targets, shared by many blocks
+
+        counts = numpy.zeros(len(conn_confs), dtype="int64")
+        for population in self._populations.values():
+            conn_ids, block_ids = [], []
+            for block_i, conn_conf in enumerate(conn_confs):
+                positions = self._target_connections_positions(population, conn_conf["Source"],
+                                                               conn_conf["Destination"],
+                                                               gids_cache=target_gids)
+                if positions is not None:
+                    conn_ids.append(positions)
+                    block_ids.append(numpy.full(len(positions), block_i))
+            if not conn_ids:
+                continue
+            conn_ids = numpy.concatenate(conn_ids)
+            block_ids = numpy.concatenate(block_ids)
+            counts += numpy.bincount(block_ids, minlength=len(conn_confs))
+            order = numpy.argsort(conn_ids, kind="stable")  # keep the blocks order per conn
+            conns = population.get_connections_at(slice(None))
+            conn, last_conn_i = None, -1
+            for conn_i, block_i in zip(conn_ids[order].tolist(), block_ids[order].tolist()):
+                if conn_i != last_conn_i:
+                    conn, last_conn_i = conns[conn_i], conn_i
+                actions[block_i](conn)
+
+        for conn_conf, configured_conns in zip(conn_confs, counts.tolist()):
+            all_ranks_total = MPI.allreduce(configured_conns, MPI.SUM)
+            if all_ranks_total > 0:
+                logging.info(self._conn_block_log_msg(conn_conf))
+                logging.info(" => Configured {:g} connections".format(all_ranks_total))
+
+    @staticmethod
+    def _conn_block_log_msg(conn_conf):
+        log_msg = " * Pathway {:s} -> {:s}".format(conn_conf["Source"], conn_conf["Destination"])
         if "Delay" in conn_conf and conn_conf["Delay"] > 0:
             log_msg += ":\t[DELAYED] t={0[Delay]:g}, weight={0[Weight]:g}".format(conn_conf)
-            configured_conns = self.setup_delayed_connection(conn_conf)
-        else:
-            if "SynapseConfigure" in conn_conf:
-                log_msg += ":\tconfigure with '{:s}'".format(conn_conf["SynapseConfigure"])
-            if "NeuromodStrength" in conn_conf:
-                log_msg += "\toverwrite NeuromodStrength = {:g}" \
-                    .format(conn_conf["NeuromodStrength"])
-            if "NeuromodDtc" in conn_conf:
-                log_msg += "\toverwrite NeuromodDtc = {:g}".format(conn_conf["NeuromodDtc"])
-            configured_conns = self.configure_group(conn_conf)
-
-        all_ranks_total = MPI.allreduce(configured_conns, MPI.SUM)
-        if all_ranks_total > 0:
-            logging.info(log_msg)
-            logging.info(" => Configured {:g} connections".format(all_ranks_total))
+            return log_msg
+        if "SynapseConfigure" in conn_conf:
+            log_msg += ":\tconfigure with '{:s}'".format(conn_conf["SynapseConfigure"])
+        if "NeuromodStrength" in conn_conf:
+            log_msg += "\toverwrite NeuromodStrength = {:g}".format(conn_conf["NeuromodStrength"])
+        if "NeuromodDtc" in conn_conf:
+            log_msg += "\toverwrite NeuromodDtc = {:g}".format(conn_conf["NeuromodDtc"])
+        return log_msg
 
     def setup_delayed_connection(self, conn_config):
+        """Setup delayed connection weights for synapse initialization.
+
+        Args:
+            conn_config: Connection configuration parsed from sonata config
+        """
+        add_delayed_weight = self._delayed_connection_action(conn_config)
+        configured_conns = 0
+        for conn in self.get_target_connections(conn_config["Source"],
+                                                conn_config["Destination"]):
+            add_delayed_weight(conn)
+            configured_conns += 1
+        return configured_conns
+
+    def _delayed_connection_action(self, conn_config):
+        """Returns a function adding the delayed weight of a Connection block to a connection"""
         raise NotImplementedError("Manager %s doesn't implement delayed connections"
                                   % self.__class__.__name__)
 
@@ -539,13 +657,14 @@ class ConnectionManagerBase(object):
         conn_options = {'weight_factor': weight_factor}
         pop = self._cur_population
 
-        for sgid, tgid, syns_params, extra_params, offset in \
+        for syns_params, segments in \
                 self._iterate_conn_params(self._src_target_filter, None, only_gids, True):
-            if self._load_offsets:
-                conn_options["synapses_offset"] = extra_params["synapse_index"][0]
-            # Create all synapses. No need to lock since the whole file is consumed
-            cur_conn = pop.get_or_create_connection(sgid, tgid, **conn_options)
-            self._add_synapses(cur_conn, syns_params, None, offset)
+            for sgid, tgid, start, end, offset, syn_index in segments.tolist():
+                if self._load_offsets:
+                    conn_options["synapses_offset"] = syn_index
+                # Create all synapses. No need to lock since the whole file is consumed
+                cur_conn = pop.get_or_create_connection(sgid, tgid, **conn_options)
+                self._add_synapses(cur_conn, syns_params[start:end], None, offset)
 
     # -
     def connect_group(self, conn_source, conn_destination, synapse_type_restrict=None,
@@ -577,25 +696,27 @@ class ConnectionManagerBase(object):
             self._dry_run_stats.synapse_counts[self.CONNECTIONS_TYPE] += syn_count
             return
 
-        for sgid, tgid, syns_params, extra_params, offset in \
+        for syns_params, segments in \
                 self._iterate_conn_params(src_target, dst_target, mod_override=mod_override):
-            if sgid == tgid:
+            for sgid in segments["sgid"][segments["sgid"] == segments["tgid"]]:
                 logging.warning("Making connection within same Gid: %d", sgid)
-            if self._load_offsets:
-                conn_kwargs["synapses_offset"] = extra_params["synapse_index"][0]
 
-            cur_conn = pop.get_or_create_connection(sgid, tgid, **conn_kwargs)
-            if cur_conn.locked:
-                continue
-            self._add_synapses(cur_conn, syns_params, synapse_type_restrict, offset)
-            cur_conn.locked = True
+            for sgid, tgid, start, end, offset, syn_index in segments.tolist():
+                if self._load_offsets:
+                    conn_kwargs["synapses_offset"] = syn_index
+                cur_conn = pop.get_or_create_connection(sgid, tgid, **conn_kwargs)
+                if cur_conn.locked:
+                    continue
+                self._add_synapses(cur_conn, syns_params[start:end], synapse_type_restrict, offset)
+                cur_conn.locked = True
 
     # -
     def _add_synapses(self, cur_conn, syns_params, syn_type_restrict=None, base_id=0):
         if syn_type_restrict:
             syns_params = syns_params[syns_params['synType'] != syn_type_restrict]
 
-        cur_conn.add_synapses(self._target_manager, syns_params, base_id)
+        cur_conn.add_synapses(self._target_manager, syns_params, base_id,
+                              self._cur_population.synapse_store)
 
     # -
     def get_population_offsets(self):
@@ -619,14 +740,28 @@ class ConnectionManagerBase(object):
                 log_all(logging.DEBUG, "Connection (%d-%d). Params:\n%s",
                         sgid, base_tgid, syns_params)
 
+        def register_segments(self, syns_params, segments):
+            if not GlobalConfig.debug_conn:
+                return
+            for sgid, base_tgid, start, end, *_ in segments.tolist():
+                self.register(sgid, base_tgid, syns_params[start:end])
+
         def __del__(self):
             if self.yielded_src_gids:
                 log_all(logging.DEBUG, "Source GIDs for debug cell: %s", self.yielded_src_gids)
 
+    CONN_BATCH_SIZE = 1000
+    """The number of target gids whose connections are grouped at once"""
+
     # -
     def _iterate_conn_params(self, src_target, dst_target, gids=None, show_progress=False,
                              mod_override=None):
-        """A generator which loads synapse data and yields tuples(sgid, tgid, synapses)
+        """A generator which loads synapse data and yields, for batches of tgids, tuples
+        (syn_params, segments)
+
+        Connections are described by the segments array (see CONN_SEGMENT_DTYPE), whose
+        fields hold the final sgid and tgid, the range of the connection synapses in
+        syn_params, the offset of the first synapse within its tgid and its synapse index.
 
         Args:
             src_target: the target to filter the source cells, or None
@@ -651,58 +786,29 @@ class ConnectionManagerBase(object):
 
         self._synapse_reader.configure_override(mod_override)
         self._synapse_reader.preload_data(gids)
-        extra_fields = {}  # Without extra fields, reuse this object
+        conn_debugger = self.ConnDebugger()
 
         # NOTE: This routine is quite critical, sitting at the core of synapse processing
-        # so it has been carefully optimized with numpy vectorized operations, even if
-        # it might lose some readability.
-        # For each tgid we obtain the synapse parameters as a record array. We then split it,
-        # without copying, yielding ranges (views) of it.
-
-        gids = ProgressBar.iter(gids) if show_progress else gids
-
-        for base_tgid in gids:
-            tgid = base_tgid + tgid_offset
-            syns_params = self._synapse_reader.get_synapse_parameters(base_tgid)
-            logging.debug("GID %d Syn count: %d", tgid, len(syns_params))
-
-            if self._load_offsets:
-                syn_index = self._synapse_reader.get_property(base_tgid, "synapse_index")
-                extra_fields = {"synapse_index": syn_index}
-
-            # We yield ranges of contiguous parameters belonging to the same connection,
-            # and given we have data for a single tgid, enough to group by sgid.
-            # The first row of a range is found by numpy.diff
-
-            sgids = syns_params[syns_params.dtype.names[0]].astype("int64")  # src gid in field 0
-            sgids_ranges = numpy.diff(sgids, prepend=numpy.nan, append=numpy.nan).nonzero()[0]
-            conn_count = len(sgids_ranges) - 1
-            conn_debugger = self.ConnDebugger()
-
-            if src_target:
-                # create a set with the gids that belong both to the synapses and the target
-                unique_sgids = sgids[sgids_ranges[:-1]]
-                allowed_sgids = set(unique_sgids[src_target.contains(unique_sgids, raw_gids=True)])
-                n_yielded_conns = len(allowed_sgids)
-                allowed_ranges = [(sgids_ranges[i], sgids_ranges[i+1]) for i in range(conn_count)
-                                  if sgids[sgids_ranges[i]] in allowed_sgids]
-            else:
-                n_yielded_conns = conn_count
-                allowed_ranges = [(sgids_ranges[i], sgids_ranges[i+1]) for i in range(conn_count)]
-
-            for range_start, range_end in allowed_ranges:
-                sgid = int(sgids[range_start])
-                final_sgid = sgid + sgid_offset
-                syn_params = syns_params[range_start:range_end]
-                extra_params = extra_fields and {  # reuse empty {}. Dont modify later!
-                    name: prop[range_start:range_end]
-                    for name, prop in extra_fields.items()
-                }
-                conn_debugger.register(sgid, base_tgid, syn_params)
-                yield final_sgid, tgid, syn_params, extra_params, range_start
-
-            logging.debug(" > Yielded %d out of %d connections. (Filter by src Target: %s)",
-                          n_yielded_conns, conn_count, src_target and src_target.name)
+        # so it has been carefully optimized with numpy vectorized operations.
+        # For each batch of tgids the reader groups synapses in connections, returning
+        # the segments of the (whole) parameters recarray. Filtering by the src target is
+        # then a single lookup for all the connections in the batch.
+
+        batches = list(gen_ranges(len(gids), self.CONN_BATCH_SIZE))
+        batches = ProgressBar.iter(batches) if show_progress else batches
+
+        for batch_start, batch_end in batches:
+            for syns_params, segments in \
+                    self._synapse_reader.get_conn_segments(gids[batch_start:batch_end]):
+                conn_count = len(segments)
+                if src_target:
+                    segments = segments[src_target.contains(segments["sgid"], raw_gids=True)]
+                logging.debug(" > Yielded %d out of %d connections. (Filter by src Target: %s)",
+                              len(segments), conn_count, src_target and src_target.name)
+                conn_debugger.register_segments(syns_params, segments)
+                segments["sgid"] += sgid_offset
+                segments["tgid"] += tgid_offset
+                yield syns_params, segments
 
         created_conns = self._cur_population.count() - created_conns_0
         self._total_connections += created_conns
@@ -819,31 +925,50 @@ class ConnectionManagerBase(object):
              selected_gids: (optional) post gids to select (original, w/o offsetting)
              conn_population: restrict the set of connections to be returned
         """
-        src_target_spec = TargetSpec(src_target_name)
-        dst_target_spec = TargetSpec(dst_target_name)
-
-        src_target = self._target_manager.get_target(src_target_spec) \
-            if src_target_spec.name is not None else None
-        assert dst_target_spec.name, "No target specified for `get_target_connections`"
-        dst_target = self._target_manager.get_target(dst_target_spec)
-        if src_target and src_target.is_void() or dst_target.is_void():
-            return
-
-        _, tgid_offset = self.get_population_offsets()
         populations: List[ConnectionSet] = (conn_population,) if conn_population is not None \
             else self._populations.values()
+        target_gids = {}
 
-        # temporary set for faster lookup
-        src_gids = src_target and set(src_target.get_gids())
         for population in populations:
             logging.debug("Connections from population %s", population)
-            tgids = numpy.fromiter(population.target_gids(), 'uint32')
-            tgids = numpy.intersect1d(tgids, dst_target.get_gids())
-            if selected_gids:
-                tgids = numpy.intersect1d(tgids, selected_gids + tgid_offset)
-            for conn in population.get_connections(tgids):
-                if src_target is None or conn.sgid in src_gids:
-                    yield conn
+            positions = self._target_connections_positions(population, src_target_name,
+                                                           dst_target_name, selected_gids,
+                                                           target_gids)
+            if positions is None:
+                return
+            yield from population.get_connections_at(positions)
+
+    def _target_connections_positions(self, population, src_target_name, dst_target_name,
+                                      selected_gids=None, gids_cache=None):
+        """The positions in population.all_connections() of the connections between src-dst
+        cell targets. None if any of the targets is void.
+
+        Args:
+             selected_gids: (optional) post gids to select (original, w/o offsetting)
+             gids_cache: (optional) A dict to cache the sorted gids of the targets across calls
+        """
+        gids_cache = {} if gids_cache is None else gids_cache
+
+        def get_target_gids(target_name):
+            if target_name not in gids_cache:
+                target = self._target_manager.get_target(TargetSpec(target_name))
+                gids_cache[target_name] = None if target.is_void() \
+                    else numpy.unique(numpy.asarray(target.get_gids(), dtype="int64"))
+            return gids_cache[target_name]
+
+        assert TargetSpec(dst_target_name).name, \
+            "No target specified for `get_target_connections`"
+        dst_gids = get_target_gids(dst_target_name)
+        has_src_target = TargetSpec(src_target_name).name is not None
+        src_gids = get_target_gids(src_target_name) if has_src_target else None
+        if dst_gids is None or has_src_target and src_gids is None:
+            return None
+
+        if selected_gids:
+            _, tgid_offset = self.get_population_offsets()
+            selected_gids = numpy.asarray(selected_gids, dtype="int64") + tgid_offset
+            dst_gids = dst_gids[_isin_sorted(dst_gids, numpy.unique(selected_gids))]
+        return population.positions_between(dst_gids, src_gids)
 
     # -
     def configure_group(self, conn_config, gidvec=None):
@@ -853,8 +978,16 @@ class ConnectionManagerBase(object):
             conn_config: The connection configuration dict
             gidvec: A restricted set of gids to configure (original, w/o offsetting)
         """
-        src_target = conn_config["Source"]
-        dst_target = conn_config["Destination"]
+        configure = self._configure_group_action(conn_config)
+        configured_conns = 0
+        for conn in self.get_target_connections(conn_config["Source"],
+                                                conn_config["Destination"], gidvec):
+            configure(conn)
+            configured_conns += 1
+        return configured_conns
+
+    def _configure_group_action(self, conn_config):
+        """Returns a function configuring a connection according to a config Connection block"""
         _properties = {
             "Weight": "weight_factor",
             "SpontMinis": "minis_spont_rate",
@@ -865,23 +998,24 @@ class ConnectionManagerBase(object):
         syn_params = dict_filter_map(conn_config, _properties)
 
         # Load eventual mod override helper
+        mod_override = None
         if "ModOverride" in conn_config:
             logging.info("   => Overriding mod: %s", conn_config["ModOverride"])
             override_helper = conn_config["ModOverride"] + "Helper"
             Nd.load_hoc(override_helper)
             assert hasattr(Nd.h, override_helper), \
                 "ModOverride helper doesn't define hoc template: " + override_helper
+            mod_override = conn_config.get('hoc') or compat.PyMap(conn_config).hoc_map
+        synapse_configure = conn_config.get("SynapseConfigure")
 
-        configured_conns = 0
-        for conn in self.get_target_connections(src_target, dst_target, gidvec):
+        def configure(conn):
             for key, val in syn_params.items():
                 setattr(conn, key, val)
-            if "ModOverride" in conn_config:
-                conn.override_mod(conn_config.get('hoc') or compat.PyMap(conn_config).hoc_map)
-            if "SynapseConfigure" in conn_config:
-                conn.add_synapse_configuration(conn_config["SynapseConfigure"])
-            configured_conns += 1
-        return configured_conns
+            if mod_override is not None:
+                conn.override_mod(mod_override)
+            if synapse_configure is not None:
+                conn.add_synapse_configuration(synapse_configure)
+        return configure
 
     # -
     def configure_group_delayed(self, conn_config, gidvec=None):
@@ -1118,6 +1252,15 @@ class ConnectionManagerBase(object):
 # Helper methods
 # ##############
 
+def _isin_sorted(values, sorted_array):
+    """A mask of the values found in a sorted array, by binary search"""
+    if not len(sorted_array):
+        return numpy.zeros(len(values), dtype=bool)
+    idx = numpy.searchsorted(sorted_array, values)
+    idx[idx == len(sorted_array)] = 0
+    return sorted_array[idx] == values
+
+
 def edge_node_pop_names(edge_file, edge_pop_name, src_pop_name=None, dst_pop_name=None):
     """Find/decides the node populations names from several edge configurations
 
@@ -1241,25 +1384,21 @@ class SynapseRuleManager(ConnectionManagerBase):
         return super()._finalize_conns(tgid, conns, base_seed, sim_corenrn, reverse=True, **kw)
 
     # -
-    def setup_delayed_connection(self, conn_config):
-        """Setup delayed connection weights for synapse initialization.
-
-        Find source and target gids and the associated connection,
-        and add the delay and weight to their delay vectors.
-
-        Args:
-            conn_config: Connection configuration parsed from sonata config
-        """
-        src_target_name = conn_config["Source"]
-        dst_target_name = conn_config["Destination"]
+    def _delayed_connection_action(self, conn_config):
+        """Add the delay and weight of a Connection block to the connection delay vectors"""
         delay = conn_config["Delay"]
         new_weight = conn_config.get("Weight", .0)
+        return lambda conn: conn.add_delayed_weight(delay, new_weight)
 
-        configured_conns = 0
-        for conn in self.get_target_connections(src_target_name, dst_target_name):
-            conn.add_delayed_weight(delay, new_weight)
-            configured_conns += 1
-        return configured_conns
+    # -
+    def get_source_gids(self, src_target_name, dst_target_name):
+        """Returns the (unique) raw gids of the sources of the local connections
+        between the given targets
+        """
+        sgids = numpy.fromiter(
+            (conn.sgid for conn in self.get_target_connections(src_target_name, dst_target_name)),
+            dtype="int64")
+        return numpy.unique(sgids - self.src_pop_offset)
 
     # -
     @timeit(name="Replay inject")
@@ -1280,13 +1419,25 @@ class SynapseRuleManager(ConnectionManagerBase):
             start_delay = Nd.t
             log_verbose("Restore: Delivering events only after t=%.4f", start_delay)
 
-        src_pop_offset = self.src_pop_offset
+        conns = list(self.get_target_connections(src_target_name, dst_target_name))
+        raw_sgids = numpy.fromiter((conn.sgid for conn in conns), "int64", len(conns))
+        raw_sgids -= self.src_pop_offset
+        spike_gids, offsets, spike_times = spike_manager.get_map().csr()
+
+        # Drop events before start_delay, keeping the ranges of each gid into the kept events
+        deliver = spike_times >= start_delay
+        kept_offsets = numpy.concatenate(([0], numpy.cumsum(deliver)))
+        spike_times = spike_times[deliver]
+
+        with_spikes = numpy.isin(raw_sgids, spike_gids)
+        spike_idx = numpy.searchsorted(spike_gids, raw_sgids[with_spikes])
+        starts = kept_offsets[offsets[spike_idx]]
+        ends = kept_offsets[offsets[spike_idx + 1]]
 
-        for conn in self.get_target_connections(src_target_name, dst_target_name):
-            raw_sgid = conn.sgid - src_pop_offset
-            if raw_sgid not in spike_manager:
+        for conn, start, end in zip(compress(conns, with_spikes), starts, ends):
+            if start == end:  # No events after start_delay
                 continue
-            conn.replay(spike_manager[raw_sgid], start_delay)
+            conn.replay(spike_times[start:end], start_delay)
             replayed_count += 1
 
         total_replays = MPI.allreduce(replayed_count, MPI.SUM)
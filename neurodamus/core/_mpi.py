@@ -4,6 +4,7 @@ Internal module which defines an MPI object based on Neuron's ParallelContext
 import logging
 import sys
 import time
+import numpy
 from ._neuron import Neuron
 
 
@@ -107,6 +108,61 @@ class _MPI(object):
                 reduce_f(aggregated_object, obj)
         return aggregated_object
 
+    def py_exscan(self, value):
+        """
+        An exclusive prefix sum of a local integer across ranks, e.g. to compute the offsets
+        of the ranks data in a shared output. Returns 0 in rank 0.
+
+        Uses MPI_Exscan via mpi4py when available. Otherwise it falls back to a prefix sum
+        of all the values, gathered to every rank (O(ranks) data per rank).
+        """
+        if self.size == 1:
+            return 0
+        try:
+            from mpi4py import MPI as MPI4Py
+        except ModuleNotFoundError:
+            all_values = self.pc.py_allgather(value)
+            return sum(all_values[:self.rank], 0)
+        offset = numpy.zeros(1, dtype="int64")
+        MPI4Py.COMM_WORLD.Exscan(numpy.array([value], dtype="int64"), offset, op=MPI4Py.SUM)
+        return 0 if self.rank == 0 else int(offset[0])  # undefined in rank 0
+
+    def write_ordered(self, filename, local_data, header=b""):
+        """
+        Collectively writes the local data (bytes) of all ranks to a single file, in rank order.
+
+        Each rank writes its own slice at an offset given by an exclusive scan of the byte counts,
+        using MPI-IO. The header (from rank 0) is written at the beginning of the file.
+        Without mpi4py the data is gathered to rank 0, which writes the file.
+        """
+        if self.size == 1:
+            with open(filename, "wb") as f:
+                f.write(header)
+                f.write(local_data)
+            return
+
+        try:
+            from mpi4py import MPI as MPI4Py
+        except ModuleNotFoundError:
+            all_data = self.py_gather(local_data, 0)
+            if self.rank == 0:
+                with open(filename, "wb") as f:
+                    f.write(header)
+                    for rank_data in all_data:
+                        f.write(rank_data)
+            return
+
+        if self.rank == 0:
+            local_data = header + local_data
+        offset = self.py_exscan(len(local_data))
+        comm = MPI4Py.COMM_WORLD
+        fh = MPI4Py.File.Open(comm, str(filename), MPI4Py.MODE_WRONLY | MPI4Py.MODE_CREATE)
+        try:
+            fh.Set_size(0)  # truncate existing files
+            fh.Write_at_all(offset, local_data)
+        finally:
+            fh.Close()
+
 
 MPI = _MPI()
 """A singleton of MPI runtime information"""
@@ -65,8 +65,8 @@ endtemplate {cls_name}"""
         # try and determine format
         if morpho_path.endswith(('h5', 'H5')):
             if(export_commands):
-                from neurodamus.morphio_wrapper import MorphIOWrapper
-                self._commands = MorphIOWrapper(morpho_path).morph_as_hoc()
+                from neurodamus.morphio_wrapper import morphology_cache
+                self._commands = morphology_cache.get(morpho_path).morph_as_hoc()
             h.morphio_read(self.h, morpho_path)
             self._soma = self.h.soma[0]
 
@@ -76,8 +76,15 @@ class CliOptions(ConfigT):
     simulator = None
     dry_run = False
     num_target_ranks = None
+    dry_run_synapse_factor = None
     keep_axon = False
     coreneuron_direct_mode = False
+    edge_read_threads = None
+    distributed_replay = False
+    shared_replay_stims = False
+    stream_spikes = False
+    morphology_cache_size = None
+    prefetch_morphologies = None
 
     # Restricted Functionality support, mostly for testing
 
@@ -238,6 +245,7 @@ class _SimConfig(object):
     dry_run = False
     num_target_ranks = None
     coreneuron_direct_mode = False
+    edge_read_threads = None
 
     _validators = []
     _requisitors = []
@@ -274,6 +282,7 @@ class _SimConfig(object):
         cls.cli_options = CliOptions(**(cli_options or {}))
         cls.dry_run = cls.cli_options.dry_run
         cls.num_target_ranks = cls.cli_options.num_target_ranks
+        cls.edge_read_threads = cls.cli_options.edge_read_threads
         # change simulator by request before validator and init hoc config
         if cls.cli_options.simulator:
             cls._parsed_run["Simulator"] = cls.cli_options.simulator
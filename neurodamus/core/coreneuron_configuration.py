@@ -1,68 +1,78 @@
 import os
 import logging
 from pathlib import Path
+import numpy
 from ._utils import run_only_rank0
 from . import NeurodamusCore as Nd
 from ..report import get_section_index
+from ..utils import compat
 
 
 class CompartmentMapping:
     """ Interface to register section segment mapping with NEURON.
     """
+    _sections = [
+        ('somatic', 'soma'),
+        ('axonal', 'axon'),
+        ('basal', 'dend'),
+        ('apical', 'apic'),
+        ('AIS', 'ais'),
+        ('nodal', 'node'),
+        ('myelinated', 'myelin')
+    ]
+
     def __init__(self, cell_distributor):
         self.cell_distributor = cell_distributor
         self.pc = Nd.ParallelContext()
 
-    def create_section_vectors(self, section_id, section, secvec, segvec):
-        num_segments = 0
-        for seg in section:
-            secvec.append(section_id)
-            segvec.append(seg.node_index())
-            num_segments += 1
-
-        return num_segments
+    @staticmethod
+    def section_vectors(cell, section_list):
+        """Builds the section ids and segment node indices of all the segments of a section list,
+        as numpy arrays.
+        """
+        sections = list(section_list)
+        if not sections:
+            return numpy.empty(0), numpy.empty(0)
+        section_ids = [get_section_index(cell, sec) for sec in sections]
+        num_segments = [sec.nseg for sec in sections]
+        secvec = numpy.repeat(numpy.array(section_ids, dtype=float), num_segments)
+        segvec = numpy.fromiter((seg.node_index() for sec in sections for seg in sec),
+                                dtype=float, count=len(secvec))
+        return secvec, segvec
 
     def process_section(self, cell, sections, num_electrodes, all_lfp_factors, section_offset):
-        secvec, segvec, lfp_factors = Nd.Vector(), Nd.Vector(), Nd.Vector()
-        num_segments = 0
-        section_attr = getattr(cell, sections[0], None)
-        if section_attr:
-            for sec in section_attr:
-                section_index = get_section_index(cell, sec)
-                num_segments += self.create_section_vectors(section_index, sec, secvec, segvec)
-
-        if num_electrodes > 0 and all_lfp_factors.size() > 0 and num_segments > 0:
+        section_list = getattr(cell, sections[0], None)
+        secvec, segvec = (self.section_vectors(cell, section_list) if section_list
+                          else (numpy.empty(0), numpy.empty(0)))
+        num_segments = len(secvec)
+
+        lfp_factors = numpy.empty(0)
+        if num_electrodes > 0 and all_lfp_factors.size > 0 and num_segments > 0:
+            # all_lfp_factors is flattened (segments x electrodes)
             start_idx = section_offset * num_electrodes
-            end_idx = (section_offset + num_segments) * num_electrodes - 1
-            lfp_factors.copy(all_lfp_factors, start_idx, end_idx)
+            end_idx = (section_offset + num_segments) * num_electrodes
+            lfp_factors = all_lfp_factors[start_idx:end_idx]
 
-        self.pc.nrnbbcore_register_mapping(cell.gid, sections[1], secvec, segvec,
-                                           lfp_factors, num_electrodes)
+        self.pc.nrnbbcore_register_mapping(cell.gid, sections[1], compat.hoc_vector(secvec),
+                                           compat.hoc_vector(segvec),
+                                           compat.hoc_vector(lfp_factors), num_electrodes)
         return num_segments
 
     def register_mapping(self):
-        sections = [
-            ('somatic', 'soma'),
-            ('axonal', 'axon'),
-            ('basal', 'dend'),
-            ('apical', 'apic'),
-            ('AIS', 'ais'),
-            ('nodal', 'node'),
-            ('myelinated', 'myelin')
-        ]
         gidvec = self.cell_distributor.getGidListForProcessor()
+        lfp_manager = getattr(self.cell_distributor, "_lfp_manager", None)
         for activegid in gidvec:
             cellref = self.cell_distributor.getCell(activegid)
-            all_lfp_factors = Nd.Vector()
+            all_lfp_factors = numpy.empty(0)
             num_electrodes = 0
-            lfp_manager = getattr(self.cell_distributor, "_lfp_manager", None)
             if lfp_manager:
                 pop_info = self.cell_distributor.getPopulationInfo(activegid)
-                num_electrodes = lfp_manager.get_number_electrodes(activegid, pop_info)
-                all_lfp_factors = lfp_manager.read_lfp_factors(activegid, pop_info)
+                lfp_factors = lfp_manager.get_lfp_factors(activegid, pop_info)
+                num_electrodes = lfp_factors.shape[1] if lfp_factors.ndim > 1 else 0
+                all_lfp_factors = numpy.ravel(lfp_factors)
 
             section_offset = 0
-            for section in sections:
+            for section in self._sections:
                 processed_segments = self.process_section(cellref, section, num_electrodes,
                                                           all_lfp_factors, section_offset)
                 section_offset += processed_segments
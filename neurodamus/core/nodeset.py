@@ -206,7 +206,7 @@ class NodeSet(_NodeSetBase):
         Args:
             gids: The gids to handle
             gid_info: a map containing METype information about each cell.
-                In v5 and v6 values are METypeItem's
+                In v5 and v6 a METypeManager, whose values are METypeItem's
 
         """
         super().__init__()
@@ -224,7 +224,19 @@ class NodeSet(_NodeSetBase):
         if len(gids) > 0:
             self._max_gid = max(self.max_gid, max(gids))
         if gid_info:
-            self._gid_info.update(gid_info)
+            if isinstance(gid_info, _GidInfoGroup) and not self._gid_info:
+                self._gid_info = _GidInfoGroup(gid_info)  # a copy, not to add to other's group
+            elif hasattr(gid_info, "get_items") and not self._gid_info:
+                self._gid_info = gid_info  # keep the (columnar) METypeManager, no per-gid copies
+            elif not self._gid_info:
+                self._gid_info = dict(gid_info)
+            elif hasattr(self._gid_info, "get_items") or hasattr(gid_info, "get_items"):
+                # Managers are owned by the caller: group them instead of merging
+                if not isinstance(self._gid_info, _GidInfoGroup):
+                    self._gid_info = _GidInfoGroup(self._gid_info)
+                self._gid_info.add(gid_info)
+            else:
+                self._gid_info.update(gid_info)
         self._check_update_offsets()  # check offsets (uses reduce)
         return self
 
@@ -239,8 +251,13 @@ class NodeSet(_NodeSetBase):
 
     def items(self, final_gid=False):
         offset_add = self._offset if final_gid else 0
-        for gid in self._gidvec:
-            yield gid + offset_add, self._gid_info.get(gid)
+        gid_info = self._gid_info
+        if hasattr(gid_info, "get_items"):  # METypeManager: vectorized lookup
+            infos = gid_info.get_items(self.raw_gids())
+        else:
+            infos = (gid_info.get(gid) for gid in self._gidvec)
+        for gid, info in zip(self._gidvec, infos):
+            yield gid + offset_add, info
 
     def intersection(self, other, raw_gids=False):
         """Computes the intersection of two NodeSet's
@@ -259,6 +276,43 @@ class NodeSet(_NodeSetBase):
         self._gid_info = None
 
 
+class _GidInfoGroup:
+    """A read-only lookup of gid info over several maps (e.g. METypeManager's)
+
+    Like in dict.update, the info from the maps added last takes precedence
+    """
+
+    def __init__(self, gid_info):
+        self._parts = []
+        self.add(gid_info)
+
+    def add(self, gid_info):
+        if isinstance(gid_info, _GidInfoGroup):
+            self._parts.extend(gid_info._parts)
+        else:
+            self._parts.append(gid_info)
+
+    def __len__(self):
+        return sum(len(part) for part in self._parts)
+
+    def get(self, gid, default=None):
+        for part in reversed(self._parts):
+            info = part.get(gid)
+            if info is not None:
+                return info
+        return default
+
+    def get_items(self, gids):
+        """Iterates over the info of several gids (None for unknown)"""
+        gids = numpy.asarray(gids, dtype="uint32")
+        infos = [None] * len(gids)
+        for part in self._parts:
+            part_infos = part.get_items(gids) if hasattr(part, "get_items") \
+                else (part.get(gid) for gid in gids.tolist())
+            infos = [old if new is None else new for old, new in zip(infos, part_infos)]
+        return iter(infos)
+
+
 class SelectionNodeSet(_NodeSetBase):
     """
     A lightweight shim over a `libsonata.Selection` so that gids get offset
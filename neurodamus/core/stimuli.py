@@ -6,6 +6,34 @@ from __future__ import absolute_import
 from . import Neuron
 from .random import RNG, gamma
 import logging
+import numpy
+
+
+def _ar1_filter(innovations, coef):
+    """Computes the autoregressive process y[n] = coef * y[n - 1] + innovations[n], y[-1] = 0.
+
+    Uses scipy's lfilter when available. Otherwise a cumulative sum formulation, in blocks
+    short enough so that coef ** -block_len (up to 1e4) keeps precision.
+    """
+    innovations = numpy.asarray(innovations, dtype=float)
+    try:
+        from scipy.signal import lfilter
+        return lfilter([1.], [1., -coef], innovations)
+    except ImportError:
+        pass
+
+    if coef == 0 or len(innovations) == 0:
+        return innovations.copy()
+    block_len = max(1, int(numpy.log(1e4) / -numpy.log(coef)))
+    powers = coef ** numpy.arange(block_len)
+    out = numpy.empty_like(innovations)
+    prev = 0.
+    for start in range(0, len(innovations), block_len):
+        block = innovations[start:start + block_len]
+        n = len(block)
+        out[start:start + n] = powers[:n] * (coef * prev + numpy.cumsum(block / powers[:n]))
+        prev = out[start + n - 1]
+    return out
 
 
 class SignalSource:
@@ -222,8 +250,8 @@ class SignalSource:
         ev.where("<", duration)  # remove events exceeding duration
         ev.div(dt)  # divide events by timestep
 
-        nev = Neuron.h.Vector([round(x) for x in ev])  # round to integer timestep index
-        nev.where("<", ntstep)  # remove events exceeding number of timesteps
+        nev = numpy.round(ev.as_numpy()).astype(int)  # round to integer timestep index
+        nev = nev[nev < ntstep]  # remove events exceeding number of timesteps
 
         sign = 1
         # if amplitude mean is negative, invert sign of current
@@ -236,9 +264,9 @@ class SignalSource:
         # sample gamma-distributed amplitudes
         amp = gamma(rng, gamma_shape, gamma_scale, len(nev))
 
-        E = Neuron.h.Vector(ntstep, 0)  # full signal
-        for n, A in zip(nev, amp):
-            E.x[int(n)] += sign * A  # add impulses, may overlap due to rounding to timestep
+        E = numpy.zeros(ntstep)  # full signal
+        # add impulses, may overlap due to rounding to timestep
+        numpy.add.at(E, nev, sign * amp.as_numpy())
 
         # perform equivalent of convolution with bi-exponential impulse response
         # through a composite autoregressive process with impulse train as innovations
@@ -251,21 +279,19 @@ class SignalSource:
         t_peak = log(R / D) / (R - D)
         A = (a / b - 1) / (a ** t_peak - b ** t_peak)
 
-        P = Neuron.h.Vector(ntstep, 0)
-        B = Neuron.h.Vector(ntstep, 0)
-
         # composite autoregressive process with exact solution
         # P[n] = b * (a ^ n - b ^ n) / (a - b)
         # for unit response B[0] = P[0] = 0, E[0] = 1
-        for n in range(1, ntstep):
-            P.x[n] = a * P[n - 1] + b * B[n - 1]
-            B.x[n] = b * B[n - 1] + E[n - 1]
+        #   P[n] = a * P[n - 1] + b * B[n - 1]
+        #   B[n] = b * B[n - 1] + E[n - 1]
+        B = _ar1_filter(numpy.concatenate(([0.], E[:-1])), b)
+        P = _ar1_filter(numpy.concatenate(([0.], b * B[:-1])), a)
 
-        P.mul(A)  # normalize to peak amplitude
+        P *= A  # normalize to peak amplitude
 
         self._add_point(self._base_amp)
         self.time_vec.append(tvec)
-        self.stim_vec.append(P)
+        self.stim_vec.append(Neuron.h.Vector(P))
         self._cur_t += duration
         self._add_point(self._base_amp)
 
@@ -306,8 +332,10 @@ class SignalSource:
             noise.mul(A)  # scale noise by amplitude [uS]
 
             # Exact update formula (independent of dt) from Gillespie 1996
-            for n in range(1, ntstep):
-                svec.x[n] = svec[n - 1] * mu + noise[n]  # signal [uS]
+            #   svec[n] = svec[n - 1] * mu + noise[n]  # signal [uS]
+            innovations = noise.as_numpy().copy()
+            innovations[:1] = 0.  # svec[0] = 0
+            svec = Neuron.h.Vector(_ar1_filter(innovations, mu))
 
         svec.add(mean)  # shift signal by mean value [uS]
 
@@ -92,7 +92,7 @@ class GapJunctionManager(ConnectionManagerBase):
         """Gap Junctions dont use connection blocks, connect all belonging to target"""
         self.connect_all()
 
-    def configure_connections(self, conn_conf):
+    def configure_connection_blocks(self, conn_confs):
         """Gap Junctions dont configure_connections"""
         pass
 
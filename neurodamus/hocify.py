@@ -1,6 +1,10 @@
+import hashlib
+import json
 import logging
 import multiprocessing
 import os
+import time
+from collections import defaultdict
 from time import strftime
 
 from .core import Cell
@@ -8,6 +12,10 @@ from .utils.logging import setup_logging, log_stage, log_verbose
 from .utils.progressbar import ProgressBar
 
 FASTHOC_DIRNAME = "_fasthoc"
+MANIFEST_FILENAME = "hocify-manifest.json"
+MANIFEST_VERSION = 1
+MORPHOLOGY_EXTENSIONS = (".asc", ".h5", ".swc")
+DEFAULT_CHUNKSIZE = 16
 
 
 def process_file(file_tuple):
@@ -27,15 +35,43 @@ def process_file(file_tuple):
     return src_file
 
 
+def file_hash(filename, block_size=1 << 20):
+    """The sha1 hex digest of a file contents"""
+    sha = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def process_entry(entry):
+    """Converts a morphology unless its contents hash matches the one of the previous run
+
+    Args:
+        entry: tuple (src_file, dst_file, previous_hash). previous_hash is None to force
+    Returns: tuple (src_file, hash, converted) or the Exception raised while converting
+    """
+    src_file, dst_file, previous_hash = entry
+    try:
+        digest = file_hash(src_file)
+    except OSError as e:
+        e.args = ("Processing " + src_file, *e.args)
+        return e
+    if digest == previous_hash and os.path.isfile(dst_file):
+        return src_file, digest, False
+    result = process_file((src_file, dst_file))
+    if isinstance(result, Exception):
+        return result
+    return src_file, digest, True
+
+
 class Hocify(object):
     fasthoclogfile = "hocify-{}.log".format(strftime("%Y-%m-%d_%Hh%M"))
 
-    def __init__(self, morpho_path, neuron_nframe, log_level, output_dir, **_user_opts):
+    def __init__(self, morpho_path, neuron_nframe, log_level, output_dir,
+                 incremental=False, jobs=None, chunksize=None, **_user_opts):
         Hocify.fasthocdir = output_dir or os.path.join(morpho_path, FASTHOC_DIRNAME)
-        try:
-            os.mkdir(Hocify.fasthocdir)
-        except Exception as e:
-            raise e
+        os.makedirs(Hocify.fasthocdir, exist_ok=True)
         Hocify.fasthoclogfile = os.path.join(Hocify.fasthocdir, Hocify.fasthoclogfile)
         setup_logging(loglevel=log_level, logfile=Hocify.fasthoclogfile, rank=0)
 
@@ -47,6 +83,32 @@ class Hocify(object):
         os.environ['NEURON_NFRAME'] = str(Hocify.nframe)
         logging.info("NEURON_NFRAME set to: " + str(Hocify.nframe))
 
+        self._incremental = incremental
+        self._jobs = jobs
+        self._chunksize = chunksize or DEFAULT_CHUNKSIZE
+        self._manifest_file = os.path.join(Hocify.fasthocdir, MANIFEST_FILENAME)
+
+    def _load_manifest(self):
+        """Reads the input files state recorded by the previous run, keyed by file name"""
+        if not os.path.isfile(self._manifest_file):
+            return {}
+        try:
+            with open(self._manifest_file) as f:
+                manifest = json.load(f)
+        except ValueError:
+            logging.warning("Invalid manifest %s. Converting all files", self._manifest_file)
+            return {}
+        if manifest.get("version") != MANIFEST_VERSION:
+            logging.warning("Manifest version mismatch. Converting all files")
+            return {}
+        return manifest["files"]
+
+    def _save_manifest(self, files):
+        tmp_file = self._manifest_file + ".tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump({"version": MANIFEST_VERSION, "files": files}, f, indent=1, sort_keys=True)
+        os.replace(tmp_file, self._manifest_file)
+
     def convert(self, morpho_folder='ascii'):
         log_stage("Starting conversion")
         self._morphdir = os.path.join(self._morpho_path, morpho_folder)
@@ -58,18 +120,73 @@ class Hocify(object):
         logging.info("Target fast hoc folder is: " + Hocify.fasthocdir)
         logging.info("Hoc-ifying morphology folder: " + self._morphdir + " ...")
 
-        self._target_morph_files = (
-            (os.path.join(self._morphdir, f.name),
-             os.path.join(Hocify.fasthocdir, f.name.replace('.asc', '.hoc')))
-            for f in os.scandir(self._morphdir)
-            if f.is_file() and f.name.endswith('.asc'))
-
-        pool = multiprocessing.Pool()
-        processed_files = pool.imap_unordered(process_file, self._target_morph_files)
-        estimated_file_count = os.lstat(self._morphdir).st_nlink - 2  # ok for large dirs
-        for file in ProgressBar.iter(processed_files, estimated_file_count):
-            if isinstance(file, Exception):
-                logging.critical(str(file))
-                return 1
-            log_verbose("Done for: " + file)
-        logging.info("Done")
+        morph_files = [f for f in os.scandir(self._morphdir) if f.is_file()
+                       and os.path.splitext(f.name)[1].lower() in MORPHOLOGY_EXTENSIONS]
+        # Morphologies differing only by extension would write the same hoc file
+        same_base = defaultdict(list)
+        for f in morph_files:
+            same_base[os.path.splitext(f.name)[0]].append(f.name)
+        collisions = sorted(sorted(names) for names in same_base.values() if len(names) > 1)
+        if collisions:
+            logging.critical("Morphologies with the same name would overwrite each other's hoc "
+                             "file: %s", ", ".join("/".join(names) for names in collisions))
+            return 1
+
+        previous = self._load_manifest() if self._incremental else {}
+        files = {}  # The new manifest entries
+        pending = []
+        for f in morph_files:
+            base = os.path.splitext(f.name)[0]
+            stat = f.stat()
+            dst_file = os.path.join(Hocify.fasthocdir, base + '.hoc')
+            entry = previous.get(f.name)
+            if (entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns
+                    and os.path.isfile(dst_file)):
+                files[f.name] = entry  # Unchanged, not even worth reading
+                continue
+            files[f.name] = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+            pending.append((f.path, dst_file, entry and entry["sha1"]))
+
+        n_total = len(files)
+        logging.info("Found %d morphologies, %d new or modified since last run",
+                     n_total, len(pending))
+
+        start_time = time.time()
+        n_converted = n_bytes = 0
+        n_skipped = n_total - len(pending)
+        ret = 0
+        if self._jobs == 1:
+            processed_files = map(process_entry, pending)
+        else:
+            pool = multiprocessing.Pool(self._jobs)
+            processed_files = pool.imap_unordered(process_entry, pending, self._chunksize)
+        try:
+            for result in ProgressBar.iter(processed_files, len(pending)):
+                if isinstance(result, Exception):
+                    logging.critical(str(result))
+                    ret = 1
+                    break
+                src_file, digest, converted = result
+                name = os.path.basename(src_file)
+                files[name]["sha1"] = digest
+                if converted:
+                    n_converted += 1
+                    n_bytes += files[name]["size"]
+                    log_verbose("Done for: " + src_file)
+                else:
+                    n_skipped += 1
+        finally:
+            if self._jobs != 1:
+                pool.terminate()
+            # Keep whatever was converted so that a re-run resumes from there
+            self._save_manifest({name: entry for name, entry in files.items()
+                                 if "sha1" in entry})
+
+        elapsed = time.time() - start_time
+        logging.info("Converted %d morphologies (%.1f MB) in %.1f s: %.1f files/s, %.2f MB/s. "
+                     "%d unchanged skipped",
+                     n_converted, n_bytes / 1e6, elapsed, n_converted / max(elapsed, 1e-9),
+                     n_bytes / 1e6 / max(elapsed, 1e-9), n_skipped)
+        if not ret:
+            logging.info("Done")
+        return ret
@@ -11,7 +11,7 @@ from os import path as ospath
 from ..core import NeurodamusCore as Nd
 from ..core.configuration import SimConfig
 from ..core import run_only_rank0
-from ..metype import METypeManager
+from ..metype import Categorical, METypeManager
 from ..utils.logging import log_verbose
 
 EMPTY_GIDVEC = np.empty(0, dtype="uint32")
@@ -109,11 +109,10 @@ def load_sonata(circuit_conf, all_gids, stride=1, stride_offset=0, *,
                 continue
             gids = gids[:CELL_NODE_INFO_LIMIT]
             node_sel = libsonata.Selection(gids - 1)  # Load 0-based node ids
-            morpho_names = node_pop.get_attribute("morphology", node_sel)
-            mtypes = node_pop.get_attribute("mtype", node_sel)
-            etypes = node_pop.get_attribute("etype", node_sel)
-            _model_templates = node_pop.get_attribute("model_template", node_sel)
-            emodel_templates = [emodel.removeprefix("hoc:") for emodel in _model_templates]
+            morpho_names = _get_categorical(node_pop, "morphology", node_sel)
+            mtypes = _get_categorical(node_pop, "mtype", node_sel)
+            etypes = _get_categorical(node_pop, "etype", node_sel)
+            emodel_templates = _get_emodel_templates(node_pop, node_sel)
             meinfos.load_infoNP(gids, morpho_names, emodel_templates, mtypes, etypes)
 
         return gidvec, meinfos, total_cells
@@ -131,15 +130,14 @@ def load_sonata(circuit_conf, all_gids, stride=1, stride_offset=0, *,
 
         log_verbose("Loading nodes info")
         node_sel = libsonata.Selection(gidvec - 1)  # 0-based node indices
-        morpho_names = node_pop.get_attribute("morphology", node_sel)
-        mtypes = node_pop.get_attribute("mtype", node_sel)
+        morpho_names = _get_categorical(node_pop, "morphology", node_sel)
+        mtypes = _get_categorical(node_pop, "mtype", node_sel)
         try:
-            etypes = node_pop.get_attribute("etype", node_sel)
+            etypes = _get_categorical(node_pop, "etype", node_sel)
         except libsonata.SonataError:
             logging.warning("etype not found in node population, setting to None")
             etypes = None
-        _model_templates = node_pop.get_attribute("model_template", node_sel)
-        emodel_templates = [emodel.removeprefix("hoc:") for emodel in _model_templates]
+        emodel_templates = _get_emodel_templates(node_pop, node_sel)
         if set(["exc_mini_frequency", "inh_mini_frequency"]).issubset(attr_names):
             exc_mini_freqs = node_pop.get_attribute("exc_mini_frequency", node_sel)
             inh_mini_freqs = node_pop.get_attribute("inh_mini_frequency", node_sel)
@@ -160,7 +158,9 @@ def load_sonata(circuit_conf, all_gids, stride=1, stride_offset=0, *,
         # For Sonata and new emodel hoc template, we need additional attributes for building metype
         # TODO: validate it's really the emodel_templates var we should pass here, or etype
         add_params_list = None if not has_extra_data \
-            else _getNeededAttributes(node_pop, circuit_conf.METypePath, emodel_templates, gidvec-1)
+            else _getNeededAttributes(node_pop, circuit_conf.METypePath,
+                                      emodel_templates.categories[emodel_templates.codes],
+                                      gidvec-1)
 
         meinfos.load_infoNP(gidvec, morpho_names, emodel_templates, mtypes, etypes,
                             threshold_currents, holding_currents,
@@ -187,7 +187,7 @@ def load_sonata(circuit_conf, all_gids, stride=1, stride_offset=0, *,
     gidvec, meinfos, fullsize = load_nodes_base_info()
 
     if SimConfig.dry_run:
-        load_nodes = np.fromiter(meinfos.keys(), dtype="uint32") - 1
+        load_nodes = meinfos.gids - 1
         node_sel = libsonata.Selection(load_nodes)
     else:
         node_sel = libsonata.Selection(gidvec - 1)  # 0-based node indices
@@ -199,12 +199,28 @@ def load_sonata(circuit_conf, all_gids, stride=1, stride_offset=0, *,
             prop_data = node_pop.get_dynamics_attribute(prop_name, node_sel)
         else:
             prop_data = node_pop.get_attribute(prop_name, node_sel)
-        for gid, val in zip(meinfos.keys(), prop_data):
-            meinfos[gid].extra_attrs[prop_name] = val
+        meinfos.add_extra_attribute(prop_name, prop_data)
 
     return gidvec, meinfos, fullsize
 
 
+def _get_categorical(node_pop, attr_name, selection):
+    """Reads a string attribute as a Categorical, directly from its @library enumeration if any
+    """
+    if attr_name in node_pop.enumeration_names:
+        return Categorical(np.asarray(node_pop.enumeration_values(attr_name), dtype=object),
+                           node_pop.get_enumeration(attr_name, selection).astype("int32"))
+    return Categorical.from_values(node_pop.get_attribute(attr_name, selection))
+
+
+def _get_emodel_templates(node_pop, selection):
+    """The emodel template names (model_template without the "hoc:" prefix), as a Categorical
+    """
+    model_templates = _get_categorical(node_pop, "model_template", selection)
+    emodels = [emodel.removeprefix("hoc:") for emodel in model_templates.categories]
+    return Categorical(np.asarray(emodels, dtype=object), model_templates.codes)
+
+
 def _getNeededAttributes(node_reader, etype_path, emodels, gidvec):
     """
     Read additional attributes required by emodel templates global var <emodel>__NeededAttributes
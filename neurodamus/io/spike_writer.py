@@ -0,0 +1,101 @@
+"""
+Incremental writer of SONATA spike files
+"""
+import h5py
+import numpy as np
+
+SPIKES_SORTING_ENUM = h5py.enum_dtype({"none": 0, "by_id": 1, "by_time": 2}, basetype="u1")
+
+
+class SonataSpikeWriter:
+    """Writes a SONATA spikes file in successive appends.
+
+    Spikes appended to a population must come after those already written, so that the file
+    stays sorted by time. Should the run be interrupted, the file holds all the spikes up to
+    the last flush.
+    """
+
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, filename, populations):
+        self._file = h5py.File(filename, "w")
+        for population in populations:
+            group = self._file.create_group("spikes/" + population)
+            group.attrs.create("sorting", 2, dtype=SPIKES_SORTING_ENUM)
+            timestamps = group.create_dataset("timestamps", (0,), "f8", maxshape=(None,),
+                                              chunks=(self.CHUNK_SIZE,))
+            timestamps.attrs["units"] = "ms"
+            group.create_dataset("node_ids", (0,), "u8", maxshape=(None,),
+                                 chunks=(self.CHUNK_SIZE,))
+
+    def append(self, population, timestamps, node_ids):
+        """Appends spikes (sorted by time) of a population, with 0-based node ids"""
+        if not len(timestamps):
+            return
+        group = self._file["spikes"][population]
+        for name, data in (("timestamps", timestamps), ("node_ids", node_ids)):
+            dataset = group[name]
+            start = len(dataset)
+            dataset.resize((start + len(data),))
+            dataset[start:] = data
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def merge_spike_files(input_files, filename, chunk_size=SonataSpikeWriter.CHUNK_SIZE):
+    """Merges SONATA spike files, each sorted by time, into a single one sorted by time.
+
+    Input files are read in chunks, so that memory is bound to about a chunk per input file.
+    """
+    inputs = [h5py.File(input_file, "r") for input_file in input_files]
+    try:
+        populations = list(inputs[0]["spikes"]) if inputs else []
+        writer = SonataSpikeWriter(filename, populations)
+        try:
+            for population in populations:
+                _merge_population(writer, population,
+                                  [f["spikes"][population] for f in inputs], chunk_size)
+        finally:
+            writer.close()
+    finally:
+        for f in inputs:
+            f.close()
+
+
+def _merge_population(writer, population, groups, chunk_size):
+    sizes = [len(group["timestamps"]) for group in groups]
+    n_read = [0] * len(groups)
+    timestamps = [np.empty(0)] * len(groups)  # loaded, not yet written
+    node_ids = [np.empty(0, "u8")] * len(groups)
+
+    def load_chunk(i):
+        start, end = n_read[i], min(n_read[i] + chunk_size, sizes[i])
+        timestamps[i] = np.concatenate((timestamps[i], groups[i]["timestamps"][start:end]))
+        node_ids[i] = np.concatenate((node_ids[i], groups[i]["node_ids"][start:end]))
+        n_read[i] = end
+
+    while True:
+        for i in range(len(groups)):
+            if not len(timestamps[i]) and n_read[i] < sizes[i]:
+                load_chunk(i)
+        unfinished = [i for i in range(len(groups)) if n_read[i] < sizes[i]]
+        if not unfinished and not any(len(t) for t in timestamps):
+            break
+        # Spikes before the last loaded time of files with more data are final
+        t_final = min((timestamps[i][-1] for i in unfinished), default=np.inf)
+        counts = [np.searchsorted(t, t_final) for t in timestamps]
+        if not any(counts):
+            for i in unfinished:
+                if timestamps[i][-1] == t_final:
+                    load_chunk(i)
+            continue
+        merged_t = np.concatenate([t[:n] for t, n in zip(timestamps, counts)])
+        merged_ids = np.concatenate([ids[:n] for ids, n in zip(node_ids, counts)])
+        order = np.lexsort((merged_ids, merged_t))
+        writer.append(population, merged_t[order], merged_ids[order])
+        timestamps = [t[n:] for t, n in zip(timestamps, counts)]
+        node_ids = [ids[n:] for ids, n in zip(node_ids, counts)]
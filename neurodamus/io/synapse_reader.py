@@ -3,6 +3,7 @@ Module implementing interfaces to the several synapse readers (eg.: synapsetool,
 """
 import logging
 from abc import abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 
 import libsonata
 import numpy as np
@@ -77,6 +78,7 @@ class SynapseReader:
 
     def __init__(self, src, population=None, *_, **kw):
         self._ca_concentration = kw.get("extracellular_calcium")
+        self._read_threads = int(kw.get("read_threads") or 1)
         self._syn_params = {}  # Parameters cache by post-gid (previously loadedMap)
         self._open_file(src, population, kw.get("verbose", False))
         # NOTE u_hill_coefficient and conductance_scale_factor are optional, BUT
@@ -114,14 +116,36 @@ class SynapseReader:
         syn_params = self._syn_params.get(gid)
         if syn_params is None:
             syn_params = self._load_synapse_parameters(gid)
-
-            # Modify parameters
-            self._patch_delay_fp_inaccuracies(syn_params)
-            if self._uhill_property_avail:
-                self._scale_U_param(syn_params, self._ca_concentration, self._extra_scale_vars)
+            self._patch_parameters(syn_params)
             self._syn_params[gid] = syn_params  # cache parameters
         return syn_params
 
+    def get_conn_segments(self, gids):
+        """Groups the synapses of several gids into connections (see SonataReader).
+
+        This default implementation builds on get_synapse_parameters, concatenating the
+        parameters of all the gids. The synapse index in the file is unknown (-1).
+
+        Returns:
+            A list with one tuple (syn_params, segments), segments being an array of
+            CONN_SEGMENT_DTYPE whose ranges index the syn_params recarray.
+        """
+        gids = np.unique(np.asarray(gids, dtype="int64"))
+        if not len(gids):
+            return []
+        gids_params = [self.get_synapse_parameters(gid) for gid in gids]
+        ends = np.cumsum([len(params) for params in gids_params])
+        starts = ends - [len(params) for params in gids_params]
+        syn_params = np.concatenate(gids_params).view(np.recarray)
+        opposite_gids = syn_params[syn_params.dtype.names[0]]
+        return [(syn_params, _make_conn_segments(opposite_gids, gids, starts, ends))]
+
+    def _patch_parameters(self, syn_params):
+        """Applies the in-place modifications to freshly loaded synapse parameters"""
+        self._patch_delay_fp_inaccuracies(syn_params)
+        if self._uhill_property_avail:
+            self._scale_U_param(syn_params, self._ca_concentration, self._extra_scale_vars)
+
     @abstractmethod
     def _load_synapse_parameters(self, gid):
         """The low level reading of synapses subclasses must override"""
@@ -190,6 +214,83 @@ class SynapseReader:
             raise FormatNotSupported(f"File: {syn_src}. Please provide SONATA edges")
 
 
+CONN_SEGMENT_DTYPE = np.dtype([
+    ("sgid", "i8"),       # The gid on the opposite side of the lookup gid
+    ("tgid", "i8"),       # The lookup gid
+    ("start", "i8"),      # Range of the connection synapses in the parameters array
+    ("end", "i8"),
+    ("offset", "i8"),     # Position of the first synapse among those of the lookup gid
+    ("syn_index", "i8"),  # Index in the edge file of the first synapse
+])
+"""The layout of connection segments, i.e. runs of synapses between the same pair of gids"""
+
+
+def _make_conn_segments(opposite_gids, gids, starts, ends):
+    """Groups synapses into connections: runs of contiguous synapses of a lookup gid having
+    the same opposite gid.
+
+    Args:
+        opposite_gids: The opposite gid of every synapse
+        gids: The (sorted) lookup gids
+        starts, ends: The ranges of the synapses of each lookup gid in opposite_gids
+
+    Returns: An array of CONN_SEGMENT_DTYPE, with syn_index set to -1
+    """
+    if not len(gids):
+        return np.empty(0, dtype=CONN_SEGMENT_DTYPE)
+    low, high = starts[0], ends[-1]
+    window = opposite_gids[low:high]
+
+    # Segments break at the gid ranges limits and wherever the opposite gid changes
+    breaks = np.zeros(high - low + 1, dtype=bool)
+    breaks[starts - low] = True
+    breaks[ends - low] = True
+    breaks[1:-1] |= window[1:] != window[:-1]
+    positions = np.flatnonzero(breaks) + low
+    seg_starts, seg_ends = positions[:-1], positions[1:]
+
+    # Drop segments of gids in between (not requested)
+    gid_i = np.searchsorted(starts, seg_starts, side="right") - 1
+    valid = seg_starts < ends[gid_i]
+    seg_starts, seg_ends, gid_i = seg_starts[valid], seg_ends[valid], gid_i[valid]
+
+    segments = np.empty(len(seg_starts), dtype=CONN_SEGMENT_DTYPE)
+    segments["sgid"] = opposite_gids[seg_starts]
+    segments["tgid"] = gids[gid_i]
+    segments["start"] = seg_starts
+    segments["end"] = seg_ends
+    segments["offset"] = seg_starts - starts[gid_i]
+    segments["syn_index"] = -1
+    return segments
+
+
+class _EdgeDataBlock:
+    """A columnar cache of edge data for a batch of gids, in CSR layout.
+
+    Columns are sorted (stably) by the lookup gid, so that the edges of the i-th gid
+    lie in the range offsets[i]:offsets[i+1]. Unavailable attributes are kept as scalars.
+    """
+    __slots__ = ("gids", "offsets", "selection", "order", "columns", "params")
+
+    def __init__(self, gids, selection, lookup_gids):
+        self.gids = gids  # sorted, unique
+        self.selection = selection  # the edge ids, as read from disk
+        self.order = np.argsort(lookup_gids, kind="stable")
+        self.offsets = np.empty(len(gids) + 1, dtype="int64")
+        self.offsets[:-1] = np.searchsorted(lookup_gids[self.order], gids)
+        self.offsets[-1] = len(lookup_gids)
+        self.columns = {}
+        self.params = None  # The (patched) synapse parameters recarray, built on first use
+
+    def add_column(self, field, data):
+        self.columns[field] = data if np.isscalar(data) else data[self.order]
+
+    def get(self, field, i):
+        """Zero-copy view of a column for the i-th gid (or the scalar placeholder)"""
+        data = self.columns[field]
+        return data if np.isscalar(data) else data[self.offsets[i]:self.offsets[i + 1]]
+
+
 class SonataReader(SynapseReader):
     """Reader for SONATA edge files.
 
@@ -198,9 +299,8 @@ class SonataReader(SynapseReader):
     to the 1-based convention in Neurodamus.
 
     Will read each attribute for multiple GIDs at once and cache read data in a columnar
-    fashion.
-
-    FIXME Remove the caching at the np.recarray level.
+    fashion: each preload creates a block whose columns are sorted by gid, and per-gid
+    synapse parameters are returned as views of a single recarray per block.
     """
 
     SYNAPSE_INDEX_NAMES = ("synapse_index",)
@@ -223,19 +323,26 @@ class SonataReader(SynapseReader):
     }
 
     def _open_file(self, src, population, _):
-        try:
-            from mpi4py import MPI
-            hdf5_reader = libsonata.make_collective_reader(MPI.COMM_WORLD, False, True)
-        except ModuleNotFoundError:
+        # Collective reads must be issued in the same order by all ranks, not from threads
+        if self._read_threads > 1:
+            log_verbose("[SynReader] Reading edge attributes with %d threads", self._read_threads)
             hdf5_reader = libsonata.Hdf5Reader()
+        else:
+            try:
+                from mpi4py import MPI
+                hdf5_reader = libsonata.make_collective_reader(MPI.COMM_WORLD, False, True)
+            except ModuleNotFoundError:
+                hdf5_reader = libsonata.Hdf5Reader()
 
         storage = libsonata.EdgeStorage(src, hdf5_reader=hdf5_reader)
         if not population:
             assert len(storage.population_names) == 1, "Populations: %s" % storage.population_names
             population = next(iter(storage.population_names))
         self._population = storage.open_population(population)
-        # A cache which stores all the fields for each gid. E.g. {1: {"sgid": property_numpy}}
-        self._data = {}
+        # A columnar cache of the edge data, as a list of _EdgeDataBlock
+        self._blocks = []
+        # The cached gids, mapped to their (block, position in block)
+        self._gid_blocks = {}
         # A cache for connection counts, used mostly in dry run
         self._counts = {}
 
@@ -248,43 +355,97 @@ class SonataReader(SynapseReader):
             return True
         return field_name in self._population.attribute_names
 
+    def _find_gid(self, gid):
+        """Finds the block holding the data of a gid. Returns a tuple (block, index)"""
+        return self._gid_blocks.get(int(gid), (None, None))
+
+    def _locate_gid(self, gid):
+        """Like _find_gid, loading the gid data if not yet available"""
+        block, i = self._find_gid(gid)
+        if block is None:
+            self.preload_data([gid])
+            block, i = self._find_gid(gid)
+        return block, i
+
     def get_property(self, gid, field_name):
         """Retrieves a full pre-loaded property given a gid and the property name.
         """
-        return self._data[gid][field_name]
+        block, i = self._find_gid(gid)
+        if block is None:
+            raise KeyError(gid)
+        return block.get(field_name, i)
 
     def preload_data(self, ids):
         """Preload SONATA fields for the specified IDs"""
         compute_fields = set(("sgid", "tgid") + self.SYNAPSE_INDEX_NAMES)
-        needed_ids = sorted(set(ids) - set(self._data.keys()))
+        ids = np.unique(np.asarray(ids, dtype="int64"))
+        gid_blocks = self._gid_blocks
+        needed_ids = ids[[gid not in gid_blocks for gid in ids.tolist()]] if gid_blocks else ids
 
-        def get_edge_and_lookup_gids(needed_ids):
-            gids_0based = np.array(needed_ids, dtype="int64") - 1
-            if self.LOOKUP_BY_TARGET_IDS:
-                edge_ids = self._population.afferent_edges(gids_0based)
-                return edge_ids, self._population.target_nodes(edge_ids) + 1
-            else:
-                edge_ids = self._population.efferent_edges(gids_0based)
-                return edge_ids, self._population.source_nodes(edge_ids) + 1
+        if len(needed_ids):
+            block = self._load_block(needed_ids, compute_fields)
+            self._blocks.append(block)
+            gid_blocks.update((gid, (block, i)) for i, gid in enumerate(needed_ids.tolist()))
+
+        # Extend Gids data with the additional requested fields
+        # This has to work for when we call preload() a second/third time
+        # so we are unsure about which gids were loaded what properties
+        # We nevertheless can skip any base fields
+        if not self._extra_fields:
+            return
+        for block in self._blocks:
+            if np.isin(block.gids, ids).any():
+                self._load_extra_columns(block)
+
+    def _load_extra_columns(self, block):
+        compute_fields = set(("sgid", "tgid") + self.SYNAPSE_INDEX_NAMES)
+        extra_fields = set(self._extra_fields) - (self.Parameters.all_fields | compute_fields)
+        fields = sorted(extra_fields - block.columns.keys())
+        attributes = [(self.parameter_mapping.get(field, field), False) for field in fields]
+        for field, data in zip(fields, self._read_attributes(attributes, block.selection)):
+            block.add_column(field, data)
+
+    def _read_attribute(self, attribute, selection, optional=False):
+        if attribute in self._population.attribute_names:
+            return self._population.get_attribute(attribute, selection)
+        elif optional:
+            log_verbose("Defaulting to -1.0 for attribute %s", attribute)
+            return -1
+        else:
+            raise AttributeError(f"Missing attribute {attribute} in the SONATA edge file")
+
+    def _read_attributes(self, attributes, selection):
+        """Reads several attributes, given as tuples (name, optional), for the same selection.
+
+        With read_threads > 1 the reads are issued concurrently from a thread pool, which
+        hides the I/O latency of parallel filesystems when there are many attributes.
+        """
+        if self._read_threads <= 1 or len(attributes) <= 1:
+            return [self._read_attribute(name, selection, optional)
+                    for name, optional in attributes]
+        with ThreadPoolExecutor(min(self._read_threads, len(attributes))) as executor:
+            futures = [executor.submit(self._read_attribute, name, selection, optional)
+                       for name, optional in attributes]
+            return [future.result() for future in futures]
+
+    def _load_block(self, needed_ids, compute_fields):
+        """Reads all the base fields of the edges of the given (sorted) gids"""
+        gids_0based = needed_ids - 1
+        if self.LOOKUP_BY_TARGET_IDS:
+            needed_edge_ids = self._population.afferent_edges(gids_0based)
+            lookup_gids = self._population.target_nodes(needed_edge_ids) + 1
+        else:
+            needed_edge_ids = self._population.efferent_edges(gids_0based)
+            lookup_gids = self._population.source_nodes(needed_edge_ids) + 1
 
-        needed_edge_ids, lookup_gids = get_edge_and_lookup_gids(needed_ids)
+        block = _EdgeDataBlock(needed_ids, needed_edge_ids, lookup_gids)
 
         def _populate(field, data):
             # Populate cache. Unavailable entries are stored as a plain -1
-            if data is None:
-                data = -1
-            for gid in needed_ids:
-                existing_gid_data = self._data.setdefault(gid, {})
-                existing_gid_data[field] = data if np.isscalar(data) else data[lookup_gids == gid]
+            block.add_column(field, -1 if data is None else data)
 
         def _read(attribute, optional=False):
-            if attribute in self._population.attribute_names:
-                return self._population.get_attribute(attribute, needed_edge_ids)
-            elif optional:
-                log_verbose("Defaulting to -1.0 for attribute %s", attribute)
-                return -1
-            else:
-                raise AttributeError(f"Missing attribute {attribute} in the SONATA edge file")
+            return self._read_attribute(attribute, needed_edge_ids, optional)
 
         # Populate the opposite node id
         if self.LOOKUP_BY_TARGET_IDS:
@@ -299,24 +460,17 @@ class SonataReader(SynapseReader):
         # Generic synapse parameters
         fields_load_sonata = self.Parameters.fields(exclude=self.custom_parameters | compute_fields,
                                                     with_translation=self.parameter_mapping)
-        for (field, sonata_attr, is_optional) in sorted(fields_load_sonata):
-            _populate(field, _read(sonata_attr, is_optional))
+        fields_load_sonata = sorted(fields_load_sonata)
+        fields_data = self._read_attributes([(sonata_attr, is_optional)
+                                             for _, sonata_attr, is_optional in fields_load_sonata],
+                                            needed_edge_ids)
+        for (field, _, _), data in zip(fields_load_sonata, fields_data):
+            _populate(field, data)
 
         if self.custom_parameters:
             self._load_params_custom(_populate, _read)
 
-        # Extend Gids data with the additional requested fields
-        # This has to work for when we call preload() a second/third time
-        # so we are unsure about which gids were loaded what properties
-        # We nevertheless can skip any base fields
-        extra_fields = set(self._extra_fields) - (self.Parameters.all_fields | compute_fields)
-        for field in sorted(extra_fields):
-            now_needed_ids = sorted(set(gid for gid in ids if field not in self._data[gid]))
-            if needed_ids != now_needed_ids:
-                needed_ids = now_needed_ids
-                needed_edge_ids, lookup_gids = get_edge_and_lookup_gids(needed_ids)
-            sonata_attr = self.parameter_mapping.get(field, field)
-            _populate(field, _read(sonata_attr))
+        return block
 
     def _load_params_custom(self, _populate, _read):
         # Position of the synapse
@@ -357,27 +511,82 @@ class SonataReader(SynapseReader):
                 _populate("ipt", _read("morpho_segment_id_post"))
                 _populate("offset", _read("morpho_offset_segment_post"))
 
-    def _load_synapse_parameters(self, gid):
-        if gid not in self._data:
-            self.preload_data([gid])
-
-        data = self._data[gid]
-        edge_count = len(next(iter(data.values())))
-
+    def _block_parameters(self, block):
+        """Builds (once) the synapse parameters recarray of a whole block"""
         if self._extra_fields:
             class CustomSynapseParameters(self.Parameters):
                 _synapse_fields = self.Parameters._synapse_fields + self._extra_fields
-            conn_syn_params = CustomSynapseParameters.create_array(edge_count)
+            params_cls = CustomSynapseParameters
         else:
-            conn_syn_params = self.Parameters.create_array(edge_count)
+            params_cls = self.Parameters
 
+        # Rebuild if fields changed (e.g. a ModOverride requiring extra attributes)
+        if block.params is not None and block.params.dtype.names == params_cls.dtype.names:
+            return block.params
+
+        self._load_extra_columns(block)
+        conn_syn_params = params_cls.create_array(len(block.order))
         for name in self.Parameters.load_fields:
-            conn_syn_params[name] = data[name]
+            conn_syn_params[name] = block.columns[name]
         for name in self._extra_fields:
-            conn_syn_params[name] = data[name]
+            conn_syn_params[name] = block.columns[name]
 
+        self._patch_parameters(conn_syn_params)
+        block.params = conn_syn_params
         return conn_syn_params
 
+    def get_synapse_parameters(self, gid):
+        """Obtains the synapse parameters record for a given gid.
+
+        The record is a view of the whole block parameters, hence no copy is made.
+        """
+        block, i = self._locate_gid(gid)
+        params = self._block_parameters(block)
+        return params[block.offsets[i]:block.offsets[i + 1]]
+
+    def _load_synapse_parameters(self, gid):
+        return self.get_synapse_parameters(gid)
+
+    def get_conn_segments(self, gids):
+        """Groups the synapses of several gids into connections, in a vectorized fashion.
+
+        Connections are given by runs of contiguous synapses of a lookup gid having the
+        same opposite gid, respecting the order of the edge file.
+
+        Returns:
+            A list of tuples (syn_params, segments), one per cache block holding any of the
+            gids, where segments is an array of CONN_SEGMENT_DTYPE whose ranges index the
+            (whole block) syn_params recarray.
+        """
+        gids = np.unique(np.asarray(gids, dtype="int64"))
+        block_positions = {}  # block -> positions of the requested gids, in block order
+        missing_gids = []
+        for gid in gids.tolist():
+            block, i = self._gid_blocks.get(gid, (None, None))
+            if block is None:
+                missing_gids.append(gid)
+            else:
+                block_positions.setdefault(block, []).append(i)
+
+        result = []
+        for block, positions in block_positions.items():
+            idx = np.array(positions)
+            segments = self._block_conn_segments(block, block.gids[idx], idx)
+            result.append((self._block_parameters(block), segments))
+
+        if missing_gids:
+            self.preload_data(missing_gids)
+            result.extend(self.get_conn_segments(missing_gids))
+        return result
+
+    def _block_conn_segments(self, block, gids, idx):
+        syn_params = self._block_parameters(block)
+        opposite_gids = block.columns[syn_params.dtype.names[0]]
+        segments = _make_conn_segments(opposite_gids, gids, block.offsets[idx],
+                                       block.offsets[idx + 1])
+        segments["syn_index"] = block.columns[self.SYNAPSE_INDEX_NAMES[0]][segments["start"]]
+        return segments
+
     def get_counts(self, tgids):
         """
         Counts synapses for the given target neuron ids. Returns a dict
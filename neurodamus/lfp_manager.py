@@ -3,6 +3,7 @@ import numpy
 
 from .core import NeurodamusCore as Nd
 from .core.configuration import ConfigurationError
+from .utils import compat
 
 
 class LFPManager:
@@ -11,9 +12,17 @@ class LFPManager:
     """
     def __init__(self):
         self._lfp_file = None
+        self._node_index = {}     # population -> (sorted node_ids, their rows, offsets)
+        self._local_factors = {}  # population -> (sorted node_ids, starts, ends, factors)
 
-    def load_lfp_config(self, lfp_weights_file, population_list):
+    def load_lfp_config(self, lfp_weights_file, population_list, local_node_ids=None):
         """Loads lfp weigths from h5 file
+
+        Args:
+            lfp_weights_file: The path to the LFP weights file
+            population_list: The names of the node populations
+            local_node_ids: Optional dict of the local node ids per population, whose
+                scaling factors are read in bulk and cached
         """
         logging.info("Reading LFP configuration info from '%s'", lfp_weights_file)
         import h5py
@@ -21,6 +30,8 @@ class LFPManager:
             self._lfp_file = h5py.File(lfp_weights_file, 'r')
         except IOError as e:
             raise ConfigurationError(f"Error opening LFP electrodes file: {e}")
+        self._node_index = {}
+        self._local_factors = {}
 
         # Check that the file contains the required groups for at least 1 population
         populations_found = []
@@ -36,20 +47,97 @@ class LFPManager:
                                      "'scaling_factors', 'node_ids' and 'offsets' "
                                      "in any of the populations {}.".format(population_list))
 
+        for pop_name in populations_found:
+            if local_node_ids and pop_name in local_node_ids:
+                self.load_local_factors(pop_name, local_node_ids[pop_name])
+
+    def _get_node_index(self, population_name):
+        """Reads once the node_ids and offsets of a population, sorting node_ids for lookups
+        """
+        node_index = self._node_index.get(population_name)
+        if node_index is None:
+            population_group = self._lfp_file[population_name]
+            node_ids = population_group["node_ids"][:]
+            rows = numpy.argsort(node_ids, kind="stable")
+            node_index = (node_ids[rows], rows, population_group["offsets"][:])
+            self._node_index[population_name] = node_index
+        return node_index
+
+    def _find_rows(self, node_ids, population_name):
+        """Gets the rows of the given node ids in the file. Returns (rows, found mask)
+        """
+        sorted_node_ids, rows, _ = self._get_node_index(population_name)
+        node_ids = numpy.asarray(node_ids)
+        positions = numpy.searchsorted(sorted_node_ids, node_ids)
+        found = positions < len(sorted_node_ids)
+        found[found] = sorted_node_ids[positions[found]] == node_ids[found]
+        return rows[positions[found]], found
+
+    def load_local_factors(self, population_name, node_ids):
+        """Reads in bulk the scaling factors of the given (local) node ids.
+
+        Factors are read in a single sorted selection and cached, so that
+        `get_node_id_subsets` returns views of it.
+        """
+        node_ids = numpy.unique(node_ids)
+        rows, found = self._find_rows(node_ids, population_name)
+        node_ids = node_ids[found]
+        offsets = self._get_node_index(population_name)[2]
+        file_starts, file_ends = offsets[rows], offsets[rows + 1]
+
+        # Read the segments of all nodes at once, in file order
+        lengths = file_ends - file_starts
+        file_order = numpy.argsort(file_starts, kind="stable")
+        local_ends = numpy.empty(len(node_ids), dtype=int)
+        local_ends[file_order] = numpy.cumsum(lengths[file_order])
+        local_starts = local_ends - lengths
+        file_rows = (numpy.arange(lengths.sum())
+                     + numpy.repeat((file_starts - local_starts)[file_order], lengths[file_order]))
+
+        scaling_factors = self._lfp_file["electrodes"][population_name]["scaling_factors"]
+        if len(file_rows) == 0:
+            factors = numpy.empty((0,) + scaling_factors.shape[1:])
+        elif file_rows[-1] - file_rows[0] + 1 == len(file_rows):  # contiguous
+            factors = scaling_factors[file_rows[0]:file_rows[-1] + 1]
+        else:
+            factors = scaling_factors[file_rows]
+        self._local_factors[population_name] = (node_ids, local_starts, local_ends, factors)
+        logging.info(" -> Cached LFP factors of %d cells for population %s",
+                     len(node_ids), population_name)
+
     def get_sonata_node_id(self, gid, population_info):
         return population_info[0], gid - population_info[1] - 1
 
     def get_node_id_subsets(self, node_id, population_name):
-        node_ids = self._lfp_file[population_name]["node_ids"]
-        # Look for the index of the node_id
-        index = numpy.where(numpy.array(node_ids) == node_id)[0][0]
-        offsets_dataset = self._lfp_file[population_name]["offsets"]
+        local_factors = self._local_factors.get(population_name)
+        if local_factors is not None:
+            node_ids, starts, ends, factors = local_factors
+            pos = numpy.searchsorted(node_ids, node_id)
+            if pos < len(node_ids) and node_ids[pos] == node_id:
+                return factors[starts[pos]:ends[pos]]
+
+        # Not cached: look for the index of the node_id
+        rows, found = self._find_rows([node_id], population_name)
+        if not found[0]:
+            raise IndexError(f"node_id {node_id} not in node_ids")
+        offsets = self._get_node_index(population_name)[2]
         electrodes_dataset = self._lfp_file["electrodes"][population_name]["scaling_factors"]
-        index_low = offsets_dataset[index]
-        index_high = offsets_dataset[index+1]
         # Get the subset data for the node_id and the section index
-        subset_data = electrodes_dataset[index_low:index_high, :]
-        return subset_data
+        return electrodes_dataset[offsets[rows[0]]:offsets[rows[0] + 1], :]
+
+    def get_lfp_factors(self, gid, population_info=("default", 0)):
+        """
+        Gets the LFP factors for a specific gid, as an array of (segments x electrodes).
+        The array is empty if there are no factors for the gid.
+        """
+        if self._lfp_file:
+            try:
+                population_name, node_id = self.get_sonata_node_id(gid, population_info)
+                return self.get_node_id_subsets(node_id, population_name)
+            except (KeyError, IndexError) as e:
+                logging.warning("Node id {} not found in the electrodes file for population {}: {}"
+                                .format(node_id, population_name, str(e)))
+        return numpy.empty((0, 0))
 
     def read_lfp_factors(self, gid, population_info=("default", 0)):
         """
@@ -63,28 +151,13 @@ class LFPManager:
         Returns:
         Nd.Vector: A vector containing the LFP factors for the specified gid
         """
-        scalar_factors = Nd.Vector()
-        if self._lfp_file:
-            try:
-                population_name, node_id = self.get_sonata_node_id(gid, population_info)
-                subset_data = self.get_node_id_subsets(node_id, population_name)
-                for electrode_factors in subset_data:
-                    scalar_factors.append(Nd.Vector(electrode_factors))
-            except (KeyError, IndexError) as e:
-                logging.warning("Node id {} not found in the electrodes file for population {}: {}"
-                                .format(node_id, population_name, str(e)))
-        return scalar_factors
+        subset_data = self.get_lfp_factors(gid, population_info)
+        if subset_data.size == 0:
+            return Nd.Vector()
+        return compat.hoc_vector(numpy.ravel(subset_data))
 
     def get_number_electrodes(self, gid, population_info=("default", 0)):
         """Get number of electrodes of a certain gid
         """
-        num_electrodes = 0
-        if self._lfp_file:
-            try:
-                population_name, node_id = self.get_sonata_node_id(gid, population_info)
-                subset_data = self.get_node_id_subsets(node_id, population_name)
-                num_electrodes = subset_data.shape[1]
-            except (KeyError, IndexError) as e:
-                logging.warning("Node id {} not found in the electrodes file for population {}: {}"
-                                .format(node_id, population_name, str(e)))
-        return num_electrodes
+        subset_data = self.get_lfp_factors(gid, population_info)
+        return subset_data.shape[1] if len(subset_data.shape) > 1 else 0
@@ -4,6 +4,8 @@ Module which defines and handles METypes config (v5/v6 cells)
 from __future__ import absolute_import, print_function
 import logging
 from abc import abstractmethod
+from collections import namedtuple
+from collections.abc import Mapping
 from os import path as ospath
 from .core.configuration import ConfigurationError, SimConfig
 from .core import NeurodamusCore as Nd
@@ -148,12 +150,17 @@ class Cell_V6(METype):
         detailed_axon = circuit_conf.DetailedAxon
         super().__init__(gid, mepath, meinfo.emodel_tpl, morpho_path, meinfo, detailed_axon)
 
+    @classmethod
+    def morphology_file(cls, meinfo):
+        """The morphology file of a cell, relative to the circuit MorphologyPath"""
+        return meinfo.morph_name + "." + cls.morpho_extension
+
     def _instantiate_cell(self, gid, etype_path, emodel, morpho_path, meinfos_v6, detailed_axon):
         """Instantiates a SSCx v6 cell
         """
         Nd.load_hoc(ospath.join(etype_path, emodel))
         EModel = getattr(Nd, emodel)
-        morpho_file = meinfos_v6.morph_name + "." + self.morpho_extension
+        morpho_file = self.morphology_file(meinfos_v6)
         keep_axon = detailed_axon and self.KEEP_AXON_FLAG
         add_params = meinfos_v6.add_params or (keep_axon,)  # Keep axon incompatible with add_params
 
@@ -211,47 +218,131 @@ class EmptyCell(BaseCell):
 # Metadata
 # --------
 
+class Categorical(namedtuple("Categorical", "categories codes")):
+    """A column of repeated strings as its unique values and, per row, their index (-1 if None)
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_values(cls, values):
+        values = np.asarray(values, dtype=object)
+        is_set = np.not_equal(values, None)
+        codes = np.full(len(values), -1, dtype="int32")
+        categories, codes[is_set] = np.unique(values[is_set], return_inverse=True)
+        return cls(categories, codes)
+
+    @classmethod
+    def merge(cls, parts, sizes):
+        """Concatenates categorical columns. Absent (None) parts count as rows with None"""
+        if all(part is None for part in parts):
+            return None
+        if len(parts) == 1:
+            return parts[0]
+        all_categories, all_codes, offset = [], [], 0
+        for part, size in zip(parts, sizes):
+            if part is None:
+                all_codes.append(np.full(size, -1, dtype="int32"))
+                continue
+            all_codes.append(np.where(part.codes >= 0, part.codes + offset, -1))
+            all_categories.append(part.categories)
+            offset += len(part.categories)
+        categories, inverse = np.unique(np.concatenate(all_categories), return_inverse=True)
+        inverse = np.append(inverse, -1).astype("int32")  # so that code -1 stays -1
+        return cls(categories, inverse[np.concatenate(all_codes)])
+
+    def value(self, row):
+        code = self.codes[row]
+        return None if code < 0 else str(self.categories[code])
+
+
 class METypeItem(object):
-    """ Metadata about an METype, each possibly used by several cells.
+    """ Metadata about the METype of a cell, a view over a row of a METypeManager,
+    or standalone, holding its own values.
     """
-    __slots__ = ("morph_name", "layer", "fullmtype", "etype", "emodel_tpl", "combo_name",
-                 "mtype", "threshold_current", "holding_current",
-                 "exc_mini_frequency", "inh_mini_frequency", "add_params",
-                 "local_to_global_matrix",
-                 "extra_attrs")
+    __slots__ = ("_store", "_row", "_values")
 
     def __init__(self, morph_name, layer=None, fullmtype=None, etype=None, emodel_tpl=None,
                  combo_name=None, mtype=None, threshold_current=0, holding_current=0,
                  exc_mini_frequency=0, inh_mini_frequency=0, add_params=None,
                  position=None, rotation=None, scale=1.0):
-        self.morph_name = morph_name
-        self.layer = layer
-        self.fullmtype = fullmtype
-        self.etype = etype
-        self.emodel_tpl = emodel_tpl
-        self.combo_name = combo_name
-        self.mtype = mtype
-        self.threshold_current = float(threshold_current)
-        self.holding_current = float(holding_current)
-        self.exc_mini_frequency = float(exc_mini_frequency)
-        self.inh_mini_frequency = float(inh_mini_frequency)
-        self.add_params = add_params
-        self.extra_attrs = {}
+        """Creates a standalone item, holding its own values (no store)"""
+        self._store = None
+        self._row = None
+        self._values = {
+            "morph_name": morph_name, "layer": layer, "fullmtype": fullmtype, "etype": etype,
+            "emodel_tpl": emodel_tpl, "combo_name": combo_name, "mtype": mtype,
+            "threshold_current": float(threshold_current),
+            "holding_current": float(holding_current),
+            "exc_mini_frequency": float(exc_mini_frequency),
+            "inh_mini_frequency": float(inh_mini_frequency),
+            "add_params": add_params,
+            "positions": None if position is None else np.multiply(position, scale),
+            "rotations": rotation,
+        }
+
+    @classmethod
+    def _view(cls, store, row):
+        item = cls.__new__(cls)
+        item._store = store
+        item._row = row
+        item._values = None
+        return item
+
+    def _category(self, name):
+        if self._store is None:
+            return self._values[name]
+        column = self._store._columns[name]
+        return None if column is None else column.value(self._row)
+
+    def _number(self, name):
+        if self._store is None:
+            return self._values[name]
+        column = self._store._columns[name]
+        return 0. if column is None else float(column[self._row])
+
+    def _array(self, name):
+        if self._store is None:
+            return self._values[name]
+        column = self._store._columns[name]
+        return None if column is None else column[self._row]
+
+    morph_name = property(lambda self: self._category("morph_name"))
+    layer = property(lambda self: self._category("layer"))
+    fullmtype = property(lambda self: self._category("fullmtype"))
+    etype = property(lambda self: self._category("etype"))
+    emodel_tpl = property(lambda self: self._category("emodel_tpl"))
+    combo_name = property(lambda self: self._category("combo_name"))
+    mtype = property(lambda self: self._category("mtype"))
+    threshold_current = property(lambda self: self._number("threshold_current"))
+    holding_current = property(lambda self: self._number("holding_current"))
+    exc_mini_frequency = property(lambda self: self._number("exc_mini_frequency"))
+    inh_mini_frequency = property(lambda self: self._number("inh_mini_frequency"))
+    add_params = property(lambda self: self._array("add_params"))
+
+    @property
+    def extra_attrs(self):
+        if self._store is None:
+            return {}
+        return {name: values[self._row] for name, values in self._store._extra_attrs.items()}
+
+    @property
+    def local_to_global_matrix(self):
         cli_opts = SimConfig.cli_options
-        self.local_to_global_matrix = self._make_coord_map_matrix(position, rotation, scale) \
-            if cli_opts is None or cli_opts.enable_coord_mapping else False
+        if cli_opts is not None and not cli_opts.enable_coord_mapping:
+            return False
+        rotation = self._array("rotations")
+        if rotation is None or np.isnan(rotation).any():
+            return None
+        return self._make_coord_map_matrix(self._array("positions"), rotation)
 
     @staticmethod
-    def _make_coord_map_matrix(position, rotation, scale):
+    def _make_coord_map_matrix(position, rotation):
         """Build the transformation matrix from local to global"""
-        if rotation is None:
-            return None
         from scipy.spatial.transform import Rotation
         m = np.empty((3, 4), np.float32)
         r = Rotation.from_quat(rotation)  # scipy auto-normalizes
         m[:, :3] = r.as_matrix()
         m[:, 3] = position
-        m[:, 3] *= scale
         return m
 
     def local_to_global_coord_mapping(self, points):
@@ -273,44 +364,175 @@ def vector_rotate_translate(points, transform_matrix):
     return np.einsum('ijk,ik->ij', rot_matrix, points) + translation
 
 
-class METypeManager(dict):
+class METypeManager(Mapping):
     """ Map to hold specific METype info and provide retrieval by gid
-    """
 
-    def insert(self, gid, morph_name, *me_data, **kwargs):
-        """Function to add an METypeItem to internal data structure
+    Info is stored by columns (string categories, float arrays) and METypeItem's are created
+    on access, as lightweight views. Bulk loads are kept in chunks, merged on first read.
+    """
+    _CATEGORICAL = ("morph_name", "emodel_tpl", "mtype", "etype",
+                    "layer", "fullmtype", "combo_name")
+    _FLOATS = ("threshold_current", "holding_current", "exc_mini_frequency", "inh_mini_frequency")
+
+    def __init__(self):
+        self._chunks = []
+        self._data = {"gids": np.empty(0, dtype="uint32")}
+        self._data.update((name, None) for name in
+                          self._CATEGORICAL + self._FLOATS + ("positions", "rotations",
+                                                              "add_params"))
+        self._extra_attrs = {}
+        self._sorted_gids = None
+        self._sorter = None
+
+    def insert(self, gid, morph_name, layer=None, fullmtype=None, etype=None, emodel_tpl=None,
+               combo_name=None, mtype=None, threshold_current=0, holding_current=0,
+               exc_mini_frequency=0, inh_mini_frequency=0, add_params=None,
+               position=None, rotation=None, scale=1.0):
+        """Function to add the METype info of a single cell
         """
-        self[int(gid)] = METypeItem(morph_name, *me_data, **kwargs)
+        self.load_infoNP(
+            [gid], [morph_name], [emodel_tpl], [mtype], [etype],
+            [threshold_current], [holding_current], [exc_mini_frequency], [inh_mini_frequency],
+            None if position is None else np.multiply([position], scale),
+            None if rotation is None else [rotation],
+            [add_params], layers=[layer], fullmtypes=[fullmtype], combo_names=[combo_name])
 
     def load_infoNP(self, gidvec, morph_list, model_templates, mtypes, etypes,
                     threshold_currents=None, holding_currents=None,
                     exc_mini_freqs=None, inh_mini_freqs=None,
                     positions=None, rotations=None,
-                    add_params_list=None):
+                    add_params_list=None, *, layers=None, fullmtypes=None, combo_names=None):
         """Loads METype information in bulk from Numpy arrays
+
+        String attributes may be given as sequences or, avoiding the per-cell strings
+        altogether, as Categorical's (e.g. from sonata enumerations)
+        """
+        n_cells = len(gidvec)
+        chunk = {"gids": np.asarray(gidvec, dtype="uint32")}
+        for name, values in (("morph_name", morph_list), ("emodel_tpl", model_templates),
+                             ("mtype", mtypes), ("etype", etypes), ("layer", layers),
+                             ("fullmtype", fullmtypes), ("combo_name", combo_names)):
+            if values is None:
+                chunk[name] = None
+            elif isinstance(values, Categorical):
+                chunk[name] = Categorical(np.asarray(values.categories, dtype=object),
+                                          np.asarray(values.codes, dtype="int32"))
+            else:
+                chunk[name] = Categorical.from_values(values)
+        for name, values in zip(self._FLOATS, (threshold_currents, holding_currents,
+                                               exc_mini_freqs, inh_mini_freqs)):
+            chunk[name] = None if values is None else np.asarray(values, dtype="float64")
+        chunk["positions"] = None if positions is None else \
+            np.asarray(positions, dtype="float32").reshape(n_cells, 3)
+        chunk["rotations"] = None if rotations is None else \
+            np.asarray(rotations, dtype="float32").reshape(n_cells, 4)
+        chunk["add_params"] = None if add_params_list is None else list(add_params_list)
+        self._add_chunk(chunk)
+
+    def _add_chunk(self, chunk):
+        if self._extra_attrs:
+            raise RuntimeError("Cells can't be added after extra attributes")
+        self._chunks.append(chunk)
+        self._sorted_gids = self._sorter = None
+
+    @property
+    def _columns(self):
+        """The data columns, merging outstanding chunks"""
+        if self._chunks:
+            self._merge_chunks()
+        return self._data
+
+    def _merge_chunks(self):
+        chunks = [self._data] + self._chunks if len(self._data["gids"]) else self._chunks
+        self._chunks = []
+        sizes = [len(chunk["gids"]) for chunk in chunks]
+        data = {"gids": np.concatenate([chunk["gids"] for chunk in chunks])}
+        for name in self._CATEGORICAL:
+            data[name] = Categorical.merge([chunk[name] for chunk in chunks], sizes)
+        for name, default, shape in ([(name, 0., ()) for name in self._FLOATS]
+                                     + [("positions", np.nan, (3,)),
+                                        ("rotations", np.nan, (4,))]):
+            parts = [chunk[name] for chunk in chunks]
+            data[name] = None if all(part is None for part in parts) else np.concatenate([
+                np.full((size,) + shape, default, dtype=float if shape == () else "float32")
+                if part is None else part
+                for part, size in zip(parts, sizes)
+            ])
+        parts = [chunk["add_params"] for chunk in chunks]
+        data["add_params"] = None if all(part is None for part in parts) else [
+            params for part, size in zip(parts, sizes) for params in (part or [None] * size)
+        ]
+        self._data = self._drop_overridden(data)
+
+    @staticmethod
+    def _drop_overridden(data):
+        """Resolves repeated gids as a dict would: the last values, at the first position"""
+        gids = data["gids"]
+        order = np.argsort(gids, kind="stable")
+        sorted_gids = gids[order]
+        is_new = sorted_gids[1:] != sorted_gids[:-1]
+        if is_new.all():
+            return data
+        first_rows = order[np.insert(is_new, 0, True)]
+        last_rows = order[np.append(is_new, True)]
+        rows = last_rows[np.argsort(first_rows)]
+        for name, column in data.items():
+            if isinstance(column, Categorical):
+                data[name] = Categorical(column.categories, column.codes[rows])
+            elif isinstance(column, list):
+                data[name] = [column[row] for row in rows.tolist()]
+            elif column is not None:
+                data[name] = column[rows]
+        return data
+
+    def add_extra_attribute(self, name, values):
+        """Sets an extra attribute (dynamic property) of all the cells, in their load order"""
+        if len(values) != len(self):
+            raise ValueError("Extra attribute %s has %d values for %d cells"
+                             % (name, len(values), len(self)))
+        self._extra_attrs[name] = values
+
+    def _rows(self, gids):
+        """The rows of the given gids, -1 for unknown gids"""
+        all_gids = self._columns["gids"]
+        if self._sorter is None:
+            self._sorter = np.argsort(all_gids, kind="stable")
+            self._sorted_gids = all_gids[self._sorter]
+        gids = np.asarray(gids, dtype="uint32")
+        if not len(all_gids):
+            return np.full(len(gids), -1)
+        pos = np.searchsorted(self._sorted_gids, gids).clip(max=len(all_gids) - 1)
+        return np.where(self._sorted_gids[pos] == gids, self._sorter[pos], -1)
+
+    def get_items(self, gids):
+        """Iterates over the METypeItem's of several gids (None for unknown), vectorized lookup
         """
-        for idx, gid in enumerate(gidvec):
-            th_current = threshold_currents[idx] if threshold_currents is not None else .0
-            hd_current = holding_currents[idx] if holding_currents is not None else .0
-            exc_mini_freq = exc_mini_freqs[idx] if exc_mini_freqs is not None else .0
-            inh_mini_freq = inh_mini_freqs[idx] if inh_mini_freqs is not None else .0
-            position = positions[idx] if positions is not None else None
-            rotation = rotations[idx] if rotations is not None else None
-            mtype = mtypes[idx] if mtypes is not None else None
-            add_params = add_params_list[idx] if add_params_list is not None else None
-            self[int(gid)] = METypeItem(
-                morph_list[idx],
-                etype=etypes[idx] if etypes is not None else None,
-                emodel_tpl=model_templates and model_templates[idx],
-                mtype=mtype,  # TODO: check this
-                threshold_current=th_current,
-                holding_current=hd_current,
-                exc_mini_frequency=exc_mini_freq,
-                inh_mini_frequency=inh_mini_freq,
-                position=position,
-                rotation=rotation,
-                add_params=add_params
-            )
+        for row in self._rows(gids).tolist():
+            yield None if row < 0 else METypeItem._view(self, row)
+
+    def __getitem__(self, gid):
+        row = self._rows([gid])[0]
+        if row < 0:
+            raise KeyError(gid)
+        return METypeItem._view(self, row)
+
+    def __contains__(self, gid):
+        return self._rows([gid])[0] >= 0
+
+    def __len__(self):
+        return len(self._columns["gids"])
+
+    def __iter__(self):
+        return iter(self._columns["gids"].tolist())
+
+    def items(self):
+        return zip(self, (METypeItem._view(self, row) for row in range(len(self))))
+
+    def update(self, other):
+        """Appends the cells of another METypeManager"""
+        if other._extra_attrs:
+            raise RuntimeError("Cells with extra attributes can't be merged")
+        self._add_chunk(other._columns)
 
     def retrieve_info(self, gid):
         return self.get(gid) \
@@ -318,4 +540,4 @@ class METypeManager(dict):
 
     @property
     def gids(self):
-        return self.keys()
+        return self._columns["gids"]
@@ -4,8 +4,17 @@ features on top of MorphIO basic morphology handling.
 """
 import os
 import logging
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 import numpy as np
 from numpy.linalg import eig, norm
+from .core import NeurodamusCore as Nd
+from .utils.timeit import TimerManager
+
+MORPHOLOGY_CACHE_SIZE = 64
+"""The default max number of processed morphologies kept by the morphology cache (per rank)"""
+PREFETCH_MAX_BYTES = 256 << 20
+"""The default max total file size of the morphologies prefetched and not yet requested"""
 
 
 '''
@@ -173,6 +182,25 @@ def single_point_sphere_to_circular_contour(neuron):
 '''
 
 
+def round_significant(values, digits=8):
+    """Rounds values to significant digits, vectorized.
+
+    Gives the same doubles as parsing the values formatted with "%.<digits>g", as the hoc
+    commands do, for single precision values (MorphIO points) of magnitude above 1e-5.
+    Products with the powers of 10 involved are then exact, so is the rounding.
+    """
+    values = np.asarray(values, dtype="d")
+    magnitude = np.abs(values)
+    exponent = np.floor(np.log10(magnitude, out=np.zeros_like(magnitude), where=magnitude > 0))
+    # log10 may be off by one next to powers of 10
+    exponent -= magnitude < 10.0 ** exponent
+    exponent += magnitude >= 10.0 ** (exponent + 1)
+    scale_exp = digits - 1 - exponent
+    scale = 10.0 ** np.abs(scale_exp)  # negative powers of 10 are inexact
+    return np.where(scale_exp >= 0, np.rint(values * scale) / scale,
+                    np.rint(values / scale) * scale)
+
+
 class MorphIOWrapper:
     """
         A class that wraps a MorphIO object and gets everything ready for HOC usage
@@ -184,6 +212,7 @@ class MorphIOWrapper:
     def __init__(self, input_file, options=0):
         self._collection_dir, self._morph_name, self._morph_ext = split_morphology_path(input_file)
         self._options = options
+        self._hoc_commands = None
         self._build_morph()
         self._sec_idx2names = {}
         self._build_sec_idx2names()
@@ -275,8 +304,59 @@ class MorphIOWrapper:
         self._sec_typeid_distrib.dtype = [('type_id', '<i8'), ('start_id', '<i8'), ('count', '<i8')]
 
     def morph_as_hoc(self):
-        """ Uses morphio object to read and generate hoc commands just like import3d_gui.hoc """
+        """ Uses morphio object to read and generate hoc commands just like import3d_gui.hoc
+
+        The commands are generated once per wrapper. They must not be modified.
+        """
+        if self._hoc_commands is None:
+            self._hoc_commands = self._build_hoc_commands()
+        return self._hoc_commands
+
+    def instantiate(self, cell):
+        """ Creates the morphology sections in a cell, without generating hoc commands.
+
+        Alternative to executing morph_as_hoc() commands, with the same topology and section
+        names. Only the section arrays and subsets are created via hoc, once per section type.
+        Sections are connected and their 3D points bulk-loaded from the MorphIO arrays.
+        As in the hoc commands, points and diameters are rounded to 8 significant digits.
+
+        Args:
+            cell: The hoc cell object, owning the sections
+        """
+        # Create the section arrays in the same (type id) order as the hoc commands
+        for type_id, _, count in self._sec_typeid_distrib.ravel().tolist():
+            tstr = self.type2name(type_id)
+            Nd.execute("create {}[{}]".format(tstr, count), cell)
+            Nd.execute(self.mksubset(type_id, count, tstr), cell)
+        Nd.execute("forall all.append", cell)
+
+        # All sections, indexed like section_index2name_dict, i.e. in MorphIO section order
+        sections = []
+        distrib = np.sort(self._sec_typeid_distrib.ravel(), order="start_id")
+        for type_id, _, count in distrib.tolist():
+            sec_array = getattr(cell, self.type2name(type_id))
+            sections.extend(sec_array[i] for i in range(count))
+        soma = sections[0]
+
+        # Soma points order is reversed wrt NEURON's soma points
+        self._pt3d_add(soma, self._morph.soma.points[::-1], self._morph.soma.diameters[::-1])
 
+        for i, sec in enumerate(self._morph.sections):
+            nrn_sec = sections[i + 1]
+            if not sec.is_root:
+                if sec.parent is not None:
+                    nrn_sec.connect(sections[sec.parent.id + 1](1), 0)
+            else:
+                nrn_sec.connect(soma(0.5), 0)
+            self._pt3d_add(nrn_sec, sec.points, sec.diameters)
+
+    @staticmethod
+    def _pt3d_add(sec, points, diameters):
+        points = round_significant(points)
+        Nd.h.pt3dadd(Nd.Vector(points[:, X]), Nd.Vector(points[:, Y]), Nd.Vector(points[:, Z]),
+                     Nd.Vector(round_significant(diameters)), sec=sec)
+
+    def _build_hoc_commands(self):
         cmds = []
 
         '''
@@ -380,3 +460,134 @@ class MorphIOWrapper:
     '''
         [END] Python versions of import3d_gui.hoc helper functions
     '''
+
+
+class MorphologyCache:
+    """A size-bounded LRU cache of processed morphologies (MorphIOWrapper objects).
+
+    Entries are keyed by the morphology path and MorphIO options, so that local cells sharing
+    a morphology (e.g. cloned morphologies) load and process it only once.
+    """
+
+    def __init__(self, max_size=MORPHOLOGY_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        # Prefetching state
+        self._queue = deque()  # (key, future, file size), in the expected order of get()
+        self._queue_bytes = 0
+        self._next_key = None  # next key to prefetch, waiting for room in the queue
+        self._prefetch_keys = None
+        self._prefetch_max = 0
+        self._prefetch_max_bytes = 0
+        self._executor = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, morphology_path, options=0):
+        """Get the MorphIOWrapper of a morphology, loading it if not in the cache"""
+        key = (os.path.abspath(morphology_path), options)
+        future = self._pop_prefetched(key) if self._executor is not None else None
+        morph_wrapper = self._entries.get(key)
+        if morph_wrapper is not None:
+            self._entries.move_to_end(key)
+            TimerManager.count("Morphology cache hits")
+        else:
+            if future is not None:
+                TimerManager.count("Morphology prefetch hits")
+                morph_wrapper = future.result()  # re-raises loading errors
+            else:
+                TimerManager.count("Morphology cache misses")
+                morph_wrapper = MorphIOWrapper(morphology_path, options)
+            if self.max_size > 0:
+                self._entries[key] = morph_wrapper
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        self._prefetch_next()
+        return morph_wrapper
+
+    def clear(self):
+        self._entries.clear()
+
+    @contextmanager
+    def prefetching(self, morphology_paths, n_threads, max_ahead=None,
+                    max_ahead_bytes=PREFETCH_MAX_BYTES, options=0):
+        """A context where morphologies are read and processed ahead in background threads.
+
+        The main thread, instantiating the cells, gets them as usual with get(), waiting only
+        if they are not ready yet. Should morphologies be requested in a different order than
+        morphology_paths, prefetching stops and they are loaded on request.
+
+        Args:
+            morphology_paths: The morphology paths, in the order they will be requested
+            n_threads: The number of loader threads
+            max_ahead: The max number of morphologies loaded ahead and not yet requested.
+                Default: 4 per thread
+            max_ahead_bytes: The max total file size of the morphologies loaded ahead and not
+                yet requested, bounding the extra memory. A single morphology is loaded ahead
+                regardless of its size
+            options: The MorphIO options of the morphologies
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        self._prefetch_keys = ((os.path.abspath(path), options) for path in morphology_paths)
+        self._prefetch_max = max_ahead or 4 * n_threads
+        self._prefetch_max_bytes = max_ahead_bytes
+        with ThreadPoolExecutor(n_threads, thread_name_prefix="morph_prefetch") as executor:
+            self._executor = executor
+            try:
+                self._prefetch_next()
+                yield self
+            finally:
+                self._stop_prefetch()
+                self._executor = None
+
+    def _pop_prefetched(self, key):
+        """Pops the next morphology of the prefetch queue, returning its future if it is key"""
+        if not self._queue:
+            return None
+        queued_key, future, size = self._queue.popleft()
+        self._queue_bytes -= size
+        if queued_key == key:
+            return future
+        # Otherwise the queue would never be consumed: stop prefetching, load on request
+        logging.warning("Morphology %s requested out of the prefetch order. "
+                        "Prefetching stopped", key[0])
+        TimerManager.count("Morphology prefetch out of order")
+        self._stop_prefetch()
+        return None
+
+    def _prefetch_next(self):
+        """Submits the next morphologies to the loader threads, within the look-ahead bounds"""
+        while self._prefetch_keys is not None and len(self._queue) < self._prefetch_max:
+            if self._next_key is None:
+                self._next_key = next(self._prefetch_keys, None)
+                if self._next_key is None:
+                    self._prefetch_keys = None
+                    break
+            key = self._next_key
+            # Repeated morphologies share the load. Cached ones are expected to be hits
+            future = next((f for k, f, _ in self._queue if k == key), None)
+            size = 0
+            if future is None and key not in self._entries:
+                try:
+                    size = os.path.getsize(key[0])
+                except OSError:
+                    pass  # the loader reports it
+                if self._queue and self._queue_bytes + size > self._prefetch_max_bytes:
+                    break
+                future = self._executor.submit(MorphIOWrapper, *key)
+            self._queue.append((key, future, size))
+            self._queue_bytes += size
+            self._next_key = None
+
+    def _stop_prefetch(self):
+        for _, future, _ in self._queue:
+            if future is not None:
+                future.cancel()
+        self._queue.clear()
+        self._queue_bytes = 0
+        self._next_key = None
+        self._prefetch_keys = None
+
+
+morphology_cache = MorphologyCache()  # singleton
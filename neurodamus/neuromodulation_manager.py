@@ -51,8 +51,9 @@ class NeuroModulationConnection(Connection):
         # Initialize member lists
         self._init_artificial_stims(cell, replay_mode)
 
+        synapses_params = self.synapse_params
         for syn_i, sec in self.sections_with_synapses:
-            syn_params = self._synapse_params[syn_i]
+            syn_params = synapses_params[syn_i]
             # We need to get all connections since we dont know the sgid
             # TODO: improve this by extracting all the relative distances only once
             base_conns = base_manager.get_connections(self.tgid)
@@ -83,8 +84,9 @@ class NeuroModulationConnection(Connection):
         min_diff = 0.05
         syn_obj = None
         for base_conn in base_conns:
+            base_params = base_conn.synapse_params
             for syn_j, _ in base_conn.sections_with_synapses:
-                params_j = base_conn._synapse_params[syn_j]
+                params_j = base_params[syn_j]
                 if params_j.isec != section_i:
                     continue
                 diff = abs(params_j.location - location_i)
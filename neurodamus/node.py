@@ -8,10 +8,12 @@ import itertools
 import logging
 import math
 import os
+import shutil
 import subprocess
 from os import path as ospath
 from collections import namedtuple, defaultdict
 from contextlib import contextmanager
+import numpy
 
 from .core import MPI, mpi_no_errors, return_neuron_timings, run_only_rank0, SimulationProgress
 from .core import NeurodamusCore as Nd
@@ -22,18 +24,20 @@ from .core.configuration import ConfigurationError, find_input_file, get_debug_c
 from .core.nodeset import PopulationNodes
 from .cell_distributor import CellDistributor, VirtualCellPopulation, GlobalCellManager
 from .cell_distributor import LoadBalance, LoadBalanceMode
+from .connection import ReplayStim
 from .connection_manager import SynapseRuleManager, edge_node_pop_names
 from .gap_junction import GapJunctionManager
 from .replay import MissingSpikesPopulationError, SpikeManager
 from .report import Report
 from .stimulus_manager import StimulusManager
 from .modification_manager import ModificationManager
+from .morphio_wrapper import morphology_cache
 from .neuromodulation_manager import NeuroModulationManager
 from .target_manager import TargetSpec, TargetManager
 from .utils import compat
 from .utils.logging import log_stage, log_verbose, log_all
 from .utils.memory import DryRunStats, trim_memory, pool_shrink, free_event_queues, print_mem_usage
-from .utils.memory import import_allocation_stats
+from .utils.memory import allocation_stats_filename, import_allocation_stats
 from .utils.timeit import TimerManager, timeit
 from .core.coreneuron_configuration import CoreConfig, CompartmentMapping
 from .io.sonata_config import ConnectionTypes
@@ -272,6 +276,7 @@ class Node:
             self._pc = Nd.pc
             self._spike_vecs = []
             self._spike_populations = []
+            self._spikes_writer = None
             Nd.execute("cvode = new CVode()")
             SimConfig.init(config_file, options)
             if SimConfig.use_coreneuron:
@@ -375,10 +380,14 @@ class Node:
             return None
         elif lb_mode == LoadBalanceMode.Memory:
             logging.info("Load Balancing ENABLED. Mode: Memory")
-            filename = f"allocation_r{MPI.size}_c{SimConfig.modelbuilding_steps}.pkl.gz"
-
-            if ospath.exists(filename):
-                alloc = import_allocation_stats(filename, self._cycle_i)
+            filename = allocation_stats_filename(DryRunStats._ALLOCATION_FILENAME, MPI.size,
+                                                 SimConfig.modelbuilding_steps)
+            legacy_filename = filename[:-len(".npy")] + ".pkl.gz"
+
+            if ospath.exists(filename) or ospath.exists(legacy_filename):
+                # Every rank reads its own gids only. The file name ensures the rank count
+                filename = filename if ospath.exists(filename) else legacy_filename
+                alloc = import_allocation_stats(filename, self._cycle_i, MPI.rank)
             else:
                 logging.warning("Allocation file not found. Generating on-the-fly.")
                 self._dry_run_stats = DryRunStats()
@@ -392,22 +401,22 @@ class Node:
                     SimConfig.modelbuilding_steps,
                     DryRunStats._MEMORY_USAGE_PER_METYPE_FILENAME
                 )
+                if MPI.rank == 0:
+                    unique_ranks = set(
+                        rank[0] if isinstance(rank, tuple) else rank
+                        for pop in alloc.values()
+                        for rank in pop.keys()
+                    )
+                    logging.debug("Unique ranks in allocation file: %s", len(unique_ranks))
+                    if MPI.size != len(unique_ranks):
+                        raise ConfigurationError(
+                            "The number of ranks in the allocation file is different from the "
+                            "number of ranks in the current run. The allocation file was created "
+                            "with a different number of ranks."
+                        )
             for pop, ranks in alloc.items():
                 for rank, gids in ranks.items():
                     logging.debug(f"Population: {pop}, Rank: {rank}, Number of GIDs: {len(gids)}")
-            if MPI.rank == 0:
-                unique_ranks = set(
-                    rank[0] if isinstance(rank, tuple) else rank
-                    for pop in alloc.values()
-                    for rank in pop.keys()
-                )
-                logging.debug("Unique ranks in allocation file: %s", len(unique_ranks))
-                if MPI.size != len(unique_ranks):
-                    raise ConfigurationError(
-                        "The number of ranks in the allocation file is different from the number "
-                        "of ranks in the current run. The allocation file was created with a "
-                        "different number of ranks."
-                    )
             return alloc
 
         # Build load balancer as per requested options
@@ -456,6 +465,8 @@ class Node:
 
         log_stage("LOADING NODES")
         config = SimConfig.cli_options
+        if config.morphology_cache_size is not None:
+            morphology_cache.max_size = int(config.morphology_cache_size)
         if not load_balance:
             logging.info("Load-balance object not present. Continuing Round-Robin...")
         # Always create a cell_distributor even if engine is disabled.
@@ -474,6 +485,8 @@ class Node:
                                             load_balancer=load_balance,
                                             loader_opts=loader_opts)
 
+        morphology_cache.clear()  # All cells instantiated, release the morphologies
+
         lfp_weights_file = self._run_conf.get("LFPWeightsPath")
         if lfp_weights_file:
             if SimConfig.use_coreneuron:
@@ -484,7 +497,12 @@ class Node:
                     for manager in cell_managers
                     if manager.population_name is not None
                 ]
-                lfp_manager.load_lfp_config(lfp_weights_file, population_list)
+                local_node_ids = {
+                    manager.population_name: manager.local_nodes.raw_gids() - 1
+                    for manager in cell_managers
+                    if manager.population_name is not None
+                }
+                lfp_manager.load_lfp_config(lfp_weights_file, population_list, local_node_ids)
             else:
                 logging.warning("Online LFP supported only with CoreNEURON.")
 
@@ -537,8 +555,7 @@ class Node:
             return
 
         log_stage("Configuring connections...")
-        for conn_conf in SimConfig.connections.values():
-            self._process_connection_configure(conn_conf)
+        self._process_connection_configure(SimConfig.connections.values())
 
         logging.info("Done, but waiting for all ranks")
 
@@ -579,21 +596,33 @@ class Node:
         )
         self._load_connections(conf, manager)  # load internal connections right away
 
-    def _process_connection_configure(self, conn_conf):
-        source_t = TargetSpec(conn_conf["Source"])
-        dest_t = TargetSpec(conn_conf["Destination"])
-        source_t.population, dest_t.population = self._circuits.unalias_pop_keys(
-            source_t.population, dest_t.population
-        )
-        src_target = self.target_manager.get_target(source_t)
-        dst_target = self.target_manager.get_target(dest_t)
-        # Loop over population pairs
-        for src_pop in src_target.population_names:
-            for dst_pop in dst_target.population_names:
-                # Loop over all managers having connections between the populations
-                for conn_manager in self._circuits.get_edge_managers(src_pop, dst_pop):
-                    logging.debug("Using connection manager: %s", conn_manager)
-                    conn_manager.configure_connections(conn_conf)
+    def _process_connection_configure(self, conn_confs):
+        """Configures the connections according to the Connection blocks.
+
+        The blocks are grouped by the connection managers they apply to, so that each manager
+        configures all its connections in a single pass, keeping the blocks order.
+        """
+        manager_blocks = {}
+        for conn_conf in conn_confs:
+            source_t = TargetSpec(conn_conf["Source"])
+            dest_t = TargetSpec(conn_conf["Destination"])
+            source_t.population, dest_t.population = self._circuits.unalias_pop_keys(
+                source_t.population, dest_t.population
+            )
+            src_target = self.target_manager.get_target(source_t)
+            dst_target = self.target_manager.get_target(dest_t)
+            # Loop over population pairs
+            for src_pop in src_target.population_names:
+                for dst_pop in dst_target.population_names:
+                    # Loop over all managers having connections between the populations
+                    for conn_manager in self._circuits.get_edge_managers(src_pop, dst_pop):
+                        blocks = manager_blocks.setdefault(conn_manager, [])
+                        if not blocks or blocks[-1] is not conn_conf:
+                            blocks.append(conn_conf)
+
+        for conn_manager, blocks in manager_blocks.items():
+            logging.debug("Using connection manager: %s", conn_manager)
+            conn_manager.configure_connection_blocks(blocks)
 
     # -
     def _load_connections(self, circuit_conf, conn_manager):
@@ -727,6 +756,7 @@ class Node:
             return
 
         log_stage("Handling Replay")
+        ReplayStim.enable_sharing(SimConfig.cli_options.shared_replay_stims)
 
         if SimConfig.use_coreneuron and bool(self._core_replay_file):
             logging.info(" -> [REPLAY] Reusing stim file from previous cycle")
@@ -770,9 +800,14 @@ class Node:
             pop_offsets, alias_pop = CircuitManager.read_population_offsets(read_virtual_pop=True)
 
         for src_pop in src_target.population_names:
+            replay_gids = None
+            if SimConfig.cli_options.distributed_replay and not SimConfig.restore_coreneuron:
+                replay_gids = self._get_replay_source_gids(
+                    source, target, src_pop, dst_target.population_names, ptype_cls)
             try:
                 log_verbose("Loading replay spikes for population '%s'", src_pop)
-                spike_manager = SpikeManager(spike_filepath, tshift, src_pop)  # Disposable
+                spike_manager = SpikeManager(spike_filepath, tshift, src_pop,  # Disposable
+                                             replay_gids)
             except MissingSpikesPopulationError:
                 logging.info("  > No replay for src population: '%s'", src_pop)
                 continue
@@ -794,6 +829,16 @@ class Node:
                              src_pop_str, dst_pop_str, src_pop_offset)
                 conn_manager.replay(spike_manager, source, target, delay)
 
+    def _get_replay_source_gids(self, source, target, src_pop, dst_pops, ptype_cls):
+        """The raw gids of src_pop having local connections to the target, for distributed replay
+        """
+        gids = [numpy.empty(0, dtype="int64")]
+        for dst_pop in dst_pops:
+            conn_manager = self._circuits.get_edge_manager(src_pop, dst_pop, ptype_cls)
+            if conn_manager:
+                gids.append(conn_manager.get_source_gids(source, target))
+        return numpy.unique(numpy.concatenate(gids))
+
     # -
     @mpi_no_errors
     @timeit(name="Enable Modifications")
@@ -1288,7 +1333,8 @@ class Node:
         fwd_skip = self._run_conf.get("ForwardSkip", 0) if not corenrn_restore else 0
 
         if not corenrn_restore:
-            CompartmentMapping(self._circuits.global_manager).register_mapping()
+            with timeit(name="Compartment mapping"):
+                CompartmentMapping(self._circuits.global_manager).register_mapping()
             if not SimConfig.coreneuron_direct_mode:
                 with self._coreneuron_ensure_all_ranks_have_gids(CoreConfig.datadir):
                     self._pc.nrnbbcore_write(CoreConfig.datadir)
@@ -1431,8 +1477,53 @@ class Node:
             next_flush = min(tstop, cur_t + buffer_t)
             self._pc.psolve(next_flush)
             cur_t = next_flush
+            if SimConfig.cli_options.stream_spikes:
+                self._stream_spikes()
         Nd.t = cur_t
 
+    # -
+    def _spike_shard_file(self, rank):
+        return ospath.join(SimConfig.output_root, "spike_shards", "r{}.h5".format(rank))
+
+    def _stream_spikes(self):
+        """Appends the spikes recorded so far to the rank spike shard, emptying the vectors.
+
+        Shards are SONATA spike files with the spikes of a rank, sorted by time. Ranks write
+        independently, and should the run crash, the shards are still valid up to the last
+        flush. They are merged into the spikes file by `sonata_spikes`.
+        """
+        if self._spikes_writer is None:
+            from .io.spike_writer import SonataSpikeWriter
+            shard_file = self._spike_shard_file(MPI.rank)
+            os.makedirs(ospath.dirname(shard_file), exist_ok=True)
+            self._spikes_writer = SonataSpikeWriter(
+                shard_file, [population or "All" for population, _ in self._spike_populations])
+        for (population, population_offset), (spikevec, idvec) in zip(self._spike_populations,
+                                                                      self._spike_vecs):
+            timestamps = spikevec.as_numpy()
+            gids = idvec.as_numpy()
+            order = numpy.lexsort((gids, timestamps))
+            self._spikes_writer.append(population or "All", timestamps[order],
+                                       gids[order].astype("u8") - population_offset - 1)
+            spikevec.resize(0)
+            idvec.resize(0)
+        self._spikes_writer.flush()
+
+    def _merge_spike_shards(self):
+        """Merges the rank spike shards into the spikes file, removing them.
+
+        Shards are read in chunks, so that memory is bound regardless of the number of spikes
+        """
+        self._stream_spikes()  # The spikes since the last flush
+        self._spikes_writer.close()
+        self._spikes_writer = None
+        MPI.allreduce(0, MPI.SUM)  # Wait for all shards to be complete
+        if MPI.rank == 0:
+            from .io.spike_writer import merge_spike_files
+            merge_spike_files([self._spike_shard_file(rank) for rank in range(MPI.size)],
+                              ospath.join(SimConfig.output_root, self._spikes_filename()))
+            shutil.rmtree(ospath.dirname(self._spike_shard_file(0)))
+
     # -
     @mpi_no_errors
     def clear_model(self, avoid_creating_objs=False, avoid_clearing_queues=True):
@@ -1451,6 +1542,7 @@ class Node:
                     self._sonatareport_helper.clear()
 
         Node.__init__(self, None, None)  # Reset vars
+        ReplayStim.enable_sharing(False)  # Drop the shared stims of the cleared connections
 
         # Clear BBSaveState
         self._bbss.ignore()
@@ -1477,16 +1569,13 @@ class Node:
         """ Write the spike events that occured on each node into a single output SONATA file.
         """
         output_root = SimConfig.output_root
+        if self._spikes_writer is not None:
+            self._merge_spike_shards()
+            return
         if hasattr(self._sonatareport_helper, "create_spikefile"):
             # Write spike report for multiple populations if exist
-            spike_path = self._run_conf.get("SpikesFile")
-            if spike_path is not None:
-                # Get only the spike file name
-                file_name = spike_path.split('/')[-1]
-            else:
-                file_name = "out.h5"
             # create a sonata spike file
-            self._sonatareport_helper.create_spikefile(output_root, file_name)
+            self._sonatareport_helper.create_spikefile(output_root, self._spikes_filename())
             # write spikes per population
             for (population, population_offset), (spikevec, idvec) in zip(self._spike_populations,
                                                                           self._spike_vecs):
@@ -1505,6 +1594,11 @@ class Node:
             extra_args = (population,)
             self._sonatareport_helper.write_spikes(spikevec, idvec, output_root, *extra_args)
 
+    def _spikes_filename(self):
+        spike_path = self._run_conf.get("SpikesFile")
+        # Get only the spike file name
+        return spike_path.split('/')[-1] if spike_path is not None else "out.h5"
+
     def dump_cell_config(self):
         if not self._pr_cell_gid:
             return
@@ -1804,7 +1898,11 @@ class Neurodamus(Node):
             self._dry_run_stats.display_node_suggestions()
             ranks = self._dry_run_stats.get_num_target_ranks(SimConfig.num_target_ranks)
             self._dry_run_stats.collect_all_mpi()
-            self._dry_run_stats.distribute_cells(ranks, SimConfig.modelbuilding_steps)
+            synapse_factor = float(SimConfig.cli_options.dry_run_synapse_factor or 0)
+            syn_weights = self._dry_run_stats.metype_cell_syn_average if synapse_factor else None
+            self._dry_run_stats.distribute_cells(ranks, SimConfig.modelbuilding_steps,
+                                                 secondary_weights=syn_weights,
+                                                 secondary_factor=synapse_factor)
             return
         if not SimConfig.simulate_model:
             self.sim_init()
@@ -2,13 +2,18 @@
 Stimulus implementation where incoming synaptic events are replayed for a single gid
 """
 from __future__ import absolute_import
+import hashlib
 import os
 import logging
 import numpy
+from .core import MPI
 from .utils.logging import log_verbose
 from .utils.multimap import GroupedMultiMap
 from .utils.timeit import timeit
 
+SPIKES_CACHE_DIR = "~/.cache/neurodamus/spikes"
+"""Cache location of ascii spike files converted to binary, when their folder isnt writable"""
+
 
 class SpikeManager:
     """ Holds and manages gid spike time information, specially for Replay.
@@ -22,31 +27,40 @@ class SpikeManager:
     _ascii_spike_dtype = [('time', 'double'), ('gid', 'uint32')]
 
     @timeit(name="Replay init")
-    def __init__(self, spike_filename, delay=0, population=None):
+    def __init__(self, spike_filename, delay=0, population=None, gids=None):
         """Constructor for SynapseReplay.
 
         Args:
             spike_filename: path to spike out file.
                 if ext is .bin, interpret as binary file; otherwise, interpret as ascii
             delay: delay to apply to spike times
+            population: the spikes population (SONATA files)
+            gids: (Distributed mode) the raw gids whose spikes are required in this rank.
+                All ranks then read a part of the file and exchange the events so that each
+                rank only keeps the spikes of its gids. Must be called by all ranks.
         """
         self._gid_fire_events = None
         # Nd.distributedSpikes = 0  # Wonder the effects of this
-        self.open_spike_file(spike_filename, delay, population)
+        self.open_spike_file(spike_filename, delay, population, gids)
 
     #
-    def open_spike_file(self, filename, delay, population=None):
+    def open_spike_file(self, filename, delay, population=None, gids=None):
         """Opens a given spike file.
 
         Args:
             filename: path to spike out file. Interpret as binary or ascii according to extension
             delay: delay to apply to spike times
+            population: the spikes population (SONATA files)
+            gids: (Distributed mode) the raw gids whose spikes are required in this rank
         """
         # determine if we have binary or ascii file
         # TODO: filename should be able to handle relative paths,
         # using the Run.CurrentDir as an initial path
         # _read_spikes_xxx shall return numpy arrays
-        if filename.endswith(".h5"):
+        if gids is not None:
+            tvec, gidvec = self._read_spikes_partition(filename, population, MPI.rank, MPI.size)
+            tvec, gidvec = self._exchange_events(tvec, gidvec, gids)
+        elif filename.endswith(".h5"):
             tvec, gidvec = self._read_spikes_sonata(filename, population)
         elif filename.endswith(".bin"):
             tvec, gidvec = self._read_spikes_binary(filename)
@@ -70,9 +84,20 @@ class SpikeManager:
 
     @classmethod
     def _read_spikes_ascii(cls, filename):
-        log_verbose("Reading ascii spike file %s", filename)
-        # first line is '/scatter'
-        spikes = numpy.loadtxt(filename, dtype=cls._ascii_spike_dtype, skiprows=1, ndmin=1)
+        """Reads an ascii spike file, using (or creating) its binary cache.
+        """
+        cache_files = cls._ascii_cache_filenames(filename)
+        cache_file = next((f for f in cache_files if os.path.isfile(f)), None)
+        if cache_file:
+            log_verbose("Reading cached spikes of %s from %s", filename, cache_file)
+            spikes = numpy.load(cache_file, mmap_mode="c")
+        else:
+            log_verbose("Reading ascii spike file %s", filename)
+            # first line is '/scatter'
+            spikes = numpy.loadtxt(filename, dtype=cls._ascii_spike_dtype, skiprows=1, ndmin=1)
+            spikes = spikes[numpy.argsort(spikes["gid"], kind="stable")]
+            if MPI.rank == 0:
+                cls._save_ascii_cache(spikes, cache_files)
 
         if len(spikes) > 0:
             log_verbose("Loaded %d spikes", len(spikes))
@@ -81,6 +106,38 @@ class SpikeManager:
 
         return spikes["time"], spikes["gid"]
 
+    @staticmethod
+    def _ascii_cache_filenames(filename):
+        """The candidate paths of the binary cache of an ascii spike file: next to it or in the
+        user cache dir. Their name includes a key of the file path, size and modification time.
+        """
+        stat = os.stat(filename)
+        filename = os.path.abspath(filename)
+        key = hashlib.sha1(f"{filename}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()
+        cache_name = "{}.{}.npy".format(os.path.basename(filename), key[:16])
+        return [os.path.join(os.path.dirname(filename), cache_name),
+                os.path.join(os.path.expanduser(SPIKES_CACHE_DIR), cache_name)]
+
+    @staticmethod
+    def _save_ascii_cache(spikes, cache_files):
+        """Saves the (gid-sorted) spikes to the first writable cache location"""
+        for cache_file in cache_files:
+            tmp_file = "{}.{}.tmp".format(cache_file, os.getpid())
+            try:
+                os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+                with open(tmp_file, "wb") as f:
+                    numpy.save(f, spikes)
+                os.replace(tmp_file, cache_file)  # atomic, readers never see partial files
+            except OSError as e:
+                log_verbose("Could not write spikes cache %s: %s", cache_file, e)
+                if os.path.exists(tmp_file):
+                    os.remove(tmp_file)
+                continue
+            log_verbose("Spikes cached in %s", cache_file)
+            return cache_file
+        logging.warning("Could not write the binary cache of the replay spikes")
+        return None
+
     @staticmethod
     def _read_spikes_binary(filename):
         """Read in the binary file with spike events.
@@ -110,6 +167,73 @@ class SpikeManager:
 
         return tvec, gidvec
 
+    @classmethod
+    def _read_spikes_partition(cls, filename, population, part, n_parts):
+        """Reads a part of the spike events, of n_parts of similar size.
+
+        SONATA and binary files are read partially. Ascii files are read by the first part only.
+        """
+        if filename.endswith(".h5"):
+            import h5py
+            with h5py.File(filename, "r") as spikes_file:
+                if population not in spikes_file.get("spikes", {}):
+                    raise MissingSpikesPopulationError("Spikes population not found: "
+                                                       + str(population))
+                spikes = spikes_file["spikes"][population]
+                start, end = cls._partition_range(len(spikes["node_ids"]), part, n_parts)
+                return spikes["timestamps"][start:end], spikes["node_ids"][start:end] + 1
+
+        if filename.endswith(".bin"):
+            n_events = os.stat(filename).st_size // 16
+            start, end = cls._partition_range(n_events, part, n_parts)
+            with open(filename, "rb") as reader:
+                tvec = numpy.fromfile(reader, "d", end - start, offset=start * 8)
+                reader.seek((n_events + start) * 8)
+                gidvec = numpy.fromfile(reader, "d", end - start).astype("uint32")
+            return tvec, gidvec
+
+        if part == 0:
+            return cls._read_spikes_ascii(filename)
+        return numpy.empty(0), numpy.empty(0, dtype="uint32")
+
+    @staticmethod
+    def _partition_range(n_elements, part, n_parts):
+        """The [start, end) range of a part of n_elements, split in n_parts"""
+        return n_elements * part // n_parts, n_elements * (part + 1) // n_parts
+
+    @staticmethod
+    def _exchange_events(tvec, gidvec, gids):
+        """Exchanges spike events among ranks so that each one gets the events of the given gids.
+
+        Events are first sent to the rank owning their gid (gid modulo the number of ranks).
+        Ranks then request the events of their gids from the owners.
+        """
+        n_ranks = MPI.size
+
+        def split_by_owner(gid_array, *arrays):
+            owners = gid_array % n_ranks
+            order = numpy.argsort(owners, kind="stable")
+            splits = numpy.cumsum(numpy.bincount(owners, minlength=n_ranks))[:-1]
+            return [numpy.split(arr[order], splits) for arr in (gid_array,) + arrays]
+
+        gidvec = numpy.asarray(gidvec, dtype="uint32")
+        gid_parts, time_parts = split_by_owner(gidvec, numpy.asarray(tvec))
+        received = MPI.py_alltoall(list(zip(gid_parts, time_parts)))
+        owned_gids = numpy.concatenate([gids_ for gids_, _ in received])
+        owned_times = numpy.concatenate([times for _, times in received])
+
+        gids = numpy.unique(numpy.asarray(gids, dtype="uint32"))
+        requests = MPI.py_alltoall(split_by_owner(gids)[0])
+        replies = []
+        for requested_gids in requests:
+            mask = numpy.isin(owned_gids, requested_gids)
+            replies.append((owned_gids[mask], owned_times[mask]))
+        received = MPI.py_alltoall(replies)
+        gidvec = numpy.concatenate([gids_ for gids_, _ in received])
+        tvec = numpy.concatenate([times for _, times in received])
+        log_verbose("Replay: Distributed loading kept %d local spikes", len(tvec))
+        return tvec, gidvec
+
     #
     def _store_events(self, tvec, gidvec):
         """Stores the events in the _gid_fire_events GroupedMultiMap.
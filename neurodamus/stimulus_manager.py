@@ -60,6 +60,7 @@ class StimulusManager:
         raise ConfigurationError("input_type extracellular_stimulation is not implemented")
 
     def reset_helpers(self):
+        BaseStim.waveform_cache.clear()
         ShotNoise.stimCount = 0
         Noise.stimCount = 0
         OrnsteinUhlenbeck.stimCount = 0
@@ -82,11 +83,27 @@ class BaseStim:
 
     IsNoise = False
 
+    waveform_cache = {}
+    """Deterministic signal sources, by factory and parameters. Target points with equal
+    waveforms share the source time and amplitude vectors, each with its own clamp
+    """
+
     def __init__(self, _target, stim_info: dict, _cell_manager):
         self.duration = float(stim_info["Duration"])  # duration [ms]
         self.delay = float(stim_info["Delay"])        # start time [ms]
         self.represents_physical_electrode = stim_info.get('RepresentsPhysicalElectrode', False)
 
+    @classmethod
+    def get_shared_source(cls, factory, *args, **kwargs):
+        """Gets the source created by factory(*args, **kwargs), reusing any equal one.
+        Only for deterministic waveforms, since the source is shared
+        """
+        key = (factory, args, tuple(sorted(kwargs.items())))
+        source = cls.waveform_cache.get(key)
+        if source is None:
+            source = cls.waveform_cache[key] = factory(*args, **kwargs)
+        return source
+
 
 @StimulusManager.register_type
 class OrnsteinUhlenbeck(BaseStim):
@@ -476,8 +493,8 @@ class Linear(BaseStim):
                     continue
 
                 # generate ramp current source
-                cs = CurrentSource.ramp(
-                    self.amp_start, self.amp_end, self.duration,
+                cs = self.get_shared_source(
+                    CurrentSource.ramp, self.amp_start, self.amp_end, self.duration,
                     delay=self.delay,
                     physical_electrode=self.represents_physical_electrode
                 )
@@ -683,8 +700,8 @@ class Pulse(BaseStim):
                     continue
 
                 # generate pulse train current source
-                cs = CurrentSource.train(
-                    self.amp, self.freq, self.width, self.duration,
+                cs = self.get_shared_source(
+                    CurrentSource.train, self.amp, self.freq, self.width, self.duration,
                     delay=self.delay,
                     physical_electrode=self.represents_physical_electrode
                 )
@@ -722,8 +739,9 @@ class Sinusoidal(BaseStim):
                     continue
 
                 # generate sinusoidal current source
-                cs = CurrentSource.sin(
-                    self.amp, self.duration, self.freq, step=self.dt, delay=self.delay,
+                cs = self.get_shared_source(
+                    CurrentSource.sin, self.amp, self.duration, self.freq, step=self.dt,
+                    delay=self.delay,
                     physical_electrode=self.represents_physical_electrode
                 )
                 # attach current source to section
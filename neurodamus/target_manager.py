@@ -309,6 +309,24 @@ class TargetManager:
             result_point.append(tmp_section, distance)
         return result_point
 
+    def locations_to_points(self, gid, isec, ipt, offset):
+        """Vectorized version of location_to_point, for arrays of synapse locations.
+
+        Returns: A tuple (sections, x) with the list of SectionRefs (None for sections
+            not in this rank, e.g. in LoadBalance mode) and the array of positions,
+            -1 where the section is not available
+        """
+        cell_sections = self.gid_to_sections(gid)
+        if not cell_sections:
+            raise Exception("Getting locations for non-bg sims is not implemented yet...")
+        isec = numpy.asarray(isec).astype("int64")
+        if len(isec) and (max_isec := isec.max()) >= cell_sections.num_sections:
+            raise Exception(f"Error: section {max_isec} out of bounds "
+                            f"({cell_sections.num_sections} total). "
+                            "Morphology section count is low, is this a good morphology?")
+        sections = [cell_sections.isec2sec[i] for i in isec.tolist()]
+        return sections, cell_sections.compute_locations(isec, ipt, offset)
+
 
 class NodeSetReader:
     """
@@ -619,6 +637,65 @@ class SerializedSections:
                 self.isec2sec[int(v_value)] = Nd.SectionRef(sec=sec)
             index += 1
 
+        self._unavailable = numpy.fromiter((sec is None for sec in self.isec2sec), bool,
+                                           self.num_sections)
+        # Geometry table to compute locations in bulk. Built on first use
+        self._orientation = None
+        self._length = None
+        self._n3d = None
+        self._arc_offsets = None
+        self._arc3d = None
+
+    def _init_geometry(self):
+        """Caches, for every section, the orientation, length and cumulative arc lengths"""
+        self._orientation = numpy.zeros(self.num_sections, dtype="int8")
+        self._length = numpy.ones(self.num_sections)
+        self._n3d = numpy.zeros(self.num_sections, dtype="int64")
+        arcs = []
+        for i, sec_ref in enumerate(self.isec2sec):
+            if sec_ref is None:
+                continue
+            section = sec_ref.sec
+            self._orientation[i] = section.orientation()
+            self._length[i] = section.L
+            self._n3d[i] = n3d = int(section.n3d())
+            arcs.append(numpy.fromiter((section.arc3d(k) for k in range(n3d)), "f8", n3d))
+        self._arc_offsets = numpy.concatenate(([0], numpy.cumsum(self._n3d)))
+        self._arc3d = numpy.concatenate(arcs) if arcs else numpy.empty(0)
+
+    def compute_locations(self, isec, ipt, offset):
+        """Computes the position (x) in the sections of several (isec, ipt, offset) locations.
+
+        Equivalent to TargetManager.location_to_point, where ipt=-1 stands for offset being
+        already the section fraction (SONATA).
+        """
+        isec = numpy.asarray(isec).astype("int64")
+        ipt = numpy.asarray(ipt, dtype="f8")
+        offset = numpy.maximum(numpy.asarray(offset, dtype="f8"), 0)  # soma: zero it
+        x = numpy.clip(offset, 0.0000001, 0.9999999)  # Sonata pre-calculated distance
+
+        use_segments = ipt != -1
+        if use_segments.any():
+            if self._arc3d is None:
+                self._init_geometry()
+            seg_isec = isec[use_segments]
+            reverse = self._orientation[seg_isec] == 1
+            n3d = self._n3d[seg_isec]
+            seg_ipt = numpy.where(reverse, n3d - 1 - ipt[use_segments], ipt[use_segments])
+            seg_offset = numpy.where(reverse, -offset[use_segments], offset[use_segments])
+            has_point = seg_ipt < n3d
+            arc_i = self._arc_offsets[seg_isec] + numpy.trunc(seg_ipt).astype("int64")
+            arc = self._arc3d[arc_i[has_point]]
+            distance = numpy.full(len(seg_isec), 0.5)
+            distance[has_point] = numpy.clip(
+                (arc + seg_offset[has_point]) / self._length[seg_isec[has_point]],
+                0.0000001, 0.9999999)
+            x[use_segments] = numpy.where(reverse, 1 - distance, distance)
+
+        # Sections not available in this rank (e.g. LoadBalance mode)
+        x[self._unavailable[isec]] = -1
+        return x
+
 
 class TPointList:
     def __init__(self, gid):
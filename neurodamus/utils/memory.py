@@ -9,7 +9,6 @@ import os
 import json
 import psutil
 import multiprocessing
-import heapq
 import pickle
 import gzip
 from collections import Counter
@@ -173,13 +172,15 @@ def pretty_printing_memory_mb(memory_mb):
 
 
 @run_only_rank0
-def print_allocation_stats(rank_memory):
+def print_allocation_stats(rank_memory, n_buckets=None):
     """
     Print statistics of the memory allocation across ranks.
 
     Args:
         rank_memory (dict): A dictionary where keys are rank IDs
                             and values are the total memory load on each rank.
+        n_buckets (int): The total number of buckets (rank, cycle), including the empty ones
+                         which are not in rank_memory. Used for the imbalance ratio.
     """
     logging.debug("Total memory per rank/cycle: {}".format(rank_memory))
     import statistics
@@ -192,18 +193,126 @@ def print_allocation_stats(rank_memory):
         except statistics.StatisticsError:
             stdev = 0
         logging.info("Stdev of allocation per rank [KB]: {}".format(stdev))
+        values += [0] * ((n_buckets or len(values)) - len(values))
+        logging.info("Imbalance of allocation (max/mean): {:.3f}".format(_imbalance_ratio(values)))
+
+
+def _imbalance_ratio(loads):
+    """The ratio between the maximum and average load. 1 means perfect balance"""
+    mean = np.mean(loads) if len(loads) else 0
+    return np.max(loads) / mean if mean > 0 else 1.0
+
+
+def _lpt_assign(costs, n_buckets):
+    """
+    Assigns items to buckets with the Longest-Processing-Time-first heuristic.
+
+    Items are taken by decreasing cost, in rounds of n_buckets. In each round, the most costly
+    items go to the least loaded buckets, so that every round is a vectorized operation.
+
+    Returns:
+        The bucket index of each item
+    """
+    costs = np.asarray(costs, dtype=float)
+    order = np.argsort(-costs, kind="stable")
+    loads = np.zeros(n_buckets)
+    assignment = np.empty(len(costs), dtype=int)
+    for start in range(0, len(costs), n_buckets):
+        items = order[start:start + n_buckets]
+        buckets = np.argsort(loads, kind="stable")[:len(items)]
+        assignment[items] = buckets
+        loads[buckets] += costs[items]
+    return assignment
+
+
+def allocation_stats_filename(basename, ranks, cycles=1):
+    """
+    The name of the allocation file for a given number of ranks and cycles.
+    """
+    return f"{basename}_r{ranks}_c{cycles}.npy"
 
 
 @run_only_rank0
 def export_allocation_stats(rank_allocation, filename, ranks, cycles=1):
     """
-    Export allocation dictionary to a serialized pickle file.
+    Export allocation dictionary to a binary file.
+
+    The file contains two .npy arrays: an index with the (population, rank, cycle) of each
+    bucket and its range in the gids array, followed by the gids array itself. Ranks can
+    therefore load their own gids only. See `import_allocation_stats`.
+
+    Unlike the load-balance complexities (see `MPI.write_ordered`), this file is written by
+    rank 0 alone: the allocation is computed there, by `DryRunStats.distribute_cells`, so the
+    other ranks hold no part of it to write.
     """
+    index = []
+    gids = []
+    offset = 0
+    for population, buckets in rank_allocation.items():
+        for (rank, cycle), bucket_gids in sorted(buckets.items()):
+            index.append((population, rank, cycle, offset, offset + len(bucket_gids)))
+            gids.append(np.asarray(bucket_gids, dtype="u4"))
+            offset += len(bucket_gids)
+    pop_len = max((len(pop) for pop in rank_allocation), default=1)
+    index_dtype = [("population", "U%d" % max(pop_len, 1)), ("rank", "i4"), ("cycle", "i4"),
+                   ("start", "i8"), ("end", "i8")]
+
+    with open(allocation_stats_filename(filename, ranks, cycles), "wb") as f:
+        np.save(f, np.array(index, dtype=index_dtype))
+        np.save(f, np.concatenate(gids) if gids else np.empty(0, dtype="u4"))
+
+
+def import_allocation_stats(filename, cycle_i=0, rank=None) -> dict:
+    """
+    Import allocation dictionary from an allocation file.
+
+    Only the index and the gids of the requested rank (or all ranks if None) are read,
+    with the gids memory-mapped. Legacy (.pkl.gz) allocation files are read fully.
+
+    Returns:
+        A dictionary {population: {rank: gids}} for the given cycle
+    """
+    if str(filename).endswith(".pkl.gz"):
+        return _import_allocation_stats_legacy(filename, cycle_i, rank)
+
+    with open(filename, "rb") as f:
+        index = np.load(f)  # leaves the file at the start of the gids array
+        gids_dtype, gids_offset = _read_npy_header(f)
+
+    gids = np.memmap(filename, dtype=gids_dtype, mode="r", offset=gids_offset) \
+        if index["end"].max(initial=0) > 0 else np.empty(0, dtype=gids_dtype)
+    selection = index["cycle"] == cycle_i
+    if rank is not None:
+        selection &= index["rank"] == rank
 
-    compressed_data = gzip.compress(pickle.dumps(rank_allocation))
-    new_filename = f"{filename}_r{ranks}_c{cycles}.pkl.gz"
-    with open(new_filename, 'wb') as f:
-        f.write(compressed_data)
+    result = defaultdict(dict)
+    for population, rank_i, _, start, end in index[selection].tolist():
+        result[population][rank_i] = gids[start:end]
+    return dict(result)
+
+
+def _read_npy_header(f):
+    """Reads the header of a .npy array from an open file. Returns (dtype, data_offset)"""
+    version = np.lib.format.read_magic(f)
+    read_header = (np.lib.format.read_array_header_1_0 if version == (1, 0)
+                   else np.lib.format.read_array_header_2_0)
+    _, _, dtype = read_header(f)
+    return dtype, f.tell()
+
+
+def _import_allocation_stats_legacy(filename, cycle_i=0, rank=None) -> dict:
+    """
+    Import allocation dictionary from serialized pickle file.
+    """
+    with open(filename, 'rb') as f:
+        compressed_data = f.read()
+
+    obj = pickle.loads(gzip.decompress(compressed_data))
+    return {
+        population: {key[0]: np.array(vector) for key, vector in vectors.items()
+                     if key[1] == cycle_i and (rank is None or key[0] == rank)}
+        for population, vectors in obj.items()
+    }
 
 
 @run_only_rank0
@@ -228,25 +337,6 @@ def import_metype_memory_usage(memory_per_metype_file):
     return memory_per_metype
 
 
-@run_only_rank0
-def import_allocation_stats(filename, cycle_i=0) -> dict:
-    """
-    Import allocation dictionary from serialized pickle file.
-    """
-    def convert_to_standard_types(obj):
-        """Converts an object containing defaultdicts of Vectors to standard Python types."""
-        result = {}
-        for population, vectors in obj.items():
-            result[population] = {key[0]: np.array(vector) for key,
-                                  vector in vectors.items() if key[1] == cycle_i}
-        return result
-
-    with open(filename, 'rb') as f:
-        compressed_data = f.read()
-
-    return convert_to_standard_types(pickle.loads(gzip.decompress(compressed_data)))
-
-
 @run_only_rank0
 def allocation_stats_exists(filename):
     """
@@ -465,19 +555,27 @@ class DryRunStats:
         num_ranks,
         cycles=None,
         metype_file=None,
-        batch_size=10
+        batch_size=10,
+        secondary_weights=None,
+        secondary_factor=1.0
     ) -> Tuple[dict, dict, dict]:
         """
         Distributes cells across ranks and cycles based on their memory load.
 
-        This function uses a greedy algorithm to distribute cells across ranks and cycles such that
-        the total memory load is balanced. Cells with higher memory load are distributed first.
+        Cells are grouped in batches which are distributed across buckets (rank, cycle) with a
+        Longest-Processing-Time-first strategy: batches are sorted by decreasing load and each
+        one goes to the currently least loaded bucket. For scalability the assignment is done in
+        rounds of as many batches as buckets, each round being vectorized.
 
         Args:
             num_ranks (int): The number of ranks.
             cycles (int): The number of cycles to distribute cells over.
             batch_size (int): The number of cells to assign to each bucket at a time.
             metype_file (str): The path to a JSON file containing memory usage for each METype.
+            secondary_weights (dict): Optional secondary objective, as a cost per cell of each
+                METype (e.g. `metype_cell_syn_average` for synapse counts).
+            secondary_factor (float): The relative importance of the secondary objective.
+                Both objectives are normalized by their totals.
 
         Returns:
             bucket_allocation (dict): A dictionary where keys are tuples (pop, rank_id, cycle_id)
@@ -506,44 +604,55 @@ class DryRunStats:
                 metype_memory_usage[metype] = metype_mem + syns_mem
             export_metype_memory_usage(metype_memory_usage, self._MEMORY_USAGE_PER_METYPE_FILENAME)
 
-        def assign_cells_to_bucket(rank_allocation, rank_memory, batch, batch_memory):
-            total_memory, (rank_id, cycle_id) = heapq.heappop(buckets)
-            logging.debug("Assigning batch to bucket (%d, %d)", rank_id, cycle_id)
-            rank_allocation[(rank_id, cycle_id)].extend(batch)
-            total_memory += batch_memory
-            rank_memory[(rank_id, cycle_id)] = total_memory
-            heapq.heappush(buckets, (total_memory, (rank_id, cycle_id)))
+        n_buckets = num_ranks * cycles
+        bucket_keys = [(i, j) for i in range(num_ranks) for j in range(cycles)]
 
         # Loop over ALL the gids which would be instantiated, per metype
         for pop, metype_gids in self.pop_metype_gids.items():
             logging.info("Distributing cells of population %s", pop)
+            metypes = list(metype_gids.keys())
+            counts = [len(gids) for gids in metype_gids.values()]
+            gids = np.concatenate([np.asarray(gids_, dtype="u4")
+                                   for gids_ in metype_gids.values()] or [[]]).astype("u4")
+            cell_memory = np.repeat([metype_memory_usage[m] for m in metypes], counts)
+
+            # Batches of consecutive cells and their loads
+            batch_starts = np.arange(0, len(gids), batch_size)
+            batch_memory = np.add.reduceat(cell_memory, batch_starts) if len(gids) else []
+            batch_cost = batch_memory
+            if secondary_weights is not None:
+                cell_secondary = np.repeat([secondary_weights.get(m, 0) for m in metypes], counts)
+                batch_secondary = (np.add.reduceat(cell_secondary, batch_starts)
+                                   if len(gids) else [])
+                batch_cost = (batch_memory / max(np.sum(batch_memory), 1e-12)
+                              + secondary_factor * batch_secondary
+                              / max(np.sum(batch_secondary), 1e-12))
+
+            batch_bucket = _lpt_assign(batch_cost, n_buckets)
+            cell_bucket = np.repeat(batch_bucket, np.diff(np.append(batch_starts, len(gids))))
+            cell_order = np.argsort(cell_bucket, kind="stable")
+            bucket_counts = np.bincount(cell_bucket, minlength=n_buckets)
+            bucket_total_memory = np.bincount(batch_bucket, batch_memory, minlength=n_buckets)
+
             rank_allocation = defaultdict(Vector)
             rank_memory = {}
-            batch = []
-            batch_memory = 0
-
-            # (total_memory, (rank_id, cycle_id))
-            buckets = [(0, (i, j)) for i in range(num_ranks) for j in range(cycles)]
-            heapq.heapify(buckets)
-
-            for metype, gids in metype_gids.items():
-                total_mem_per_cell = metype_memory_usage[metype]
-
-                for cell_id in gids:
-                    batch.append(cell_id)
-                    batch_memory += total_mem_per_cell
-                    if len(batch) == batch_size:
-                        assign_cells_to_bucket(rank_allocation, rank_memory, batch, batch_memory)
-                        batch = []
-                        batch_memory = 0
-
-            if batch:
-                assign_cells_to_bucket(rank_allocation, rank_memory, batch, batch_memory)
+            for bucket_i, bucket_gids in enumerate(np.split(gids[cell_order],
+                                                            np.cumsum(bucket_counts)[:-1])):
+                if len(bucket_gids):
+                    key = bucket_keys[bucket_i]
+                    rank_allocation[key] = Vector("I", bucket_gids.tobytes())
+                    rank_memory[key] = float(bucket_total_memory[bucket_i])
 
             bucket_allocation[pop] = rank_allocation
             bucket_memory[pop] = rank_memory
 
-        print_allocation_stats(bucket_memory)
+            if secondary_weights is not None:
+                bucket_secondary = np.bincount(batch_bucket, batch_secondary,
+                                               minlength=n_buckets)
+                logging.info("Secondary objective imbalance (max/mean): %.3f",
+                             _imbalance_ratio(bucket_secondary))
+
+        print_allocation_stats(bucket_memory, n_buckets)
         export_allocation_stats(bucket_allocation,
                                 self._ALLOCATION_FILENAME,
                                 num_ranks,
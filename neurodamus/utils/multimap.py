@@ -141,6 +141,15 @@ class GroupedMultiMap(MultiMap):
     def flat_values(self):
         return reduce(self.concat, self._values)
 
+    def csr(self):
+        """Returns the map in compressed form: (keys, offsets, flat_values) so that the values
+        of keys[i] are flat_values[offsets[i]:offsets[i+1]]
+        """
+        offsets = np.zeros(len(self._keys) + 1, dtype="int64")
+        np.cumsum([len(v) for v in self._values], out=offsets[1:])
+        values = np.concatenate(self._values) if self._values else np.empty(0)
+        return self._keys, offsets, values
+
     def flatten(self):
         """Transform the current Map to a plain Multimap, without groups.
         """
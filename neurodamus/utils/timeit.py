@@ -126,7 +126,7 @@ def human_readable(num):
         num: The number
     """
     units = ['', 'K', 'M', 'B', 'T', 'P']
-    power = int(floor(log(num, 1000.)))
+    power = int(floor(log(num, 1000.))) if num > 0 else 0
     return '{:.2f}{:s}'.format(num / 1000. ** power, units[power]) if power >= 1 \
         else str(int(num))
 
@@ -174,6 +174,11 @@ class _TimerManager(object):
     _timers = dict()
     _timers_sequence = 0
     _archived_timers = {}
+    _counters = dict()
+
+    def count(self, name, n=1):
+        """Increments an event counter, reported (summed over ranks) along with the timers"""
+        self._counters[name] = self._counters.get(name, 0) + n
 
     # archive current timers
     def archive(self, archive_name):
@@ -215,6 +220,15 @@ class _TimerManager(object):
 
             self._log_stats(timers_name, timers, avg_times, min_times, max_times, nof_hits)
 
+        # Ranks may have different counters. Gather them all
+        all_counters = MPI.pc.py_allgather(self._counters) if MPI.size > 1 else [self._counters]
+        totals = {}
+        for counters in all_counters:
+            for name, count in counters.items():
+                totals[name] = totals.get(name, 0) + count
+        if totals:
+            self._log_counters(totals)
+
     @run_only_rank0
     def _log_stats(self, timers_name, timers, avg_times, min_times, max_times, nof_hits):
         stats_name = " TIMEIT STATS {}".format('(' + timers_name + ') ' if timers_name
@@ -235,6 +249,16 @@ class _TimerManager(object):
                 human_readable(nof_hits.x[t])))
         logging.info("+{:-^111s}+".format('-'))
 
+    @run_only_rank0
+    def _log_counters(self, totals):
+        logging.info("+{:=^111s}+".format(" COUNTERS "))
+        logging.info("|{:^80s}|{:^30s}|".format('Event Label', 'R0 / Total'))
+        logging.info("+{:-^111s}+".format('-'))
+        for name, total in totals.items():
+            logging.info("| {:<78s} | {:>12s} / {:<13s} |".format(
+                name, human_readable(self._counters.get(name, 0)), human_readable(total)))
+        logging.info("+{:-^111s}+".format('-'))
+
 
 TimerManager = _TimerManager()  # singleton
 
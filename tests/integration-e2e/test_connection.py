@@ -34,7 +34,7 @@ def sonata_config_file_err(sonata_config):
 
 @pytest.mark.slow
 # This test is to mimic the error reported in HPCTM-1687 during connection.add_syanpses()
-# when detecting conn._synapse_params with more than one element is not None
+# when detecting conn.synapse_params with more than one element is not None
 def test_add_synapses():
     n = Node(str(CONFIG_FILE_MINI))
     n.load_targets()
@@ -43,11 +43,11 @@ def test_add_synapses():
     syn_manager = n.circuits.get_edge_manager("default", "default")
     conn = list(syn_manager.get_connections(62798))[0]
     new_params = SynapseParameters.create_array(1)
-    n_syns = len(conn._synapse_params)
+    n_syns = len(conn.synapse_params)
     assert n_syns > 1
     new_params[0].sgid = conn.sgid
     conn.add_synapses(n._target_manager, new_params)
-    assert len(conn._synapse_params) == n_syns + 1
+    assert len(conn.synapse_params) == n_syns + 1
     for syn_manager in n._circuits.all_synapse_managers():
         syn_manager.finalize(0, False)
 
@@ -15,6 +15,35 @@ def convert_to_standard_types(obj):
     return result
 
 
+def check_lpt_allocation(dry_run_stats, allocation, metype_memory, num_ranks, cycles=1,
+                         batch_size=10):
+    """Checks the properties of a Longest-Processing-Time-first allocation of cell batches.
+
+    Memory is measured during the run, hence the exact allocation is not fixed. Instead:
+     - every cell is allocated once, to a valid (rank, cycle) bucket
+     - cells keep their order within buckets
+     - the heaviest batch goes to the first bucket
+     - the most loaded bucket exceeds the mean load by at most one batch (LPT bound)
+    """
+    for pop, metype_gids in dry_run_stats.pop_metype_gids.items():
+        cells = [(int(gid), metype_memory[metype])
+                 for metype, gids in metype_gids.items() for gid in gids]
+        buckets = {key: [int(gid) for gid in gids] for key, gids in allocation[pop].items()}
+        assert sorted(gid for gids in buckets.values() for gid in gids) == \
+            sorted(gid for gid, _ in cells)
+        assert all(0 <= rank < num_ranks and 0 <= cycle < cycles for rank, cycle in buckets)
+        position = {gid: i for i, (gid, _) in enumerate(cells)}
+        assert all(sorted(gids, key=position.get) == gids for gids in buckets.values())
+
+        batch_loads = [sum(mem for _, mem in cells[i:i + batch_size])
+                       for i in range(0, len(cells), batch_size)]
+        heaviest = batch_loads.index(max(batch_loads))
+        assert cells[heaviest * batch_size][0] in buckets[(0, 0)]
+        memory = dict(cells)
+        loads = [sum(memory[gid] for gid in gids) for gids in buckets.values()]
+        assert max(loads) <= sum(loads) / (num_ranks * cycles) + max(batch_loads) + 1e-9
+
+
 def test_dry_run_workflow(USECASE3):
     """
     Test that the dry run mode works
@@ -50,23 +79,24 @@ def test_dry_run_workflow(USECASE3):
                             USECASE3 / "allocation", 2, 1)
     export_metype_memory_usage(cell_memory_usage, USECASE3 / "memory_per_metype.json")
 
-    rank_allocation = import_allocation_stats(USECASE3 / "allocation_r2_c1.pkl.gz", 0)
-    rank_allocation_standard = convert_to_standard_types(rank_allocation)
-
-    expected_items = {
-        'NodeA': {0: [1], 1: [2, 3]},
-        'NodeB': {0: [1], 1: [2]}
+    check_lpt_allocation(nd._dry_run_stats, rank_allocation, cell_memory_usage, 2, 1, 1)
+    assert sorted(gid for gids in rank_allocation['NodeA'].values() for gid in gids) == [1, 2, 3]
+    assert sorted(gid for gids in rank_allocation['NodeB'].values() for gid in gids) == [1, 2]
+    # The allocation file holds the same allocation, per rank
+    rank_allocation_standard = convert_to_standard_types(
+        import_allocation_stats(USECASE3 / "allocation_r2_c1.npy", 0))
+    assert rank_allocation_standard == {
+        pop: {rank: list(gids) for (rank, _), gids in buckets.items()}
+        for pop, buckets in rank_allocation.items()
     }
 
-    assert rank_allocation_standard == expected_items
-
     # Test that the allocation works and can be saved and loaded
     # and generate allocation file for 1 rank
     rank_allocation, _, cell_memory_usage = nd._dry_run_stats.distribute_cells(1, 1, None, 1)
     export_allocation_stats(rank_allocation,
                             USECASE3 / "allocation", 1, 1)
     export_metype_memory_usage(cell_memory_usage, USECASE3 / "memory_per_metype.json")
-    rank_allocation = import_allocation_stats(USECASE3 / "allocation_r1_c1.pkl.gz")
+    rank_allocation = import_allocation_stats(USECASE3 / "allocation_r1_c1.npy")
     rank_allocation_standard = convert_to_standard_types(rank_allocation)
 
     expected_items = {
@@ -116,21 +146,21 @@ def test_dry_run_workflow_multi():
     export_allocation_stats(rank_allocation,
                             SIM_DIR / "allocation", 2, 1)
     export_metype_memory_usage(cell_memory_usage, SIM_DIR / "memory_per_metype.json")
-    rank_allocation = import_allocation_stats(SIM_DIR / "allocation_r2_c1.pkl.gz")
-    rank_allocation_standard = convert_to_standard_types(rank_allocation)
-
-    expected_items = {
-        'default': {
-            0: [
-                62798, 62946, 63257, 63699, 64164, 64862, 65916, 65952, 66069, 66106,
-                69840, 63623, 64234, 64666, 64788, 64936, 69878, 65821, 67078, 68856
-            ],
-            1: [
-                66141, 66497, 66872, 67667, 68224, 68354, 68533, 68581, 68942, 69531
-            ]
-        }
+    check_lpt_allocation(nd._dry_run_stats, rank_allocation, cell_memory_usage, 2)
+    rank_allocation_standard = convert_to_standard_types(
+        import_allocation_stats(SIM_DIR / "allocation_r2_c1.npy"))
+    assert rank_allocation_standard == {
+        pop: {rank: list(gids) for (rank, _), gids in buckets.items()}
+        for pop, buckets in rank_allocation.items()
     }
-    assert rank_allocation_standard == expected_items
+
+    all_gids = [
+        62798, 62946, 63257, 63699, 64164, 64862, 65916, 65952, 66069, 66106,
+        66141, 66497, 66872, 67667, 68224, 68354, 68533, 68581, 68942, 69531,
+        69840, 63623, 64234, 64666, 64788, 64936, 69878, 65821, 67078, 68856
+    ]
+    assert sorted(gid for gids in rank_allocation_standard['default'].values() for gid in gids) \
+        == sorted(all_gids)
 
 
 def test_dynamic_distribute():
@@ -141,7 +171,7 @@ def test_dynamic_distribute():
     redistribute the cells. Then checks if the new allocation is correct.
     """
 
-    Path(("allocation_r1_c2.pkl.gz")).unlink(missing_ok=True)
+    Path(("allocation_r1_c2.npy")).unlink(missing_ok=True)
 
     from neurodamus import Neurodamus
     config_file = str(SIM_DIR / "v5_sonata" / "simulation_config.json")
@@ -156,20 +186,7 @@ def test_dynamic_distribute():
                     lb_mode="Memory")
     nd.run()
 
-    rank_allocation, _, _ = nd._dry_run_stats.distribute_cells(1, 2)
-    rank_allocation_standard = convert_to_standard_types(rank_allocation)
-
-    expected_items = {
-        'default': {
-            (0, 0): [
-                62798, 62946, 63257, 63699, 64164, 64862, 65916, 65952, 66069, 66106
-            ],
-            (0, 1): [
-                66141, 66497, 66872, 67667, 68224, 68354, 68533, 68581, 68942, 69531,
-                69840, 63623, 64234, 64666, 64788, 64936, 69878, 65821, 67078, 68856
-            ]
-        }
-    }
-
-    for key, sub_value in rank_allocation_standard['default'].items():
-        assert set(sub_value) == set(expected_items['default'][key])
+    rank_allocation, _, cell_memory_usage = nd._dry_run_stats.distribute_cells(1, 2)
+    check_lpt_allocation(nd._dry_run_stats, rank_allocation, cell_memory_usage, 1, 2)
+    assert set(rank_allocation['default']) == {(0, 0), (0, 1)}  # 1 rank, 2 cycles
+    assert sum(map(len, rank_allocation['default'].values())) == 30
@@ -14,7 +14,7 @@ from neurodamus.cell_distributor import CellManagerBase
 from neurodamus.connection import ConnectionBase
 from neurodamus.connection_manager import ConnectionManagerBase
 from neurodamus.core import EngineBase
-from neurodamus.io.synapse_reader import SynapseParameters
+from neurodamus.io.synapse_reader import SynapseParameters, SynapseReader
 from neurodamus.io.cell_readers import split_round_robin
 from neurodamus.metype import BaseCell
 
@@ -101,7 +101,10 @@ class ASynParameters(SynapseParameters):
     _synapse_fields = ["sgid", "delay", "conductance"]
 
 
-class ACellSynReader(object):
+class ACellSynReader(SynapseReader):
+    def __init__(self):
+        pass  # No file, parameters are generated
+
     def get_synapse_parameters(self, tgid, _mod=None):
         # for testing, each cell connects to src gids tgid+1 and tgid+2
         params = ASynParameters.create_array(2)
@@ -131,6 +131,28 @@ def test_number_electrodes(test_file):
     assert result == expected_result, f'Expected {expected_result}, but got {result}'
 
 
+def test_local_lfp_factors(test_file):
+    """
+    Test that the factors of the local cells, read in bulk, match the ones read per node
+    """
+    from neurodamus.cell_distributor import LFPManager
+    lfp = LFPManager()
+    lfp._lfp_file = test_file
+    expected = {node_id: lfp.get_node_id_subsets(node_id, "default")[:]
+                for node_id in (42, 63698)}
+
+    lfp.load_local_factors("default", [63698, 42, 12345])
+    node_ids, _, _, factors = lfp._local_factors["default"]
+    np.testing.assert_array_equal(node_ids, [42, 63698])
+    assert len(factors) == 2 + 140
+    for node_id, node_factors in expected.items():
+        np.testing.assert_array_equal(lfp.get_node_id_subsets(node_id, "default"), node_factors)
+    # Non-local nodes are still read from the file
+    assert lfp.get_node_id_subsets(62797, "default").shape == (82, 2)
+    with pytest.raises(IndexError):
+        lfp.get_node_id_subsets(12345, "default")
+
+
 def _create_tmpconfig_lfp(config_file, lfp_file):
     import fileinput
     import shutil
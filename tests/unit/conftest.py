@@ -9,6 +9,12 @@ class MockParallelExec:
     def allreduce(self, number, _op):
         return number
 
+    def py_gather(self, obj, _root):
+        return [obj]
+
+    def py_alltoall(self, objs):
+        return objs
+
 
 @pytest.fixture(autouse=True, scope="module")
 def _mock_neuron():
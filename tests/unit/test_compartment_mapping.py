@@ -0,0 +1,47 @@
+import numpy
+import numpy.testing as npt
+from unittest import mock
+
+
+class FakeSection:
+    def __init__(self, name, node_indices):
+        self.name = name
+        self.nseg = len(node_indices)
+        self.segments = [mock.Mock(**{"node_index.return_value": i}) for i in node_indices]
+
+    def __str__(self):
+        return self.name
+
+    def __iter__(self):
+        return iter(self.segments)
+
+
+def test_register_mapping():
+    from neurodamus.core.coreneuron_configuration import CompartmentMapping
+
+    cell = mock.Mock(gid=1, nSecSoma=1, nSecAxonalOrig=2, nSecBasal=0, nSecApical=0,
+                     somatic=[FakeSection("Cell[0].soma[0]", [0])],
+                     axonal=[FakeSection("Cell[0].axon[0]", [1, 2]),
+                             FakeSection("Cell[0].axon[1]", [3])],
+                     basal=[], apical=[], AIS=None, nodal=None, myelinated=None)
+    lfp_factors = numpy.arange(8.).reshape(4, 2)  # 4 segments x 2 electrodes
+    cell_manager = mock.Mock(**{
+        "getGidListForProcessor.return_value": [1],
+        "getCell.return_value": cell,
+        "getPopulationInfo.return_value": ("default", 0),
+        "_lfp_manager.get_lfp_factors.return_value": lfp_factors,
+    })
+
+    with mock.patch("neurodamus.core.coreneuron_configuration.Nd"):
+        mapping = CompartmentMapping(cell_manager)
+    mapping.register_mapping()
+
+    calls = {c.args[1]: c.args for c in mapping.pc.nrnbbcore_register_mapping.call_args_list}
+    assert len(calls) == 7
+    _, _, secvec, segvec, lfp, n_electrodes = calls["axon"]
+    npt.assert_array_equal(secvec, [1, 1, 2])
+    npt.assert_array_equal(segvec, [1, 2, 3])
+    npt.assert_array_equal(lfp, [2, 3, 4, 5, 6, 7])
+    assert n_electrodes == 2
+    npt.assert_array_equal(calls["soma"][4], [0, 1])
+    assert len(calls["dend"][2]) == 0 and len(calls["dend"][4]) == 0
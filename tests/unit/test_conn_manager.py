@@ -121,6 +121,52 @@ def test_population_delete_group(test_input, expected):
     assert expected == result
 
 
+def test_population_large_unordered():
+    # Exercise merging the pending inserts into the sorted index, with interleaved queries
+    import numpy
+    merges = []  # (merged keys, pending keys) of every merge
+    merge_pending = ConnectionSet._merge_pending
+
+    def merge_spy(self):
+        merges.append((len(self._keys), len(self._pending)))
+        merge_pending(self)
+
+    with mock.patch.object(ConnectionSet, "_MIN_MERGE_SIZE", 8), \
+            mock.patch.object(ConnectionSet, "_merge_pending", merge_spy):
+        pop = ConnectionSet(0, 0, conn_factory=lambda sgid, tgid, *_: _FakeConn(sgid, tgid))
+        rng = numpy.random.default_rng(0)
+        pairs = {(int(s), int(t)) for s, t in rng.integers(0, 50, (300, 2))}
+        for i, (sgid, tgid) in enumerate(pairs):
+            pop.get_or_create_connection(sgid, tgid)
+            if i == len(pairs) // 2:
+                assert pop.get_connection(sgid, tgid) is not None
+        # Inserts were merged into an already populated index
+        assert any(n_keys and n_pending for n_keys, n_pending in merges)
+        assert pop.count() == len(pairs)
+        # Like a dict, targets keep their insertion order. Their connections are sorted by sgid
+        tgids = list(dict.fromkeys(t for _, t in pairs))
+        assert pop.target_gids() == tgids
+        assert [(c.sgid, c.tgid) for c in pop.all_connections()] == \
+            sorted(pairs, key=lambda p: (tgids.index(p[1]), p[0]))
+
+        post, pre = tgids[:5], list(range(0, 50, 3))
+        expected = sorted(p for p in pairs if p[1] in post and p[0] in pre)
+        assert sorted((c.sgid, c.tgid) for c in pop.get_connections(post, pre)) == expected
+
+        sgid, tgid = next(iter(pairs))
+        pop.delete(sgid, tgid)
+        assert pop.get_connection(sgid, tgid) is None
+        assert pop.count() == len(pairs) - 1
+        conn = pop.get_or_create_connection(sgid, tgid)
+        assert pop.get_connection(sgid, tgid) is conn
+
+        pop.delete_group(post, pre)
+        assert pop.count() == len(pairs) - len(expected)
+        assert not list(pop.get_connections(post, pre))
+        remaining = sorted(pairs.difference(expected))
+        assert sorted((c.sgid, c.tgid) for c in pop.all_connections()) == remaining
+
+
 def test_population_ids_match():
     pop = _create_population([])
     assert pop.ids_match(0)
@@ -137,3 +183,181 @@ def test_population_ids_match():
     assert not pop.ids_match(1, 1)
     assert not pop.ids_match(1, None)
     assert not pop.ids_match(None, 1)
+
+
+def test_replay_assignment():
+    import numpy
+    import numpy.testing as npt
+    from neurodamus.connection_manager import SynapseRuleManager
+    from neurodamus.replay import SpikeManager
+
+    spike_manager = SpikeManager.__new__(SpikeManager)
+    spike_manager._gid_fire_events = None
+    spike_manager._store_events(numpy.array([5., 1., 2., 4., 3.]),
+                                numpy.array([2, 1, 3, 2, 1], "uint32"))
+    conns = [mock.Mock(sgid=sgid) for sgid in (1003, 1001, 1004, 1002, 1001)]
+    manager = SynapseRuleManager.__new__(SynapseRuleManager)
+    manager.get_target_connections = lambda *_: iter(conns)
+
+    with mock.patch.object(SynapseRuleManager, "src_pop_offset", 1000), \
+            mock.patch("neurodamus.connection_manager.Nd", t=.0):
+        assert manager.replay(spike_manager, "src", "dst", start_delay=2.5) == 3
+
+    assert not conns[0].replay.called  # only spike before start_delay
+    assert not conns[2].replay.called  # no spikes
+    npt.assert_array_equal(conns[1].replay.call_args[0][0], [3.])
+    npt.assert_array_equal(conns[3].replay.call_args[0][0], [5., 4.])
+    assert conns[4].replay.call_args[0][1] == 2.5
+
+
+def test_connection_synapse_store():
+    import numpy
+    import numpy.testing as npt
+    from neurodamus.connection import Connection, SynapseStore
+    from neurodamus.io.synapse_reader import SynapseParameters
+
+    class Section:
+        sec = None
+
+        def exists(self):
+            return True
+
+    target_manager = mock.Mock()
+    target_manager.locations_to_points.side_effect = lambda gid, isec, ipt, offset: (
+        [Section() for _ in isec], offset * 2)
+
+    syn_params = SynapseParameters.create_array(6)
+    syn_params.offset = numpy.arange(6) / 10
+    syn_params.weight = numpy.arange(6)
+    store = SynapseStore()
+    with mock.patch.object(Connection, "_init_hmod"):
+        conn1 = Connection(1, 10)
+        conn2 = Connection(2, 10)
+    conn1.add_synapses(target_manager, syn_params[:2], 100, store)
+    conn2.add_synapses(target_manager, syn_params[2:5], 200, store)
+    conn1.add_synapses(target_manager, syn_params[5:], 102, store)  # conn1 range is moved
+
+    assert len(store) == 8
+    npt.assert_array_equal(conn1.synapse_params.weight, [0, 1, 5])
+    npt.assert_array_equal(conn2.synapse_params.weight, [2, 3, 4])
+    npt.assert_allclose(conn2.synapse_params.location, [.4, .6, .8])
+    npt.assert_array_equal(conn1._synapse_ids, [100, 101, 102])
+    assert [i for i, _ in conn2.sections_with_synapses] == [0, 1, 2]
+
+    # The range left by conn1 is reused
+    with mock.patch.object(Connection, "_init_hmod"):
+        conn3 = Connection(3, 10)
+    conn3.add_synapses(target_manager, syn_params[:2], 300, store)
+    assert conn3._syn_start == 0 and len(store) == 8
+    npt.assert_array_equal(conn1.synapse_params.weight, [0, 1, 5])
+    npt.assert_array_equal(conn3.synapse_params.weight, [0, 1])
+
+
+def test_connection_synapse_store_mixed_dtypes():
+    # ModOverride blocks read extra fields, others don't, within the same population
+    import numpy.testing as npt
+    from neurodamus.connection import Connection, SynapseStore
+    from neurodamus.io.synapse_reader import SynapseParameters
+
+    class OverrideParameters(SynapseParameters):
+        _synapse_fields = SynapseParameters._synapse_fields + ("extra_attr",)
+
+    class Section:
+        sec = None
+
+        def exists(self):
+            return True
+
+    target_manager = mock.Mock()
+    target_manager.locations_to_points.side_effect = lambda gid, isec, ipt, offset: (
+        [Section() for _ in isec], offset)
+
+    plain_params = SynapseParameters.create_array(2)
+    plain_params.weight = [1, 2]
+    override_params = OverrideParameters.create_array(3)
+    override_params.weight = [3, 4, 5]
+    override_params.extra_attr = [6, 7, 8]
+    store = SynapseStore()
+    with mock.patch.object(Connection, "_init_hmod"):
+        conns = [Connection(sgid, 10) for sgid in range(4)]
+    conns[0].add_synapses(target_manager, plain_params, 0, store)
+    conns[1].add_synapses(target_manager, override_params, 10, store)
+    conns[2].add_synapses(target_manager, plain_params[:1], 20, store)
+    conns[3].add_synapses(target_manager, override_params[1:], 30, store)
+    conns[0].add_synapses(target_manager, plain_params[1:], 2, store)  # Moved, same dtype
+
+    assert len(store) == 2 + 1 + 3 + 3 + 2
+    npt.assert_array_equal(conns[0].synapse_params.weight, [1, 2, 2])
+    npt.assert_array_equal(conns[1].synapse_params.extra_attr, [6, 7, 8])
+    npt.assert_array_equal(conns[2].synapse_params.weight, [1])
+    npt.assert_array_equal(conns[3].synapse_params.extra_attr, [7, 8])
+    npt.assert_array_equal(conns[3]._synapse_ids, [30, 31])
+    assert conns[0].synapse_params.dtype == plain_params.dtype
+
+
+def test_configure_connection_blocks():
+    import numpy
+    from neurodamus.connection_manager import SynapseRuleManager
+
+    class Conn(_FakeConn):
+        weight_factor = 1
+        delays = ()
+
+        def add_synapse_configuration(self, configuration):
+            self.configurations = getattr(self, "configurations", []) + [configuration]
+
+        def add_delayed_weight(self, delay, weight):
+            self.delays = self.delays + ((delay, weight),)
+
+    pop = ConnectionSet(0, 0)
+    for sgid, tgid in [(1, 10), (2, 10), (1, 11), (3, 11), (2, 12)]:
+        pop.store_connection(Conn(sgid, tgid))
+    targets = {"A": [1, 2], "B": [10, 11, 12], "C": [11], "Void": None}
+    target_manager = mock.Mock()
+    target_manager.get_target.side_effect = lambda spec: mock.Mock(**{
+        "is_void.return_value": targets[spec.name] is None,
+        "get_gids.return_value": numpy.array(targets[spec.name] or [])})
+
+    manager = SynapseRuleManager.__new__(SynapseRuleManager)
+    manager._populations = {(0, 0): pop}
+    manager._target_manager = target_manager
+    blocks = [
+        {"Source": "A", "Destination": "B", "Weight": 2.0, "SynapseConfigure": "%s.x = 1"},
+        {"Source": "Void", "Destination": "B", "Weight": 0.},
+        {"Source": "A", "Destination": "C", "Weight": 3.0, "SynapseConfigure": "%s.y = 1"},
+        {"Source": "A", "Destination": "C", "Delay": 5., "Weight": 0.5},
+    ]
+    manager.configure_connection_blocks(blocks)
+
+    conn = pop.get_connection(1, 11)
+    assert conn.weight_factor == 3.0
+    assert conn.configurations == ["%s.x = 1", "%s.y = 1"]
+    assert conn.delays == ((5., .5),)
+    assert pop.get_connection(2, 12).weight_factor == 2.0
+    assert pop.get_connection(3, 11).weight_factor == 1
+
+    # get_target_connections uses the same selection
+    assert [(c.sgid, c.tgid) for c in manager.get_target_connections("A", "C")] == [(1, 11)]
+    manager.get_population_offsets = lambda: (0, 0)
+    assert [(c.sgid, c.tgid) for c in manager.get_target_connections("A", "B", [12, 10])] == \
+        [(1, 10), (2, 10), (2, 12)]
+
+
+def test_positions_between():
+    import numpy
+    pop = ConnectionSet(0, 0)
+    pairs = [(5, 30), (1, 10), (3, 30), (2, 20), (1, 20), (4, 10)]  # tgids out of order
+    for sgid, tgid in pairs:
+        pop.store_connection(_FakeConn(sgid, tgid))
+    all_pairs = [(c.sgid, c.tgid) for c in pop.all_connections()]
+
+    def selected(post_gids, pre_gids=None):
+        pre_gids = None if pre_gids is None else numpy.array(pre_gids)
+        positions = pop.positions_between(numpy.array(post_gids), pre_gids)
+        assert list(positions) == sorted(positions)
+        return [all_pairs[i] for i in positions]
+
+    assert selected([10, 30]) == [(3, 30), (5, 30), (1, 10), (4, 10)]
+    assert selected([10, 20, 30], [1, 3]) == [(3, 30), (1, 10), (1, 20)]
+    assert selected([15, 40]) == []
+    assert selected([10, 20], []) == []
@@ -27,3 +27,78 @@ def test_coord_mapping2():
     y = ty.local_to_global_coord_mapping(numpy.array([[6.98622, 12.17931, 17.53813]]))[0]
     npt.assert_allclose(x, [1., 0.5, 0.25])
     npt.assert_allclose(y, [20.62011524, 1.62385762, -10.63654619])
+
+
+def test_metype_manager_columnar():
+    from neurodamus.core.nodeset import NodeSet
+    meinfos = metype.METypeManager()
+    meinfos.load_infoNP(numpy.array([5, 2]), ["m1", "m2"], ["em1", "em1"], ["L1_A", "L2_B"], None,
+                        threshold_currents=[.1, .2], positions=[[1, 2, 3], [4, 5, 6]],
+                        rotations=[[0, 0, 0, 1], [0, 0, 0, 1]])
+    meinfos.load_infoNP([7], metype.Categorical(numpy.array(["m0", "m1"], dtype=object), [1]),
+                        ["em2"], ["L1_A"], ["cADpyr"])
+    assert len(meinfos) == 3 and list(meinfos) == [5, 2, 7]
+    assert 2 in meinfos and 3 not in meinfos and meinfos.get(3) is None
+
+    item = meinfos[2]
+    assert (item.morph_name, item.emodel_tpl, item.mtype, item.etype) == ("m2", "em1", "L2_B", None)
+    assert item.threshold_current == .2 and item.holding_current == 0
+    npt.assert_allclose(item.local_to_global_matrix[:, 3], [4, 5, 6])
+    item = meinfos[7]
+    assert (item.morph_name, item.mtype, item.etype) == ("m1", "L1_A", "cADpyr")
+    assert item.threshold_current == 0 and item.local_to_global_matrix is None
+    assert list(meinfos._columns["morph_name"].codes) == [1, 2, 1]  # m1 merged
+
+    meinfos.add_extra_attribute("layer", numpy.array([1, 2, 3]))
+    assert meinfos[7].extra_attrs == {"layer": 3}
+
+    nodes = NodeSet([2, 3, 7], meinfos)
+    assert nodes._gid_info is meinfos
+    infos = dict(nodes.items())
+    assert infos[3] is None and infos[2].morph_name == "m2" and infos[7].morph_name == "m1"
+
+
+def test_metype_manager_repeated_gids():
+    meinfos = metype.METypeManager()
+    meinfos.load_infoNP([5, 2, 5], ["m1", "m2", "m3"], None, None, None,
+                        threshold_currents=[.1, .2, .3])
+    meinfos.insert(2, "m4", threshold_current=.4)
+    meinfos.load_infoNP([7], ["m5"], None, None, None)
+    # As with a dict: the last values win, gids keep their first position
+    assert len(meinfos) == 3 and list(meinfos) == [5, 2, 7]
+    assert [item.morph_name for _, item in meinfos.items()] == ["m3", "m4", "m5"]
+    assert meinfos[5].threshold_current == .3 and meinfos[2].threshold_current == .4
+
+
+def test_metype_item_standalone():
+    item = metype.METypeItem("m1", etype="cADpyr", threshold_current=1, add_params=(400,))
+    assert item._store is None
+    assert (item.morph_name, item.etype, item.mtype) == ("m1", "cADpyr", None)
+    assert item.threshold_current == 1. and item.holding_current == 0
+    assert item.add_params == (400,) and item.extra_attrs == {}
+    assert item.local_to_global_matrix is None
+
+
+def test_nodeset_add_gids_managers():
+    from neurodamus.core.nodeset import NodeSet
+    meinfos1 = metype.METypeManager()
+    meinfos1.load_infoNP([1, 2], ["m1", "m2"], ["em1", "em1"], ["L1_A", "L2_B"], None)
+    meinfos1.add_extra_attribute("layer", numpy.array([1, 2]))  # Like sonata loads
+    meinfos2 = metype.METypeManager()
+    meinfos2.load_infoNP([3], ["m3"], ["em2"], ["L1_A"], None)
+
+    nodes = NodeSet([1, 2], meinfos1)
+    nodes.add_gids([3], meinfos2)
+    nodes.add_gids([4], {4: "info4"})
+    # The given managers are left untouched
+    assert list(meinfos1) == [1, 2] and list(meinfos2) == [3]
+    infos = dict(nodes.items())
+    assert [infos[gid].morph_name for gid in (1, 2, 3)] == ["m1", "m2", "m3"]
+    assert infos[2].extra_attrs == {"layer": 2}
+    assert infos[4] == "info4"
+
+    # Extending another set doesn't add to this one
+    other = NodeSet().extend(nodes)
+    other.add_gids([5], {5: "info5"})
+    assert dict(other.items())[5] == "info5"
+    assert len(nodes._gid_info) == 4
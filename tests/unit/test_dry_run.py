@@ -66,3 +66,57 @@ class DummyNodeReader:
             return ["mtype1", "mtype2", "mtype1", "mtype2", "mtype1"]
         else:
             pytest.fail(f"Unsupported attribute: {attr}")
+
+
+def test_distribute_cells():
+    from collections import Counter
+    from neurodamus.utils.memory import DryRunStats, _lpt_assign
+
+    npt.assert_array_equal(_lpt_assign([1, 5, 2, 4, 3], 2), [0, 0, 0, 1, 1])
+
+    dry_run_stats = DryRunStats.__new__(DryRunStats)
+    dry_run_stats.metype_memory = {"big": 100.0, "small": 10.0}
+    dry_run_stats.metype_cell_syn_average = Counter()
+    dry_run_stats.pop_metype_gids = {"pop": {"big": np.arange(1, 5), "small": np.arange(5, 17)}}
+    with unittest.mock.patch("neurodamus.utils.memory.export_allocation_stats"), \
+            unittest.mock.patch("neurodamus.utils.memory.export_metype_memory_usage"):
+        allocation, memory, _ = dry_run_stats.distribute_cells(2, 2, batch_size=2)
+        assert sorted(memory["pop"].values()) == [40, 40, 220, 220]
+        all_gids = sorted(gid for gids in allocation["pop"].values() for gid in gids)
+        assert all_gids == list(range(1, 17))
+        assert set(allocation["pop"]) == {(0, 0), (0, 1), (1, 0), (1, 1)}
+
+        # The heaviest cell goes alone to the first rank
+        dry_run_stats.pop_metype_gids = {"pop": {"small": np.array([1, 2]), "big": np.array([3])}}
+        allocation, _, _ = dry_run_stats.distribute_cells(2, 1, batch_size=1)
+        assert {key: list(gids) for key, gids in allocation["pop"].items()} == \
+            {(0, 0): [3], (1, 0): [1, 2]}
+
+        # A secondary objective (e.g. synapses) only present in small cells spreads them
+        allocation, _, _ = dry_run_stats.distribute_cells(
+            2, 1, batch_size=1, secondary_weights={"small": 1}, secondary_factor=10)
+        assert {key: list(gids) for key, gids in allocation["pop"].items()} == \
+            {(0, 0): [1, 3], (1, 0): [2]}
+
+
+def test_allocation_stats_file(tmp_path):
+    from neurodamus.utils.compat import Vector
+    from neurodamus.utils.memory import export_allocation_stats, import_allocation_stats
+
+    allocation = {
+        "pop_A": {(0, 0): Vector("I", [1, 2]), (1, 0): Vector("I", [3]), (0, 1): Vector("I", [4])},
+        "pop_B": {(1, 0): Vector("I", [10, 20, 30])},
+    }
+    export_allocation_stats(allocation, tmp_path / "allocation", 2, 2)
+    filename = tmp_path / "allocation_r2_c2.npy"
+    assert filename.is_file()
+
+    all_ranks = import_allocation_stats(filename)
+    assert {pop: {r: list(gids) for r, gids in ranks.items()} for pop, ranks in all_ranks.items()} \
+        == {"pop_A": {0: [1, 2], 1: [3]}, "pop_B": {1: [10, 20, 30]}}
+
+    rank1 = import_allocation_stats(filename, cycle_i=0, rank=1)
+    assert set(rank1) == {"pop_A", "pop_B"}
+    npt.assert_array_equal(rank1["pop_B"][1], [10, 20, 30])
+    assert list(rank1["pop_A"]) == [1]
+    assert import_allocation_stats(filename, cycle_i=1, rank=0) == {"pop_A": {0: [4]}}
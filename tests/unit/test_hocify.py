@@ -0,0 +1,58 @@
+import json
+import os
+from unittest import mock
+
+
+def _fake_process_file(file_tuple):
+    src_file, dst_file = file_tuple
+    with open(dst_file, 'w') as f:
+        f.write("// " + os.path.basename(src_file) + "\n")
+    return src_file
+
+
+def test_hocify_incremental(tmp_path):
+    from neurodamus.hocify import Hocify, MANIFEST_FILENAME
+    morph_dir = tmp_path / "ascii"
+    morph_dir.mkdir()
+    for name in ("a.asc", "b.h5", "c.SWC", "notes.txt"):
+        (morph_dir / name).write_text(name)
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()  # An existing output dir is fine
+
+    def convert():
+        process_mock = mock.Mock(side_effect=_fake_process_file)
+        with mock.patch("neurodamus.hocify.process_file", process_mock):
+            hocify = Hocify(str(tmp_path), 1000, 0, str(out_dir), incremental=True, jobs=1)
+            assert hocify.convert() == 0
+        return sorted(os.path.basename(call[0][0][0]) for call in process_mock.call_args_list)
+
+    assert convert() == ["a.asc", "b.h5", "c.SWC"]
+    assert sorted(p.name for p in out_dir.glob("*.hoc")) == ["a.hoc", "b.hoc", "c.hoc"]
+    with open(out_dir / MANIFEST_FILENAME) as f:
+        assert sorted(json.load(f)["files"]) == ["a.asc", "b.h5", "c.SWC"]
+
+    assert convert() == []
+
+    # Touched but same contents: hashed, not converted
+    os.utime(morph_dir / "a.asc", ns=(0, 0))
+    (morph_dir / "b.h5").write_text("changed")
+    (out_dir / "c.hoc").unlink()
+    assert convert() == ["b.h5", "c.SWC"]
+    assert convert() == []
+
+
+def test_hocify_name_collision(tmp_path):
+    from neurodamus.hocify import Hocify
+    morph_dir = tmp_path / "ascii"
+    morph_dir.mkdir()
+    for name in ("a.asc", "a.h5", "b.swc"):
+        (morph_dir / name).write_text(name)
+    out_dir = tmp_path / "out"
+
+    process_mock = mock.Mock(side_effect=_fake_process_file)
+    with mock.patch("neurodamus.hocify.process_file", process_mock), \
+            mock.patch("neurodamus.hocify.logging") as log_mock:
+        assert Hocify(str(tmp_path), 1000, 0, str(out_dir), jobs=1).convert() == 1
+    process_mock.assert_not_called()
+    assert "a.asc/a.h5" in log_mock.critical.call_args[0][1]
+    assert not list(out_dir.glob("*.hoc"))
@@ -0,0 +1,82 @@
+import shutil
+from io import StringIO
+from pathlib import Path
+
+import numpy
+import numpy.testing as npt
+
+SIM_DIR = Path(__file__).parent.parent.absolute() / "simulations"
+
+
+def test_cx_binary_roundtrip(tmp_path):
+    from neurodamus.cell_distributor import LoadBalance
+    cx_file = tmp_path / "cx_Small#.dat"
+    shutil.copyfile(SIM_DIR / "1k_v5_balance" / "cx_Small.dat", cx_file)
+
+    out_cx = {}
+    assert LoadBalance._cx_contains_gids(cx_file, [91, 1, 31], out_cx)
+    assert not LoadBalance._cx_contains_gids(cx_file, [1, 2, 10000])
+    index_file, data_file = LoadBalance._cx_binary_filenames(cx_file)
+    assert index_file.is_file() and data_file.is_file()
+    assert LoadBalance._get_lbdir_targets(tmp_path) == {"Small"}
+
+    index, data = LoadBalance._load_cx_binary(cx_file)
+    assert len(index) == 12
+    npt.assert_array_equal(index["gid"], sorted(index["gid"]))
+    npt.assert_array_equal(out_cx["index"]["gid"], [91, 1, 31])
+
+    # Records written back as text must match the original lines of each gid
+    sel_index, sel_data = LoadBalance._cx_select(out_cx["index"], out_cx["data"])
+    npt.assert_array_equal(sel_index["start"], [0] + sel_index["end"][:-1].tolist())
+    records = {}
+    for gid, start, end in zip(sel_index["gid"], sel_index["start"], sel_index["end"]):
+        text = StringIO()
+        LoadBalance._write_msdat(text, sel_data[start:end])
+        records[gid] = text.getvalue()
+    original = cx_file.read_text()
+    assert records[1] in original
+    assert records[91] in original and records[31] in original
+    assert records[1].startswith("1 1290.66 3\n  2\n   207.405 2\n     1 2\n")
+
+
+def test_compute_save_complexities(tmp_path):
+    """Complexities written by all ranks must reproduce the reference cx files"""
+    from unittest import mock
+    from neurodamus.cell_distributor import LoadBalance
+    ref_file = tmp_path / "cx_Ref#.dat"
+    shutil.copyfile(SIM_DIR / "1k_v5_balance" / "cx_Small.dat", ref_file)
+    ref_index, ref_data = LoadBalance._load_cx_binary(ref_file)
+    ms_records = {int(r["gid"]): numpy.array(ref_data[r["start"]:r["end"]]) for r in ref_index}
+    ref_gids = [int(line.split()[0]) for line in ref_file.read_text().splitlines()[2:]
+                if not line.startswith(" ")]
+
+    class MComplex:
+        def cell_complexity(self, cell):
+            return ms_records[cell][1]
+
+        def multisplit(self, gid, _lcx, vec):
+            vec.data = ms_records[gid]
+
+    class Vector:
+        def as_numpy(self):
+            return self.data
+
+    cells = [mock.Mock(CellRef=gid, raw_gid=gid) for gid in ref_gids]
+    cell_distributor = mock.Mock(cells=cells, total_cells=len(cells))
+    cell_distributor.local_nodes.final_gids.return_value = ref_gids
+    cell_distributor.pc.gid2cell = lambda gid: gid
+
+    lbal = LoadBalance.__new__(LoadBalance)
+    lbal.lb_mode = None
+    lbal.target_cpu_count = 4
+    lbal._lb_dir = tmp_path
+    lbal._cx_targets = set()
+    with mock.patch("neurodamus.cell_distributor.Nd", Vector=Vector):
+        lbal._compute_save_complexities("New", MComplex(), cell_distributor)
+
+    assert "New" in lbal._cx_targets
+    new_file = tmp_path / "cx_New#.dat"
+    assert new_file.read_text() == ref_file.read_text()
+    index, data = LoadBalance._load_cx_binary(new_file)
+    npt.assert_array_equal(index, ref_index)
+    npt.assert_array_equal(data, ref_data)
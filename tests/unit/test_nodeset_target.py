@@ -19,3 +19,31 @@ def test_get_local_gids():
     numpy.testing.assert_array_equal(t2.get_local_gids(), [1002])
     numpy.testing.assert_array_equal(t2.get_local_gids(raw_gids=True), [2])
     numpy.testing.assert_array_equal(t_empty.get_local_gids(), [])
+
+
+def test_serialized_sections_locations():
+    from unittest import mock
+    from neurodamus.target_manager import SerializedSections
+
+    class FakeSection:
+        def __init__(self, index, orientation, arcs):
+            self.index = index
+            self.arcs = arcs
+            self.L = arcs[-1]
+            self.orientation = lambda: orientation
+            self.n3d = lambda: len(arcs)
+            self.arc3d = lambda i: arcs[i]
+            self.sec = self
+
+        def __call__(self, _x):
+            return type("Segment", (), {"v": self.index})
+
+    sections = [FakeSection(0, 0, [0., 2., 4.]), FakeSection(1, 1, [0., 1., 3.])]
+    cell = type("Cell", (), {"nSecAll": 2, "all": sections})
+    with mock.patch("neurodamus.target_manager.Nd", SectionRef=lambda sec: sec):
+        serialized = SerializedSections(cell)
+
+    x = serialized.compute_locations(isec=[0, 0, 1, 0, 0],
+                                     ipt=[-1, 1, 0, 5, 0],
+                                     offset=[0.3, 1., 0.5, 0., -2.])
+    numpy.testing.assert_allclose(x, [0.3, 0.75, 1 - 2.5 / 3, 0.5, 0.0000001])
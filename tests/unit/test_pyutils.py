@@ -128,3 +128,146 @@ if __name__ == "__main__":
     test_merge()
     test_merge_grouped()
     test_flatten_grouped()
+
+
+def test_grouped_map_csr():
+    keys = numpy.array([3, 1, 2, 1, 2], "i")
+    vals = numpy.array([.3, .1, .2, .15, .25])
+    d = GroupedMultiMap(keys, vals)
+    keys, offsets, values = d.csr()
+    assert numpy.array_equal(keys, [1, 2, 3])
+    assert numpy.array_equal(offsets, [0, 2, 4, 5])
+    assert numpy.array_equal(values[offsets[1]:offsets[2]], d[2])
+
+
+def test_morphology_cache():
+    from unittest import mock
+    from neurodamus.morphio_wrapper import MorphologyCache
+    from neurodamus.utils.timeit import TimerManager
+
+    cache = MorphologyCache(max_size=2)
+    with mock.patch("neurodamus.morphio_wrapper.MorphIOWrapper") as wrapper_cls, \
+            mock.patch.dict(TimerManager._counters, clear=True):
+        wrapper_cls.side_effect = lambda path, options: mock.Mock(path=path)
+        morph_a = cache.get("a.h5")
+        assert cache.get("a.h5") is morph_a
+        cache.get("b.h5")
+        cache.get("a.h5")  # a is now the most recently used
+        cache.get("c.h5")  # evicts b
+        assert len(cache) == 2
+        assert cache.get("a.h5") is morph_a
+        cache.get("b.h5")
+        assert wrapper_cls.call_count == 4
+        assert TimerManager._counters == {"Morphology cache hits": 3,
+                                          "Morphology cache misses": 4}
+
+
+def test_morphology_prefetch(tmp_path):
+    from unittest import mock
+    from neurodamus.morphio_wrapper import MorphologyCache
+
+    paths = [str(tmp_path / name) for name in ("a.h5", "b.h5", "a.h5", "c.h5", "b.h5")]
+    for path in paths:
+        open(path, "wb").close()
+
+    cache = MorphologyCache(max_size=1)
+    with mock.patch("neurodamus.morphio_wrapper.MorphIOWrapper") as wrapper_cls:
+        wrapper_cls.side_effect = lambda path, options: mock.Mock(path=path)
+        with cache.prefetching(paths, n_threads=2, max_ahead=3):
+            morphs = [cache.get(path) for path in paths]
+            assert len(cache._queue) == 0
+        assert [m.path for m in morphs] == paths
+        # "a.h5" repeats within the look-ahead, so it is loaded once. "b.h5" is loaded again
+        # after being evicted by "c.h5"
+        assert wrapper_cls.call_count == 4
+
+
+def test_morphology_prefetch_bounds(tmp_path):
+    from unittest import mock
+    from neurodamus.morphio_wrapper import MorphologyCache
+    from neurodamus.utils.timeit import TimerManager
+
+    paths = [str(tmp_path / name) for name in ("a.h5", "b.h5", "c.h5", "d.h5")]
+    for path, size in zip(paths, (100, 100, 300, 10)):
+        with open(path, "wb") as f:
+            f.write(bytes(size))
+
+    cache = MorphologyCache()
+    with mock.patch("neurodamus.morphio_wrapper.MorphIOWrapper") as wrapper_cls, \
+            mock.patch.dict(TimerManager._counters, clear=True):
+        wrapper_cls.side_effect = lambda path, options: mock.Mock(path=path)
+        with cache.prefetching(paths, n_threads=1, max_ahead=10, max_ahead_bytes=250):
+            assert [key[0] for key, _, _ in cache._queue] == paths[:2]
+            cache.get(paths[0])
+            cache.get(paths[1])
+            # A morphology above the bound is still loaded ahead, alone
+            assert [key[0] for key, _, _ in cache._queue] == paths[2:3]
+            # Out of order: prefetching stops, morphologies load on request
+            assert cache.get(paths[3]).path == paths[3]
+            assert len(cache._queue) == 0
+            assert cache.get(paths[2]).path == paths[2]
+        assert TimerManager._counters["Morphology prefetch hits"] == 2
+        assert TimerManager._counters["Morphology prefetch out of order"] == 1
+
+
+def test_round_significant():
+    from neurodamus.morphio_wrapper import round_significant
+    rng = numpy.random.default_rng(0)
+    values = numpy.concatenate([rng.uniform(-1, 1, 1000).astype("f") * 10.0 ** e
+                                for e in range(-4, 8)] + [[0, 1e-3, 9.9999999, 99999995]])
+    values = values.astype("f")
+    expected = [float("{:.8g}".format(v)) for v in values.tolist()]  # as in the hoc commands
+    assert round_significant(values).tolist() == expected
+
+
+@pytest.mark.parametrize("section_types", [
+    [2, 2, 3, 3],
+    [3, 3, 2, 2],  # dendrites before the axon
+])
+def test_morphology_instantiate(section_types):
+    from unittest import mock
+    from neurodamus.morphio_wrapper import MorphIOWrapper
+
+    def make_section(sec_id, parent=None):
+        section = mock.Mock(id=sec_id, is_root=parent is None,
+                            points=numpy.full((2, 3), sec_id, "f"), diameters=numpy.ones(2, "f"))
+        section.parent = parent  # not a constructor kwarg in Mock
+        return section
+
+    root0 = make_section(0)
+    root1 = make_section(2)
+    sections = [root0, make_section(1, root0), root1, make_section(3, root1)]
+    morph = mock.Mock(sections=sections, section_types=numpy.array(section_types))
+    morph.soma.points = numpy.array([[0., 0, 0], [1, 1, 1]])
+    morph.soma.diameters = numpy.array([2., 3])
+
+    wrapper = MorphIOWrapper.__new__(MorphIOWrapper)
+    wrapper._morph = morph
+    wrapper._sec_idx2names = {}
+    wrapper._build_sec_idx2names()
+    wrapper._build_sec_typeid_distrib()
+
+    cell = mock.Mock(soma=[mock.MagicMock(name="soma")],
+                     axon=[mock.MagicMock(name="axon0"), mock.MagicMock(name="axon1")],
+                     dend=[mock.MagicMock(name="dend0"), mock.MagicMock(name="dend1")])
+    with mock.patch("neurodamus.morphio_wrapper.Nd") as nd:
+        nd.Vector.side_effect = lambda arr: list(arr)
+        wrapper.instantiate(cell)
+
+    # The same sections are created as with hoc commands
+    hoc_cmds = [cmd for cmd in wrapper._build_hoc_commands() if "pt3dadd" not in cmd]
+    executed = [c.args[0] for c in nd.execute.call_args_list]
+    assert executed == [cmd for cmd in hoc_cmds if "connect" not in cmd]
+    assert executed[0] == "create soma[1]" and executed[2] == "create axon[2]"
+
+    first, second = (getattr(cell, MorphIOWrapper.type2name(t)) for t in section_types[::2])
+    first[1].connect.assert_called_once_with(first[0](1), 0)
+    second[1].connect.assert_called_once_with(second[0](1), 0)
+    first[0].connect.assert_called_once_with(cell.soma[0](0.5), 0)
+    second[0].connect.assert_called_once_with(cell.soma[0](0.5), 0)
+
+    pt3d_calls = nd.h.pt3dadd.call_args_list
+    assert pt3d_calls[0].args == ([1., 0], [1., 0], [1., 0], [3., 2])
+    assert pt3d_calls[0].kwargs["sec"] is cell.soma[0]
+    assert pt3d_calls[1].args[0] == [0., 0] and pt3d_calls[1].kwargs["sec"] is first[0]
+    assert pt3d_calls[4].args[0] == [3., 3] and pt3d_calls[4].kwargs["sec"] is second[1]
@@ -17,3 +17,116 @@ def test_replay_manager_sonata():
     # We do an internal assertion when the population doesnt exist. Verify it works as expected
     with pytest.raises(MissingSpikesPopulationError, match="Spikes population not found"):
         SpikeManager._read_spikes_sonata(spikes_sonata, "wont-exist")
+
+
+def test_replay_manager_distributed(tmp_path):
+    import numpy
+    from neurodamus.replay import SpikeManager
+    spikes_sonata = str(SAMPLE_DATA_DIR / "out.h5")
+    timestamps, spike_gids = SpikeManager._read_spikes_sonata(spikes_sonata, "NodeA")
+
+    # The parts read by all ranks must make the whole file
+    parts = [SpikeManager._read_spikes_partition(spikes_sonata, "NodeA", i, 3) for i in range(3)]
+    npt.assert_equal(numpy.concatenate([p[0] for p in parts]), timestamps)
+    npt.assert_equal(numpy.concatenate([p[1] for p in parts]), spike_gids)
+
+    spikes_bin = tmp_path / "out.bin"
+    numpy.concatenate([timestamps, spike_gids.astype("d")]).tofile(spikes_bin)
+    parts = [SpikeManager._read_spikes_partition(str(spikes_bin), None, i, 3) for i in range(3)]
+    npt.assert_equal(numpy.concatenate([p[0] for p in parts]), timestamps)
+    npt.assert_equal(numpy.concatenate([p[1] for p in parts]), spike_gids)
+
+    # Only the spikes of the requested gids are kept
+    spike_manager = SpikeManager(spikes_sonata, 0, "NodeA", gids=[1, 3])
+    assert 1 in spike_manager and 3 in spike_manager and 2 not in spike_manager
+    npt.assert_allclose(spike_manager[1], timestamps[spike_gids == 1])
+    npt.assert_allclose(spike_manager[3], timestamps[spike_gids == 3])
+
+
+def test_replay_shared_stims():
+    import numpy
+    from unittest import mock
+    from neurodamus.connection import ReplayStim
+
+    class Vector:
+        def __init__(self, data):
+            self.data = numpy.array(data)
+
+        def as_numpy(self):
+            return self.data
+
+        def size(self):
+            return len(self.data)
+
+    conn = mock.Mock(sgid=5, tgid=1, syndelay_override=None, weight_factor=1)
+    syn_params = mock.Mock(delay=1.0, weight=2.0)
+    with mock.patch("neurodamus.connection.Nd", Vector=Vector) as nd_mock, \
+            mock.patch("neurodamus.connection.ArtificialStim._bbss", mock.Mock()):
+        ReplayStim.enable_sharing()
+        replays = [ReplayStim() for _ in range(3)]
+        replays[0].add_shared_spikes(numpy.array([3., 1.]), 5)
+        replays[1].add_shared_spikes(numpy.array([1.]), 5)
+        replays[1].add_shared_spikes(numpy.array([3.]), 5)
+        replays[2].add_shared_spikes(numpy.array([1., 3.]), 6)
+        assert replays[0].time_vec is replays[1].time_vec
+        assert replays[0].time_vec is not replays[2].time_vec
+        npt.assert_array_equal(replays[1].time_vec.as_numpy(), [1., 3.])
+
+        for replay in (replays[0], replays[0], replays[1]):
+            replay.create_on(conn, None, None, syn_params)
+        # VecStims are shared within a target cell only
+        other_conn = mock.Mock(sgid=5, tgid=2, syndelay_override=None, weight_factor=1)
+        replays[1].create_on(other_conn, None, None, syn_params)
+        ReplayStim.enable_sharing(False)
+
+    assert nd_mock.VecStim.call_count == 2
+    assert len(replays[0].netstims) == 1 and len(replays[1].netstims) == 1
+    assert len(replays[0].netcons) == 2 and len(replays[1].netcons) == 2
+
+    # A second model build creates (and owns) its VecStims again
+    with mock.patch("neurodamus.connection.Nd", Vector=Vector) as nd_mock, \
+            mock.patch("neurodamus.connection.ArtificialStim._bbss", mock.Mock()):
+        for _ in range(2):
+            ReplayStim.enable_sharing()
+            replay = ReplayStim()
+            replay.add_shared_spikes(numpy.array([1., 3.]), 5)
+            replay.create_on(conn, None, None, syn_params)
+            assert len(replay.netstims) == 1  # restarted by restart_events
+        ReplayStim.enable_sharing(False)
+    assert nd_mock.VecStim.call_count == 2
+
+
+def test_connection_replay_no_spikes():
+    import numpy
+    from unittest import mock
+    from neurodamus.connection import Connection
+
+    with mock.patch.object(Connection, "_init_hmod"):
+        conn = Connection(5, 1)
+    vector_mock = mock.Mock(side_effect=lambda data: mock.Mock(size=lambda: len(data)))
+    with mock.patch("neurodamus.connection.Nd", Vector=vector_mock):
+        assert conn.replay(numpy.array([1., 2.]), start_delay=5.) == 0
+
+
+def test_replay_ascii_cache(tmp_path):
+    import os
+    from unittest import mock
+    from neurodamus.replay import SpikeManager
+    spikes_file = tmp_path / "out.dat"
+    spikes_file.write_text("/scatter\n0.5\t3\n1.25\t1\n2.0\t3\n3.5\t2\n")
+
+    timestamps, spike_gids = SpikeManager._read_spikes_ascii(str(spikes_file))
+    npt.assert_array_equal(spike_gids, [1, 2, 3, 3])
+    npt.assert_allclose(timestamps, [1.25, 3.5, 0.5, 2.0])
+    cache_file = SpikeManager._ascii_cache_filenames(str(spikes_file))[0]
+    assert os.path.isfile(cache_file)
+
+    # Second read uses the cache
+    with mock.patch("numpy.loadtxt", side_effect=AssertionError("Not cached")):
+        cached_timestamps, cached_gids = SpikeManager._read_spikes_ascii(str(spikes_file))
+    npt.assert_array_equal(cached_gids, spike_gids)
+    npt.assert_array_equal(cached_timestamps, timestamps)
+
+    # Cache is invalidated when the file changes
+    spikes_file.write_text("/scatter\n0.5\t3\n")
+    assert SpikeManager._ascii_cache_filenames(str(spikes_file))[0] != cache_file
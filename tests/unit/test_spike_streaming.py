@@ -0,0 +1,84 @@
+import h5py
+import numpy
+import numpy.testing as npt
+from unittest import mock
+
+
+class FakeVector:
+    def __init__(self, data=()):
+        self.data = numpy.array(data, dtype="d")
+
+    def as_numpy(self):
+        return self.data
+
+    def size(self):
+        return len(self.data)
+
+    def resize(self, n):
+        self.data = self.data[:n]
+
+    def append(self, *values):
+        self.data = numpy.append(self.data, values)
+
+
+def test_stream_spikes(tmp_path):
+    from neurodamus.node import Node
+    node = Node.__new__(Node)
+    node._run_conf = {"SpikesFile": "some/dir/spikes.h5"}
+    node._spike_populations = [("NodeA", 0), (None, 1000)]
+    node._spike_vecs = [(FakeVector(), FakeVector()), (FakeVector(), FakeVector())]
+    node._spikes_writer = None
+    spikes, ids = node._spike_vecs[0]
+    shard_file = tmp_path / "spike_shards" / "r0.h5"
+
+    with mock.patch("neurodamus.node.SimConfig", output_root=str(tmp_path)):
+        spikes.append(1.5, 0.5, 0.5)
+        ids.append(1, 3, 2)
+        node._stream_spikes()
+        assert spikes.size() == ids.size() == 0
+        # The rank shard is a valid spikes file, holding the spikes so far
+        with h5py.File(shard_file, "r") as f:
+            npt.assert_array_equal(f["spikes/NodeA/timestamps"], [0.5, 0.5, 1.5])
+            npt.assert_array_equal(f["spikes/NodeA/node_ids"], [1, 2, 0])
+            assert len(f["spikes/All/timestamps"]) == 0
+
+        spikes.append(2.0)
+        ids.append(2)
+        node._stream_spikes()
+        spikes.append(2.5)
+        ids.append(1)
+        node._spike_vecs[1][0].append(3.0)
+        node._spike_vecs[1][1].append(1001)
+        node.sonata_spikes()
+
+    assert node._spikes_writer is None
+    assert spikes.size() == 0
+    assert not (tmp_path / "spike_shards").exists()
+    with h5py.File(tmp_path / "spikes.h5", "r") as f:
+        population = f["spikes/NodeA"]
+        assert population.attrs["sorting"] == 2
+        assert population["timestamps"].attrs["units"] == "ms"
+        npt.assert_array_equal(population["timestamps"], [0.5, 0.5, 1.5, 2.0, 2.5])
+        npt.assert_array_equal(population["node_ids"], [1, 2, 0, 1, 0])
+        npt.assert_array_equal(f["spikes/All/timestamps"], [3.0])
+        npt.assert_array_equal(f["spikes/All/node_ids"], [0])
+
+
+def test_merge_spike_files(tmp_path):
+    from neurodamus.io.spike_writer import SonataSpikeWriter, merge_spike_files
+    rng = numpy.random.default_rng(0)
+    all_spikes = []
+    shard_files = []
+    for rank in range(3):
+        timestamps = numpy.sort(rng.integers(0, 20, 40 * rank).astype("d"))  # many ties
+        node_ids = rng.integers(0, 100, len(timestamps)).astype("u8")
+        shard_files.append(tmp_path / "r{}.h5".format(rank))
+        writer = SonataSpikeWriter(shard_files[-1], ["pop"])
+        writer.append("pop", timestamps, node_ids)
+        writer.close()
+        all_spikes.extend(zip(timestamps, node_ids))
+
+    merge_spike_files(shard_files, tmp_path / "out.h5", chunk_size=7)
+    with h5py.File(tmp_path / "out.h5", "r") as f:
+        merged = list(zip(f["spikes/pop/timestamps"][:], f["spikes/pop/node_ids"][:]))
+    assert merged == sorted(all_spikes)
@@ -53,3 +53,31 @@ class TestStimuli:
         assert list(self.stim.time_vec) == [0, 0, 20, 20, 100, 100, 120, 120, 200, 200, 220, 220,
                                             300, 300, 320, 320, 350]
         assert list(self.stim.stim_vec) == [0, 1.2, 1.2, 0] * 4 + [0]
+
+
+@pytest.mark.parametrize("coef", [0.999, 0.5, 1e-6])
+@pytest.mark.parametrize("with_scipy", [True, False])
+def test_ar1_filter(coef, with_scipy):
+    import sys
+    import numpy
+    from unittest import mock
+    from neurodamus.core.stimuli import _ar1_filter
+    innovations = numpy.random.default_rng(0).normal(size=20000)
+    expected = numpy.zeros(len(innovations))
+    expected[0] = innovations[0]
+    for n in range(1, len(innovations)):
+        expected[n] = coef * expected[n - 1] + innovations[n]
+
+    with mock.patch.dict(sys.modules, {} if with_scipy else {"scipy.signal": None}):
+        numpy.testing.assert_allclose(_ar1_filter(innovations, coef), expected,
+                                      rtol=1e-9, atol=1e-9)
+
+
+def test_shared_waveforms():
+    from neurodamus.stimulus_manager import BaseStim
+    source = BaseStim.get_shared_source(CurrentSource.ramp, 1.0, 2.0, 10, delay=5)
+    assert BaseStim.get_shared_source(CurrentSource.ramp, 1.0, 2.0, 10, delay=5) is source
+    assert BaseStim.get_shared_source(CurrentSource.ramp, 1.5, 2.0, 10, delay=5) is not source
+    assert BaseStim.get_shared_source(CurrentSource.train, 1.0, 2.0, 10, 5) is not source
+    assert list(source.time_vec) == [0, 5, 5, 15, 15]
+    BaseStim.waveform_cache.clear()
@@ -47,6 +47,101 @@ def test_syn_read_counts():
     assert conn_counts[2] == {1: 2}  # [0->1] 2 synapses
 
 
+def test_syn_read_columnar_cache():
+    from neurodamus.io.synapse_reader import SonataReader
+    from neurodamus.gap_junction import GapJunctionSynapseReader
+    sonata_file = str(SIM_DIR / "usecase3/local_edges_A.h5")
+    reader = SonataReader(sonata_file, "NodeA__NodeA__chemical")
+    reader.preload_data([2])
+    reader.preload_data([1, 2, 3])  # Only gids 1 and 3 are read
+    assert len(reader._blocks) == 2
+    npt.assert_equal(reader.get_property(1, "sgid"), [2, 2])
+    npt.assert_equal(reader.get_property(2, "sgid"), [1, 1])
+    npt.assert_equal(reader.get_property(2, "synapse_index"), [2, 3])
+    assert len(reader.get_property(3, "sgid")) == 0
+    # Gids are indexed across blocks
+    assert reader._find_gid(2) == (reader._blocks[0], 0)
+    assert reader._find_gid(3) == (reader._blocks[1], 1)
+    assert reader._find_gid(4) == (None, None)
+
+    sonata_file = str(SIM_DIR / "mini_thalamus_sonata/gapjunction/edges.h5")
+    gj_reader = GapJunctionSynapseReader.create(sonata_file)
+    gj_reader.preload_data([1, 2, 3])
+    syn_params_1 = gj_reader.get_synapse_parameters(1)
+    assert len(syn_params_1) == 9
+    assert syn_params_1.base is not None  # a view of the block parameters
+    npt.assert_equal(gj_reader.get_synapse_parameters(1).weight, syn_params_1.weight)
+
+
+def test_syn_read_conn_segments():
+    from neurodamus.gap_junction import GapJunctionSynapseReader
+    sonata_file = str(SIM_DIR / "mini_thalamus_sonata/gapjunction/edges.h5")
+    reader = GapJunctionSynapseReader(sonata_file)
+    reader.preload_data([1, 2, 3])
+    [(syn_params, segments)] = reader.get_conn_segments([2, 3])
+    assert len(syn_params) == 11  # whole block, gid 1 included
+    npt.assert_equal(segments["sgid"], [1, 1])
+    npt.assert_equal(segments["tgid"], [2, 3])
+    npt.assert_equal(segments["start"], [9, 10])
+    npt.assert_equal(segments["end"], [10, 11])
+    npt.assert_equal(segments["offset"], [0, 0])
+    npt.assert_equal(segments["syn_index"], [9, 10])
+
+    [(syn_params, segments)] = reader.get_conn_segments([1])
+    npt.assert_equal(segments["sgid"], range(2, 11))
+    npt.assert_equal(segments["offset"], range(9))
+
+    # Gids not loaded are read on demand, in a new block
+    [(_, segments)] = GapJunctionSynapseReader(sonata_file).get_conn_segments([2])
+    npt.assert_equal(segments["sgid"], [1])
+
+    # One gid at a time, each in its own block
+    reader = GapJunctionSynapseReader(sonata_file)
+    for gid in (3, 2):
+        reader._locate_gid(gid)
+    [(_, segments_2), (_, segments_3)] = reader.get_conn_segments([3, 2])
+    assert len(reader._blocks) == 2
+    npt.assert_equal(segments_2["tgid"], [2])
+    npt.assert_equal(segments_3["tgid"], [3])
+
+
+def test_syn_read_conn_segments_default():
+    from neurodamus.io.synapse_reader import SynapseParameters, SynapseReader
+
+    class MinimalReader(SynapseReader):
+        def __init__(self):
+            pass
+
+        def get_synapse_parameters(self, gid):
+            params = SynapseParameters.create_array(3)
+            params.sgid = [gid + 1, gid + 1, gid + 2]
+            params.delay = gid
+            return params
+
+    [(syn_params, segments)] = MinimalReader().get_conn_segments([5, 2])
+    assert len(syn_params) == 6
+    npt.assert_equal(syn_params.delay, [2, 2, 2, 5, 5, 5])
+    npt.assert_equal(segments["sgid"], [3, 4, 6, 7])
+    npt.assert_equal(segments["tgid"], [2, 2, 5, 5])
+    npt.assert_equal(segments["start"], [0, 2, 3, 5])
+    npt.assert_equal(segments["end"], [2, 3, 5, 6])
+    npt.assert_equal(segments["offset"], [0, 2, 0, 2])
+    npt.assert_equal(segments["syn_index"], -1)
+    assert MinimalReader().get_conn_segments([]) == []
+
+
+def test_syn_read_threads():
+    from neurodamus.gap_junction import GapJunctionSynapseReader
+    sonata_file = str(SIM_DIR / "mini_thalamus_sonata/gapjunction/edges.h5")
+    reader = GapJunctionSynapseReader(sonata_file)
+    threaded_reader = GapJunctionSynapseReader(sonata_file, read_threads=4)
+    for gid in (1, 2, 3):
+        syn_params = reader.get_synapse_parameters(gid)
+        threaded_syn_params = threaded_reader.get_synapse_parameters(gid)
+        for field in syn_params.dtype.names:
+            npt.assert_equal(threaded_syn_params[field], syn_params[field])
+
+
 def test_conn_manager_syn_stats():
     """Test _get_conn_stats in isolation using a mocked instance of SynapseRuleManager
     """